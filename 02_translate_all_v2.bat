@@ -27,7 +27,7 @@ echo [INFO] Source: %SRC%
 echo [INFO] Cibles: en,es,de
 echo.
 
-py .\tools_translate\translate_android_strings_libretranslate_v2.py --res "%RES%" --source-dir "%SRC%" --targets en,es,de --endpoint http://127.0.0.1:5000 --source-lang fr --clean-target-dirs --write-base fr
+py .\tools_translate\translate_android_strings_libretranslate_v2.py --res "%RES%" --source-dir "%SRC%" --targets en,es,de --endpoint http://127.0.0.1:5000 --source-lang fr --incremental --write-base fr
 
 echo.
 echo [INFO] Si Android Studio plante ensuite: lance 03_sanitize_translations.bat
@@ -0,0 +1,9 @@
+@echo off
+setlocal
+cd /d "%~dp0"
+echo.
+echo === HikeTrack: Verification hors ligne des values-xx (erreurs AAPT2, placeholders, balises) ===
+echo.
+python tools_translate\lint_resources.py --res "app\src\main\res" --json "lint_resources.json"
+echo.
+pause
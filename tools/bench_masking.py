@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: historical masking code of the three translators vs tools_translate/masking.py.
+
+Runs mask + unmask over every text of a values folder (default values-fr), for:
+- v1  (mask_text / unmask_text: one replace/sub per kind, one replace per token)
+- v2  (Tokenizer + protect_placeholders / unprotect_tokens: two passes, sorted replace loop)
+- local (protect / unprotect of translate_resources_local)
+and checks that the shared Masker gives the same masked text (same TM keys) and
+round-trips every text. Generated texts with more placeholders show how both
+scale, and mangled tokens ("__ PH0 __") repaired by unmask() are counted.
+
+  py tools/bench_masking.py --values app/src/main/res/values-fr --repeat 20
+"""
+import argparse, re, sys, time
+from pathlib import Path
+
+# Shared i18n helpers live in tools_translate/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "tools_translate"))
+import masking
+from android_resources import iter_resources
+from masking import Masker, unmask
+
+# -- historical implementations (copied for comparison) ----------------------
+
+V1_PLACEHOLDER_RE = re.compile(r"%(?:\d+\$)?[+-]?(?:\d+)?(?:\.\d+)?[a-zA-Z]|%%")
+V1_BRACE_PH_RE = re.compile(r"\{\d+\}")
+V1_TAG_RE = re.compile(r"<[^>]+>")
+
+def v1_mask(s):
+    token_map = {}
+    idx = 0
+    def tok(val):
+        nonlocal idx
+        key = f"__TOK{idx}__"
+        idx += 1
+        token_map[key] = val
+        return key
+    s = s.replace("\\n", tok("\\n"))
+    s = s.replace("\\t", tok("\\t"))
+    s = s.replace("\\'", tok("\\'"))
+    s = V1_TAG_RE.sub(lambda m: tok(m.group(0)), s)
+    s = V1_PLACEHOLDER_RE.sub(lambda m: tok(m.group(0)), s)
+    s = V1_BRACE_PH_RE.sub(lambda m: tok(m.group(0)), s)
+    return s, token_map
+
+def v1_unmask(s, token_map):
+    for k, v in token_map.items():
+        s = s.replace(k, v)
+    return s
+
+V2_RE_PRINTF = re.compile(r"%(?:\d+\$)?[\-\+\#\ 0\,\(]*\d*(?:\.\d+)?[a-zA-Z%]")
+V2_RE_BRACES = re.compile(r"\{\d+\}")
+
+class V2Tokenizer:
+    def __init__(self, counter=0):
+        self.mapping = {}
+        self.counter = counter
+    def token(self, original, kind):
+        key = f"__{kind}{self.counter}__"
+        self.counter += 1
+        self.mapping[key] = original
+        return key
+
+def v2_mask(text, start=0):
+    tok = V2Tokenizer(start)
+    text = V2_RE_PRINTF.sub(lambda m: tok.token(m.group(0), "PH"), text)
+    text = V2_RE_BRACES.sub(lambda m: tok.token(m.group(0), "BR"), text)
+    return text, tok.mapping
+
+def v2_unmask(text, tok_map):
+    for k in sorted(tok_map.keys(), key=len, reverse=True):
+        text = text.replace(k, tok_map[k])
+    return text
+
+LOCAL_PLACEHOLDER_RE = re.compile(r'%(?:\d+\$)?[-+# 0,(]*\d*(?:\.\d+)?[a-zA-Z]|%%')
+LOCAL_TAG_RE = re.compile(r'<[^>]+>')
+
+def local_mask(text):
+    ph_map, tag_map = {}, {}
+    def ph_repl(m):
+        token = f"__PH{len(ph_map)}__"
+        ph_map[token] = m.group(0)
+        return token
+    def tag_repl(m):
+        token = f"__TAG{len(tag_map)}__"
+        tag_map[token] = m.group(0)
+        return token
+    t = LOCAL_PLACEHOLDER_RE.sub(ph_repl, text)
+    t = LOCAL_TAG_RE.sub(tag_repl, t)
+    return t, (ph_map, tag_map)
+
+def local_unmask(text, maps):
+    ph_map, tag_map = maps
+    for token, val in tag_map.items():
+        text = text.replace(token, val)
+    for token, val in ph_map.items():
+        text = text.replace(token, val)
+    return text
+
+# -- shared engine, configured like each tool --------------------------------
+
+NEW_V1 = Masker([("TOK", r"\\n"), ("TOK", r"\\t"), ("TOK", r"\\'"),
+                 ("TOK", masking.MARKUP), ("TOK", masking.PRINTF), ("TOK", masking.BRACES)])
+NEW_V2 = Masker([("PH", masking.PRINTF), ("BR", masking.BRACES)])
+NEW_LOCAL = Masker([("PH", masking.PRINTF), ("TAG", masking.MARKUP)], per_kind=True)
+
+def load_texts(values: Path):
+    texts = []
+    for f in sorted(values.glob("*.xml")):
+        try:
+            for r in iter_resources(f):
+                texts.extend(it.text for it in r.items if it.text.strip())
+        except Exception:
+            pass
+    return texts
+
+def bench(label, mask_fn, unmask_fn, texts, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for t in texts:
+            m, mp = mask_fn(t)
+            unmask_fn(m, mp)
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    print(f"{label:<38} {best * 1000:>9.2f} ms  ({best * 1e6 / len(texts):.2f} us/texte)")
+    return best
+
+def mangle(masked):
+    # What MT engines typically do to tokens: spaces inside, lower case
+    return masking.TOKEN_RE.sub(lambda m: f"__ {m.group(1).lower()}{m.group(2)} __", masked)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--values", default="app/src/main/res/values-fr", help="values folder used as corpus")
+    ap.add_argument("--repeat", type=int, default=20, help="Passes per implementation (best time kept)")
+    args = ap.parse_args()
+
+    texts = load_texts(Path(args.values))
+    if not texts:
+        raise SystemExit(f"Aucun texte dans {args.values}")
+    with_tokens = sum(1 for t in texts if NEW_V2.mask(t)[1] or NEW_LOCAL.mask(t)[1] or NEW_V1.mask(t)[1])
+    print(f"Corpus: {len(texts)} textes ({with_tokens} avec tokens a masquer), {args.repeat} passes\n")
+
+    pairs = [
+        ("v1", (v1_mask, v1_unmask), (NEW_V1.mask, unmask)),
+        ("v2", (v2_mask, v2_unmask), (NEW_V2.mask, unmask)),
+        ("local", (local_mask, local_unmask), (NEW_LOCAL.mask, unmask)),
+    ]
+    tokenized = [t for t in texts if NEW_V2.mask(t)[1] or NEW_LOCAL.mask(t)[1] or NEW_V1.mask(t)[1]]
+    for name, old, new in pairs:
+        t_old = bench(f"{name:<6} historique", old[0], old[1], texts, args.repeat)
+        t_new = bench(f"{name:<6} masking.Masker", new[0], new[1], texts, args.repeat)
+        s_old = bench(f"{name:<6} historique (avec tokens)", old[0], old[1], tokenized, args.repeat)
+        s_new = bench(f"{name:<6} Masker (avec tokens)", new[0], new[1], tokenized, args.repeat)
+        print(f"{'':<6} gain avec tokens x{s_old / s_new:.2f}")
+        same = sum(1 for t in texts if old[0](t)[0] == new[0](t)[0])
+        roundtrip = sum(1 for t in texts if unmask(*new[0](t)) == t)
+        print(f"{'':<6} gain x{t_old / t_new:.2f}, masque identique: {same}/{len(texts)}, "
+              f"aller-retour exact: {roundtrip}/{len(texts)}\n")
+
+    # Texts of the corpus hold 1-3 tokens; the historical unmasking cost grows with
+    # tokens x length, so show how both scale on longer generated texts.
+    print("Textes generes (v2), n placeholders par texte:")
+    for n in (2, 10, 50, 200):
+        text = " ".join(f"etape {i} : %{i + 1}$s sur {{{i}}}" for i in range(n))
+        t_old = bench(f"  n={n:<4} historique", v2_mask, v2_unmask, [text], args.repeat * 10)
+        t_new = bench(f"  n={n:<4} masking.Masker", NEW_V2.mask, unmask, [text], args.repeat * 10)
+        print(f"  gain x{t_old / t_new:.2f}")
+    print()
+
+    repaired, restored = 0, 0
+    for t in texts:
+        m, mp = NEW_V2.mask(t)
+        if not mp:
+            continue
+        fixes = []
+        if unmask(mangle(m), mp, fixes) == t:
+            restored += 1
+        repaired += len(fixes)
+    print(f"Tokens abimes (\"__ ph0 __\") repares: {repaired}, textes restaures: {restored}")
+
+if __name__ == "__main__":
+    main()
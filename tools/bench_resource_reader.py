@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark: full ElementTree parse vs streaming readers (tools_translate/android_resources.py).
+
+Compares, over every XML of the res tree:
+- names only:  ET.parse + findall (old check_duplicates)  vs  iter_resource_names (expat)
+- records:     ET.parse + resource_from_element            vs  iter_resources (iterparse + clear)
+Time is the best of --repeat passes; memory is the tracemalloc peak of one pass.
+
+--big N also generates a values file with N strings in a temp folder, to show
+that the streaming readers keep memory flat when a file grows.
+
+  py tools/bench_resource_reader.py --res app/src/main/res --repeat 5 --big 50000
+"""
+import argparse, sys, tempfile, time, tracemalloc
+from pathlib import Path
+import xml.etree.ElementTree as ET
+
+# Shared i18n helpers live in tools_translate/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "tools_translate"))
+from android_resources import LOCALIZABLE_TAGS, iter_resource_names, iter_resources, resource_from_element
+
+def names_etree(path):
+    root = ET.parse(path).getroot()
+    return [e.attrib.get("name") for tag in LOCALIZABLE_TAGS for e in root.findall(tag)]
+
+def names_stream(path):
+    return [n for _, n in iter_resource_names(path)]
+
+def records_etree(path):
+    root = ET.parse(path).getroot()
+    if root.tag != "resources":
+        return []
+    return [r for r in (resource_from_element(e) for e in root) if r is not None]
+
+def records_stream(path):
+    return list(iter_resources(path))
+
+CASES = [
+    ("noms     ET.parse + findall", names_etree),
+    ("noms     expat (iter_resource_names)", names_stream),
+    ("records  ET.parse + resource_from_element", records_etree),
+    ("records  iterparse + clear (iter_resources)", records_stream),
+]
+
+def run_pass(fn, files):
+    n = 0
+    for f in files:
+        try:
+            n += len(fn(f))
+        except Exception:
+            pass  # invalid XML: same for every reader
+    return n
+
+def timed(fn, files, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        n = run_pass(fn, files)
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best, n
+
+def peak_memory(fn, files):
+    tracemalloc.start()
+    try:
+        run_pass(fn, files)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def write_big_file(folder: Path, count: int) -> Path:
+    p = folder / "strings_big.xml"
+    with open(p, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="utf-8"?>\n<resources xmlns:xliff="urn:oasis:names:tc:xliff:document:1.2">\n')
+        for i in range(count):
+            f.write(f'    <string name="s{i}">Texte numero {i} avec <xliff:g id="n">%{i % 9 + 1}$d</xliff:g> elements</string>\n')
+        f.write("</resources>\n")
+    return p
+
+def report(title, files, repeat):
+    print(f"\n=== {title} ({len(files)} fichiers) ===")
+    print(f"{'lecteur':<46} {'temps (ms)':>10} {'pic memoire (Ko)':>17} {'ressources':>11}")
+    for label, fn in CASES:
+        dt, n = timed(fn, files, repeat)
+        peak = peak_memory(fn, files)
+        print(f"{label:<46} {dt * 1000:>10.1f} {peak / 1024:>17.0f} {n:>11}")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--res", default="app/src/main/res", help="Path to app/src/main/res")
+    ap.add_argument("--repeat", type=int, default=5, help="Passes per reader (best time kept)")
+    ap.add_argument("--big", type=int, default=0, help="Also bench one generated file with N strings")
+    args = ap.parse_args()
+
+    res = Path(args.res)
+    files = sorted(p for p in res.rglob("*.xml") if p.is_file())
+    if not files:
+        raise SystemExit(f"Aucun XML dans {res}")
+    report(f"arbre res: {res}", files, args.repeat)
+
+    if args.big > 0:
+        with tempfile.TemporaryDirectory() as tmp:
+            big = write_big_file(Path(tmp), args.big)
+            report(f"fichier genere: {args.big} strings, {big.stat().st_size // 1024} Ko", [big], args.repeat)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark of the three translators against the mock LibreTranslate
+(tools_translate/mock_libretranslate.py), on the real values-fr corpus.
+
+For each tool (v1, v2, local) and each --repeat, the corpus is copied to a fresh
+temp project, the mock server is reset, and the translator runs in its own
+process with --no-tm (every string goes to the server); v2 keeps its manifest
+and work journal in the temp project, never touching the user's. Reported per run:
+wall time, requests, segments, strings/s (source strings x targets / wall),
+requests/s, server-side latency p50/p95, failed/busy answers.
+
+  py tools/bench_translators.py --targets en,de,es --latency lognormal:0.03,0.5 --jobs 4
+  py tools/bench_translators.py --tools v2 --error-rate 0.05 --model-load 1 --json bench.json
+"""
+import argparse, json, shutil, subprocess, sys, tempfile, time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+TOOLS_DIR = ROOT / "tools_translate"
+sys.path.insert(0, str(TOOLS_DIR))
+import mock_libretranslate as mock
+from android_resources import iter_resources
+
+TOOLS = ("v1", "v2", "local")
+
+def count_strings(values: Path):
+    n = 0
+    for f in sorted(values.glob("*.xml")):
+        try:
+            n += sum(1 for r in iter_resources(f) if r.translatable for it in r.items if it.text.strip())
+        except Exception:
+            pass
+    return n
+
+def make_project(tmp: Path, corpus: Path, source_lang: str, targets):
+    """Temp project: corpus as res/values, plus the locales_config.xml of translate_resources_local."""
+    res = tmp / "app" / "src" / "main" / "res"
+    shutil.copytree(corpus, res / "values")
+    locales = "".join(f'<locale android:name="{l}"/>' for l in [source_lang, *targets])
+    (tmp / "locales_config.xml").write_text(
+        f'<locale-config xmlns:android="http://schemas.android.com/apk/res/android">{locales}</locale-config>\n',
+        encoding="utf-8")
+    return res
+
+def command(tool, tmp: Path, res: Path, endpoint, source_lang, targets, jobs):
+    py = sys.executable
+    if tool == "v1":
+        return [py, str(TOOLS_DIR / "translate_android_strings_libretranslate.py"), "--res", str(res),
+                "--source-dir", str(res / "values"), "--targets", ",".join(targets), "--endpoint", endpoint,
+                "--source-lang", source_lang, "--no-tm", "--jobs", str(jobs)]
+    if tool == "v2":
+        return [py, str(TOOLS_DIR / "translate_android_strings_libretranslate_v2.py"), "--res", str(res),
+                "--source-dir", str(res / "values"), "--targets", ",".join(targets), "--endpoint", endpoint,
+                "--source-lang", source_lang, "--no-tm", "--jobs", str(jobs), "--manifest", str(tmp / "manifest.json"),
+                "--journal", str(tmp / "journal.jsonl")]
+    return [py, str(ROOT / "tools" / "translate_resources_local.py"), "--project", str(tmp), "--source", source_lang,
+            "--endpoint", endpoint, "--locales-config", "locales_config.xml", "--no-tm", "--jobs", str(jobs)]
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    s = sorted(values)
+    return s[min(len(s) - 1, int(round(p / 100.0 * (len(s) - 1))))]
+
+def run_one(tool, server, corpus, args, targets, strings):
+    with tempfile.TemporaryDirectory(prefix=f"bench_{tool}_") as tmp:
+        tmp = Path(tmp)
+        res = make_project(tmp, corpus, args.source_lang, targets)
+        cmd = command(tool, tmp, res, server.endpoint, args.source_lang, targets, args.jobs)
+        server.stats.reset()
+        t0 = time.perf_counter()
+        proc = subprocess.run(cmd, cwd=str(tmp), capture_output=True, text=True, encoding="utf-8", errors="replace")
+        wall = time.perf_counter() - t0
+        st = server.stats.snapshot()
+        if proc.returncode != 0:
+            print(f"[WARN] {tool}: code retour {proc.returncode}\n{proc.stdout[-800:]}{proc.stderr[-800:]}")
+    lat = st["latencies"]
+    return {
+        "tool": tool, "wall_s": round(wall, 3), "requests": st["requests"], "segments": st["segments"],
+        "strings_per_s": round(strings * len(targets) / wall, 1), "requests_per_s": round(st["requests"] / wall, 1),
+        "p50_ms": round(percentile(lat, 50) * 1000, 1), "p95_ms": round(percentile(lat, 95) * 1000, 1),
+        "errors": st["errors"], "busy": st["busy"], "exit_code": proc.returncode,
+    }
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--corpus", default=str(ROOT / "app" / "src" / "main" / "res" / "values-fr"), help="Source values folder")
+    ap.add_argument("--source-lang", default="fr")
+    ap.add_argument("--targets", default="en,de,es")
+    ap.add_argument("--tools", default=",".join(TOOLS), help=f"Comma separated subset of: {', '.join(TOOLS)}")
+    ap.add_argument("--jobs", type=int, default=4, help="--jobs passed to every translator")
+    ap.add_argument("--repeat", type=int, default=1, help="Runs per tool")
+    ap.add_argument("--json", default="", help="Also write the results to this JSON file")
+    mock.add_arguments(ap)
+    args = ap.parse_args()
+
+    corpus = Path(args.corpus)
+    targets = [t.strip() for t in args.targets.split(",") if t.strip()]
+    tools = [t.strip() for t in args.tools.split(",") if t.strip()]
+    if any(t not in TOOLS for t in tools):
+        raise SystemExit(f"[ERREUR] Outils possibles: {', '.join(TOOLS)}")
+    strings = count_strings(corpus)
+    if not strings:
+        raise SystemExit(f"[ERREUR] Aucun texte dans {corpus}")
+
+    server = mock.MockServer("127.0.0.1", 0, mock.config_from_args(args))
+    server.start_background()
+    print(f"Corpus: {corpus} ({strings} textes), cibles: {', '.join(targets)}, jobs: {args.jobs}")
+    print(f"Mock: {server.endpoint} latence={args.latency} erreurs={args.error_rate} chargement modele={args.model_load}s\n")
+    print(f"{'outil':<6} {'duree (s)':>9} {'requetes':>9} {'segments':>9} {'textes/s':>9} {'req/s':>7} "
+          f"{'p50 (ms)':>9} {'p95 (ms)':>9} {'err':>5} {'busy':>5}")
+    results = []
+    try:
+        for tool in tools:
+            for _ in range(args.repeat):
+                # Models "load" again for every run, like a fresh server
+                server.config.models.clear()
+                r = run_one(tool, server, corpus, args, targets, strings)
+                results.append(r)
+                print(f"{r['tool']:<6} {r['wall_s']:>9.2f} {r['requests']:>9} {r['segments']:>9} {r['strings_per_s']:>9.1f} "
+                      f"{r['requests_per_s']:>7.1f} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['errors']:>5} {r['busy']:>5}")
+    finally:
+        server.shutdown()
+        server.server_close()
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=1), encoding="utf-8")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Scenario check of the circuit breaker of tools_translate/http_client.py, without a server.
+
+HttpClient._send is replaced by a script of outcomes (exception or body), with
+threshold=1 and a short cooldown:
+- stuck probe: a network error trips the breaker, the half-open probe gets a
+  503 busy answer, the server then recovers -> requests must go through again
+  after the next cooldown (they used to fail with BackendUnavailable forever)
+- failed probe: a probe hitting a network error doubles the cooldown
+- recovery: a successful probe closes the breaker
+Exit code 1 on the first failed scenario.
+
+  py tools/check_circuit_breaker.py
+"""
+import sys, time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "tools_translate"))
+from http_client import HttpClient, HttpError
+from rate_control import BackendUnavailable, CircuitBreaker, RetryPolicy
+
+COOLDOWN = 0.05
+
+def make_client(script):
+    """Client whose _send() returns / raises the items of script in order."""
+    breaker = CircuitBreaker(threshold=1, cooldown=COOLDOWN, max_cooldown=1.0)
+    client = HttpClient(pool_size=1, retry=RetryPolicy(retries=0), breaker=breaker)
+    outcomes = iter(script)
+
+    def send(method, url, body, headers):
+        out = next(outcomes)
+        if isinstance(out, BaseException):
+            raise out
+        return out
+    client._send = send
+    return client
+
+def call(client):
+    """'ok', or the name of the exception raised."""
+    try:
+        client.request("POST", "http://127.0.0.1:1/translate", b"{}")
+        return "ok"
+    except Exception as e:
+        return type(e).__name__
+
+def wait_cooldown(client):
+    time.sleep(client.breaker.cooldown + 0.02)
+
+def busy():
+    return HttpError(503, "busy", b"busy")
+
+def scenario_stuck_probe():
+    c = make_client([OSError("down"), busy(), b"{}", b"{}"])
+    got = [call(c)]                 # trips
+    wait_cooldown(c)
+    got.append(call(c))             # probe answered 503
+    got.append(call(c))             # still within the cooldown
+    wait_cooldown(c)
+    got.append(call(c))             # new probe, server back
+    got.append(call(c))
+    return got == ["OSError", "HttpError", "BackendUnavailable", "ok", "ok"] and not c.breaker.is_open, got
+
+def scenario_failed_probe():
+    c = make_client([OSError("down"), OSError("still down")])
+    got = [call(c)]
+    wait_cooldown(c)
+    got.append(call(c))
+    got.append(call(c))
+    return got == ["OSError", "OSError", "BackendUnavailable"] and c.breaker.cooldown == 2 * COOLDOWN, got
+
+def scenario_recovery():
+    c = make_client([OSError("down"), b"{}", b"{}"])
+    got = [call(c)]
+    wait_cooldown(c)
+    got += [call(c), call(c)]
+    return got == ["OSError", "ok", "ok"] and not c.breaker.is_open and c.breaker.trips == 1, got
+
+def main():
+    failed = 0
+    for name, scenario in (("stuck probe", scenario_stuck_probe), ("failed probe", scenario_failed_probe),
+                           ("recovery", scenario_recovery)):
+        ok, got = scenario()
+        print(f"{'[OK]' if ok else '[FAIL]'} {name}: {' -> '.join(got)}")
+        failed += not ok
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
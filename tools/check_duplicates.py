@@ -1,59 +1,84 @@
 #!/usr/bin/env python3
-import argparse, os, re
+"""
+One pass over the res tree, four reports (see tools_translate/resource_index.py):
+- duplicates: same type + name declared twice in one values* folder (breaks AAPT)
+- missing:    translatable keys of values/ absent from a locale
+- extra:      keys of a locale that values/ does not declare (orphans)
+- identical:  keys whose locale text is still the source text
+
+  py tools/check_duplicates.py --res app/src/main/res
+  py tools/check_duplicates.py --res app/src/main/res --checks duplicates --jobs 8
+
+The parsed files are cached in tools_translate/resource_index.sqlite3; --no-index
+parses everything again.
+"""
+import argparse, os, sys
 from pathlib import Path
-import xml.etree.ElementTree as ET
-
-def iter_xml_files(folder: Path):
-    for p in folder.rglob("*.xml"):
-        # Only resource XML in values* folders
-        if p.parent.name.startswith("values"):
-            yield p
-
-def extract_names(xml_path: Path):
-    try:
-        root = ET.parse(xml_path).getroot()
-    except Exception:
-        return []
-    names = []
-    # <string name="...">
-    for e in root.findall("string"):
-        n = e.attrib.get("name")
-        if n: names.append(n)
-    # <string-array name="...">
-    for arr in root.findall("string-array"):
-        n = arr.attrib.get("name")
-        if n: names.append(n)
-    # <plurals name="...">
-    for pl in root.findall("plurals"):
-        n = pl.attrib.get("name")
-        if n: names.append(n)
-    return names
+
+# Shared i18n helpers live in tools_translate/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "tools_translate"))
+from resource_index import DEFAULT_INDEX_PATH, SOURCE_FOLDER, build_index, load_index
+
+CHECKS = ("duplicates", "missing", "extra", "identical")
+
+def fmt_keys(keys):
+    return [f"- {t}/{n}" for t, n in sorted(keys)]
+
+def report_duplicates(index):
+    found = False
+    for folder in index.folders:
+        dups = index.duplicates(folder)
+        if not dups:
+            continue
+        found = True
+        print(f"\n=== Duplicates in {folder} ({len(dups)}) ===")
+        for (rtype, name), locs in sorted(dups.items()):
+            print(f"- {rtype}/{name}")
+            for loc in locs:
+                print(f"  {loc.file}:{loc.line}")
+    if not found:
+        print("OK: Aucun duplicate detecte dans les dossiers values*.")
+    return found
+
+def report_per_locale(index, check, title, source):
+    found = False
+    for locale in index.locales:
+        keys = getattr(index, check)(locale, source)
+        if keys:
+            found = True
+            print(f"\n=== {title} {locale} ({len(keys)}) ===")
+            print("\n".join(fmt_keys(keys)))
+    if not found:
+        print(f"OK: {check}: rien a signaler.")
+    return found
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--res", required=True, help="Path to app/src/main/res")
+    ap.add_argument("--checks", default=",".join(CHECKS), help=f"Comma separated subset of: {', '.join(CHECKS)}")
+    ap.add_argument("--source", default=SOURCE_FOLDER, help="Reference folder for missing/extra/identical")
+    ap.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Processes used to parse the XML files")
+    ap.add_argument("--index", default=str(DEFAULT_INDEX_PATH), help="Index cache (only changed files are reparsed)")
+    ap.add_argument("--no-index", action="store_true", help="Parse every file, without the index cache")
     args = ap.parse_args()
 
+    checks = [c.strip() for c in args.checks.split(",") if c.strip()]
+    unknown = [c for c in checks if c not in CHECKS]
+    if unknown:
+        raise SystemExit(f"[ERREUR] Verification inconnue: {', '.join(unknown)}")
+
     res = Path(args.res)
-    values_folders = [p for p in res.iterdir() if p.is_dir() and p.name.startswith("values")]
-    any_dup = False
-
-    for vf in sorted(values_folders, key=lambda p: p.name):
-        seen = {}
-        dups = []
-        for xml in iter_xml_files(vf):
-            for name in extract_names(xml):
-                if name in seen:
-                    dups.append((name, seen[name], xml))
-                else:
-                    seen[name] = xml
-        if dups:
-            any_dup = True
-            print(f"\n=== Duplicates in {vf.name} ===")
-            for name, first, second in dups:
-                print(f"- {name}\n  first:  {first}\n  second: {second}")
-    if not any_dup:
-        print("OK: Aucun duplicate detecte dans les dossiers values*.")
+    index = build_index(res, args.jobs) if args.no_index else load_index(res, args.jobs, args.index)
+    for err in index.errors:
+        print(f"[WARN] XML illisible: {err}")
+    if "duplicates" in checks:
+        report_duplicates(index)
+    if args.source not in index.folders and any(c != "duplicates" for c in checks):
+        raise SystemExit(f"[ERREUR] Dossier source introuvable: {args.source}")
+    titles = {"missing": "Missing in", "extra": "Not in source:", "identical": "Same text as source in"}
+    for check in CHECKS[1:]:
+        if check in checks:
+            report_per_locale(index, check, titles[check], args.source)
 
 if __name__ == "__main__":
     main()
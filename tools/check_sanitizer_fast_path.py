@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Equivalence check + timing for the sanitizer fast path (tools_translate/sanitize_android_resources.py).
+
+The historical char-by-char _fix_invalid_backslashes loop is kept below as the
+reference. The regex version must give the same (text, occurrences) on:
+- hand-written edge cases (runs of backslashes, truncated unicode escapes, end of text...)
+- every XML of the project (res tree and the old backup folders of tools_translate)
+- random strings made of the characters that matter (seeded, reproducible)
+Exit code 1 on the first difference.
+
+  py tools/check_sanitizer_fast_path.py --fuzz 200000
+"""
+import argparse, random, re, sys, time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "tools_translate"))
+import sanitize_android_resources as san
+
+# -- historical implementation (reference) -----------------------------------
+
+_HEX4 = re.compile(r"^[0-9a-fA-F]{4}$")
+
+def reference_fix(s):
+    if "\\" not in s:
+        return s, 0
+    out = []
+    i = 0
+    occ = 0
+    n = len(s)
+    while i < n:
+        ch = s[i]
+        if ch != "\\":
+            out.append(ch)
+            i += 1
+            continue
+        j = i
+        while j < n and s[j] == "\\":
+            j += 1
+        run_len = j - i
+        if run_len >= 2:
+            out.append("\\" * run_len)
+            i = j
+            continue
+        if j >= n:
+            out.append("\\\\")
+            occ += 1
+            i = j
+            continue
+        nxt = s[j]
+        if nxt in san._ALLOWED_ESCAPES:
+            out.append("\\")
+            out.append(nxt)
+            i = j + 1
+            continue
+        if nxt == "u":
+            hex_part = s[j + 1 : j + 5] if (j + 5) <= n else ""
+            if len(hex_part) == 4 and _HEX4.match(hex_part):
+                out.append("\\u")
+                out.append(hex_part)
+                i = j + 5
+                continue
+            out.append("\\\\u")
+            occ += 1
+            i = j + 1
+            continue
+        if nxt == "U":
+            out.append("\\\\U")
+            occ += 1
+            i = j + 1
+            continue
+        out.append("\\\\")
+        out.append(nxt)
+        occ += 1
+        i = j + 1
+    return "".join(out), occ
+
+# -- cases -------------------------------------------------------------------
+
+BS = "\\"
+EDGE_CASES = [
+    "", "abc", BS, BS * 2, BS * 3, BS * 4, "a" + BS, BS + "a",
+    BS + "n", BS + "t", BS + "r", BS + "b", BS + "'", BS + '"', BS + "@", BS + "?",
+    BS + "u", BS + "u1", BS + "u12", BS + "u123", BS + "u1234", BS + "u12345", BS + "uABCD", BS + "uabcg",
+    BS + "u12\n4", BS + "u123\n", BS + "U", BS + "U0001F600", BS + "x", BS + "\n", BS + " ", BS + "é",
+    BS * 2 + "u", BS * 2 + "q", BS * 3 + "q", BS * 3 + "n", "C:" + BS + "Users" + BS + "me",
+    "L'eau " + BS + "'ok" + BS + "' " + BS + "s", BS + "u00e9t" + BS + "u00E9" + BS,
+    "<string name=\"a\">50 " + BS + "% " + BS + "n" + BS + "</string>",
+]
+
+FUZZ_ALPHABET = [BS] * 6 + list("nturUbq'\"@?x0123456789abcdefABCDEFg\n é")
+
+def fuzz_strings(count, seed=1234):
+    rnd = random.Random(seed)
+    for _ in range(count):
+        yield "".join(rnd.choice(FUZZ_ALPHABET) for _ in range(rnd.randint(0, 24)))
+
+def project_texts():
+    for p in sorted(ROOT.glob("app/src/main/res/**/*.xml")) + sorted(ROOT.glob("tools_translate/**/*.xml")):
+        try:
+            yield p, p.read_bytes().decode("utf-8-sig")
+        except (OSError, UnicodeDecodeError):
+            continue
+
+def check(label, items):
+    n = 0
+    for name, s in items:
+        n += 1
+        exp = reference_fix(s)
+        got = san._fix_invalid_backslashes(s)
+        if exp != got:
+            print(f"[ERREUR] {label}: difference sur {name!r}")
+            print(f"  entree:    {s!r}")
+            print(f"  reference: {exp!r}")
+            print(f"  regex:     {got!r}")
+            return False
+    print(f"[OK] {label}: {n} textes identiques")
+    return True
+
+def best_of(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--fuzz", type=int, default=200000, help="Number of random strings")
+    ap.add_argument("--repeat", type=int, default=5, help="Passes for the timings (best kept)")
+    args = ap.parse_args()
+
+    texts = list(project_texts())
+    ok = (check("cas limites", ((c, c) for c in EDGE_CASES))
+          and check("fichiers du projet", ((str(p.relative_to(ROOT)), s) for p, s in texts))
+          and check("aleatoire", ((i, s) for i, s in enumerate(fuzz_strings(args.fuzz)))))
+    if not ok:
+        return 1
+
+    # Timings on the files the sanitizer really scans: values-xx folders
+    res = ROOT / "app" / "src" / "main" / "res"
+    files = [p for d in sorted(res.iterdir()) if san._is_language_values_dir(d) for p in sorted(d.glob("*.xml"))]
+    with_bs = [t for t in (p.read_bytes().decode("utf-8-sig") for p in files) if "\\" in t]
+
+    def old_scan():
+        for p in files:
+            reference_fix(p.read_bytes().decode("utf-8-sig"))
+
+    def new_scan():
+        for p in files:
+            raw = san._read_if_backslash(p)
+            if raw is not None:
+                san._fix_invalid_backslashes(raw.decode("utf-8-sig"))
+
+    print(f"\nvalues-xx: {len(files)} fichiers, {len(with_bs)} avec backslash")
+    t_old = best_of(lambda: [reference_fix(t) for t in with_bs], args.repeat)
+    t_new = best_of(lambda: [san._fix_invalid_backslashes(t) for t in with_bs], args.repeat)
+    print(f"correction (fichiers avec backslash): boucle {t_old * 1000:.1f} ms, regex {t_new * 1000:.1f} ms (x{t_old / t_new:.0f})")
+    t_old = best_of(old_scan, args.repeat)
+    t_new = best_of(new_scan, args.repeat)
+    print(f"lecture + correction (tous):          avant {t_old * 1000:.1f} ms, apres {t_new * 1000:.1f} ms (x{t_old / t_new:.1f})")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
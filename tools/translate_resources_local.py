@@ -1,25 +1,27 @@
 #!/usr/bin/env python3
-import argparse, json, os, re, time, zipfile, datetime
+import argparse, copy, json, os, sys, time
 from pathlib import Path
 import xml.etree.ElementTree as ET
-from urllib.request import Request, urlopen
-from urllib.error import URLError, HTTPError
 
-PLACEHOLDER_RE = re.compile(
-    r'%(?:\d+\$)?[-+# 0,(]*\d*(?:\.\d+)?[a-zA-Z]|%%'
-)
-
-TAG_RE = re.compile(r'<[^>]+>')  # basic HTML-like tags inside strings
-
-def http_json(method, url, payload=None, timeout=30):
-    data = None
-    headers = {"Accept": "application/json"}
+# Shared i18n helpers live in tools_translate/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "tools_translate"))
+import http_client
+import masking
+import metrics
+from android_resources import has_localizable_resources
+from file_writer import WriteStats, write_if_changed
+from masking import Masker, unmask
+from snapshot_store import snapshot_res
+from translation_memory import DEFAULT_TM_PATH, TranslationMemory, add_fuzzy_arguments, backend_id, configure_fuzzy
+from work_pool import ErrorSummary, run_ordered
+
+# Placeholders, then basic HTML-like tags inside strings (__PHn__ / __TAGn__)
+MASKER = Masker([("PH", masking.PRINTF), ("TAG", masking.MARKUP)], per_kind=True)
+
+def http_json(method, url, payload=None):
     if payload is not None:
-        data = json.dumps(payload).encode("utf-8")
-        headers["Content-Type"] = "application/json; charset=utf-8"
-    req = Request(url, data=data, headers=headers, method=method)
-    with urlopen(req, timeout=timeout) as resp:
-        return json.loads(resp.read().decode("utf-8"))
+        return http_client.client().post_json(url, payload)
+    return json.loads(http_client.client().request(method, url, headers={"Accept": "application/json"}).decode("utf-8"))
 
 def list_languages(endpoint):
     try:
@@ -29,47 +31,37 @@ def list_languages(endpoint):
     except Exception:
         return {}
 
-def protect(text):
-    # Protect placeholders and tags so the translator doesn't break them
-    ph_map = {}
-    tag_map = {}
-
-    def ph_repl(m):
-        token = f"__PH{len(ph_map)}__"
-        ph_map[token] = m.group(0)
-        return token
-
-    def tag_repl(m):
-        token = f"__TAG{len(tag_map)}__"
-        tag_map[token] = m.group(0)
-        return token
-
-    t = PLACEHOLDER_RE.sub(ph_repl, text)
-    t = TAG_RE.sub(tag_repl, t)
-    return t, ph_map, tag_map
-
-def unprotect(text, ph_map, tag_map):
-    t = text
-    # restore tags first (order doesn't matter much)
-    for token, val in tag_map.items():
-        t = t.replace(token, val)
-    for token, val in ph_map.items():
-        t = t.replace(token, val)
-    return t
-
-def translate(endpoint, source, target, text):
+def translate(endpoint, source, target, text, tm=None):
     if not text.strip():
         return text
-    protected, ph_map, tag_map = protect(text)
-    payload = {
-        "q": protected,
-        "source": source,
-        "target": target,
-        "format": "text"
-    }
-    res = http_json("POST", endpoint.rstrip("/") + "/translate", payload=payload)
-    translated = res.get("translatedText", "")
-    out = unprotect(translated, ph_map, tag_map)
+    m = metrics.current()
+    # Protect placeholders and tags so the translator doesn't break them
+    with m.phase("mask"):
+        protected, tok_map = MASKER.mask(text)
+    m.add("segments")
+    with m.phase("tm"):
+        translated = tm.get(protected, source, target) if tm is not None else None
+    if translated is None:
+        payload = {
+            "q": protected,
+            "source": source,
+            "target": target,
+            "format": "text"
+        }
+        m.add("segments_sent")
+        m.add("chars_sent", len(protected))
+        t0 = time.perf_counter()
+        try:
+            with m.phase("http"):
+                res = http_json("POST", endpoint.rstrip("/") + "/translate", payload=payload)
+        finally:
+            m.observe("target", target, time.perf_counter() - t0)
+        translated = res.get("translatedText", "")
+        if translated and tm is not None:
+            with m.phase("tm"):
+                tm.put(protected, source, target, translated)
+    with m.phase("unmask"):
+        out = unmask(translated, tok_map)
     return out if out else text
 
 def should_translate_elem(elem):
@@ -86,23 +78,11 @@ def has_translatable_content(root):
     # any string / string-array / plurals present
     return (root.find("string") is not None) or (root.find("string-array") is not None) or (root.find("plurals") is not None)
 
-def backup_res(project_path: Path):
-    ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    out = project_path / f"translations_backup_{ts}.zip"
-    res = project_path / "app" / "src" / "main" / "res"
-    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as z:
-        if res.exists():
-            for p in res.rglob("*"):
-                if p.is_file():
-                    z.write(p, p.relative_to(project_path))
-    return out
-
-def write_xml(root, out_path: Path):
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    # Write with utf-8 xml header
+def write_xml(root, out_path: Path, writes=None):
+    # Write with utf-8 xml header; atomic, and skipped when the bytes did not change
     xml_bytes = ET.tostring(root, encoding="utf-8")
     content = b'<?xml version="1.0" encoding="utf-8"?>\n' + xml_bytes
-    out_path.write_bytes(content)
+    return write_if_changed(out_path, content, writes)
 
 def parse_locales(locales_config_path: Path):
     root = ET.parse(locales_config_path).getroot()
@@ -143,57 +123,94 @@ def map_to_libre_code(locale: str, available_codes: set):
         return lang
     return None
 
-def translate_file(endpoint, source_code, target_code, in_path: Path, out_path: Path):
-    try:
+def apply_overrides(root, override_path: Path):
+    """Layer a per-variant override file on a translated tree (in place).
+
+    Each resource of the override file replaces the one with the same tag and name,
+    or is added when the translation has none.
+    """
+    index = {(el.tag, el.get("name")): i for i, el in enumerate(root)}
+    for el in ET.parse(override_path).getroot():
+        if not isinstance(el.tag, str) or el.get("name") is None:
+            continue
+        i = index.get((el.tag, el.get("name")))
+        # Keep the layout of the translated file: tails carry its line breaks / indentation
+        if i is None:
+            el.tail = root[-1].tail if len(root) else "\n"
+            index[(el.tag, el.get("name"))] = len(root)
+            root.append(el)
+        else:
+            el.tail = root[i].tail
+            root[i] = el
+
+def translate_file(endpoint, source_code, target_code, in_path: Path, out_paths, tm=None, writes=None,
+                   overrides_dir=None):
+    """Returns (produced, written, failures); failures lists (resource name, error) left in the source language.
+
+    The file is translated once and written to every path of out_paths (the folders of
+    Android locales sharing this backend code, e.g. values-pt and values-pt-rBR).
+    overrides_dir/<folder>/<file name>, when it exists, is layered on that folder's copy.
+    produced counts the output files generated (0 when the source has nothing to translate
+    and no file is written), written those whose bytes changed on disk (see write_if_changed).
+
+    An unreadable XML raises: it is reported by the caller instead of being skipped silently.
+    """
+    # The whole file is rewritten (non-localizable children included), so it needs the
+    # full tree; files without any string/array/plurals are skipped before building it.
+    if not has_localizable_resources(in_path):
+        return 0, 0, []
+    m = metrics.current()
+    t0 = time.perf_counter()
+    with m.phase("parse"):
         tree = ET.parse(in_path)
-        root = tree.getroot()
-    except Exception:
-        return False
+    root = tree.getroot()
 
-    changed = False
+    failures = []
+
+    def translate_node(node, name):
+        text = node.text or ""
+        # keep empty or non-text nodes
+        if not text.strip():
+            return
+        try:
+            new = translate(endpoint, source_code, target_code, text, tm)
+        except Exception as e:
+            if not any(n == name for n, _ in failures):
+                failures.append((name, str(e)))
+            return
+        if new != text:
+            node.text = new
 
     # strings
     for s in root.findall("string"):
         if not should_translate_elem(s):
             continue
-        text = s.text or ""
-        # keep empty or non-text nodes
-        if text.strip():
-            new = translate(endpoint, source_code, target_code, text)
-            if new != text:
-                s.text = new
-                changed = True
-
-    # string arrays
-    for arr in root.findall("string-array"):
-        if not should_translate_elem(arr):
-            continue
-        for item in arr.findall("item"):
-            text = item.text or ""
-            if text.strip():
-                new = translate(endpoint, source_code, target_code, text)
-                if new != text:
-                    item.text = new
-                    changed = True
-
-    # plurals
-    for pl in root.findall("plurals"):
-        if not should_translate_elem(pl):
-            continue
-        for item in pl.findall("item"):
-            text = item.text or ""
-            if text.strip():
-                new = translate(endpoint, source_code, target_code, text)
-                if new != text:
-                    item.text = new
-                    changed = True
+        translate_node(s, s.get("name", ""))
+
+    # string arrays and plurals
+    for tag in ("string-array", "plurals"):
+        for elem in root.findall(tag):
+            if not should_translate_elem(elem):
+                continue
+            for item in elem.findall("item"):
+                translate_node(item, elem.get("name", ""))
 
     # If no translatable nodes, don't write
     if not has_translatable_content(root):
-        return False
-
-    write_xml(root, out_path)
-    return True
+        return 0, 0, failures
+
+    written = 0
+    with m.phase("write"):
+        for out_path in out_paths:
+            override = overrides_dir / out_path.parent.name / out_path.name if overrides_dir else None
+            if override is not None and override.is_file():
+                variant = copy.deepcopy(root)
+                apply_overrides(variant, override)
+                written += write_xml(variant, out_path, writes)
+            else:
+                written += write_xml(root, out_path, writes)
+    m.observe("file", f"{out_paths[0].parent.name}/{in_path.name}", time.perf_counter() - t0)
+    return len(out_paths), written, failures
 
 def main():
     ap = argparse.ArgumentParser()
@@ -201,8 +218,21 @@ def main():
     ap.add_argument("--source", default="fr", help="Source language (default fr)")
     ap.add_argument("--endpoint", default="http://localhost:5000", help="LibreTranslate endpoint")
     ap.add_argument("--locales-config", required=True, help="Path to locales_config.xml")
-    ap.add_argument("--sleep", type=float, default=0.05, help="Sleep between requests (seconds)")
+    ap.add_argument("--sleep", type=float, default=0.0,
+                    help="Extra fixed pause after each file, per worker (seconds). Not needed: the request rate adapts to the server")
+    ap.add_argument("--jobs", type=int, default=4, help="Files translated in parallel (= max requests in flight)")
+    ap.add_argument("--overrides", default="i18n_overrides",
+                    help="Per-variant override files: <dir>/values-pt-rBR/strings.xml is layered on values-pt-rBR/strings.xml (relative to --project)")
+    http_client.add_arguments(ap)
+    ap.add_argument("--tm", default=str(DEFAULT_TM_PATH), help="Translation memory file (SQLite)")
+    ap.add_argument("--no-tm", action="store_true", help="Do not use the translation memory")
+    add_fuzzy_arguments(ap)
+    ap.add_argument("--report", default="", help="Write the untranslated resources / errors to this JSON file")
+    metrics.add_arguments(ap)
     args = ap.parse_args()
+    metrics.run_profiled(args.profile, lambda: run(args))
+
+def run(args):
 
     project = Path(args.project).resolve()
     res = project / "app" / "src" / "main" / "res"
@@ -215,6 +245,7 @@ def main():
     if not locales_cfg.exists():
         raise SystemExit(f"Impossible de trouver {locales_cfg}")
 
+    http_client.configure_from_args(args, pool_size=args.jobs)
     print("Endpoint:", args.endpoint)
     langs = list_languages(args.endpoint)
     if langs:
@@ -222,9 +253,10 @@ def main():
     else:
         print("ATTENTION: Impossible de lire /languages. Le serveur LibreTranslate tourne bien ? http://localhost:5000")
 
-    # Backup
-    backup = backup_res(project)
-    print("Backup cree:", backup.name)
+    # Backup: snapshot of res/ in .res_snapshots (only new contents are stored)
+    backup = snapshot_res(project, label="translate_resources_local")
+    print(f"Backup cree: snapshot {backup.id} ({backup.files} fichiers, {backup.new_blobs} nouveaux)"
+          f" - restauration: py tools_translate/snapshot_store.py restore {backup.id}")
 
     locales = parse_locales(locales_cfg)
     # Remove source locale
@@ -233,33 +265,88 @@ def main():
     # list all values/*.xml
     files = sorted([p for p in values_fr.glob("*.xml") if p.is_file()])
 
-    total_written = 0
+    tm = None if args.no_tm else TranslationMemory(Path(args.tm), backend=backend_id(args.endpoint))
+    configure_fuzzy(tm, args)
+
+    # Plan: locales resolving to the same backend code (pt / pt-BR -> pt, zh / zh-CN -> zh)
+    # form one group, translated once and written to each of its folders
+    groups = {}
     for loc in locales:
         folder = android_locale_to_folder(loc)
-        target_dir = res / folder
         # determine libre code
         libre_code = map_to_libre_code(loc, set(langs.keys()) if langs else set())
         if libre_code is None and langs:
             print(f"[SKIP] {loc}: pas de modele/ langue dispo dans LibreTranslate (dossier {folder})")
             continue
-
         # If /languages wasn't available, try with just lang part
         target_code = libre_code if libre_code else loc.split("-")[0].lower()
-        print(f"\n=== {loc} -> {folder} (Libre: {target_code}) ===")
-
-        wrote_any = 0
-        for f in files:
-            in_path = f
-            out_path = target_dir / f.name
-            ok = translate_file(args.endpoint, args.source.lower(), target_code, in_path, out_path)
-            if ok:
-                wrote_any += 1
-                total_written += 1
+        groups.setdefault(target_code, []).append((loc, folder))
+    plan = [(code, members) for code, members in groups.items()]
+
+    overrides_dir = project / args.overrides
+    if not overrides_dir.is_dir():
+        overrides_dir = None
+    jobs = [(p, f) for p in plan for f in files]
+    writes = WriteStats()
+
+    def run_job(job):
+        (target_code, members), f = job
+        out_paths = [res / folder / f.name for _, folder in members]
+        result = translate_file(args.endpoint, args.source.lower(), target_code, f, out_paths, tm, writes, overrides_dir)
+        if args.sleep > 0:
             time.sleep(args.sleep)
-
-        print(f"Fichiers ecrits: {wrote_any}")
-
-    print("\nTermine. Total fichiers ecrits:", total_written)
+        return result
+
+    errors = ErrorSummary()
+    # translated: output files produced by translate_file; written: those whose bytes changed
+    total_translated = total_written = 0
+    translated_any = wrote_any = 0
+    current = None
+    for outcome in run_ordered(jobs, run_job, jobs=args.jobs):
+        (target_code, members), f = outcome.item
+        folders = ", ".join(folder for _, folder in members)
+        if target_code != current:
+            if current is not None:
+                print(f"Fichiers traduits: {translated_any} (ecrits: {wrote_any})")
+            current = target_code
+            translated_any = wrote_any = 0
+            print(f"\n=== {', '.join(loc for loc, _ in members)} -> {folders} (Libre: {target_code}) ===")
+        if outcome.error is not None:
+            print(f"[FAIL] {f.name}: {outcome.error}")
+            errors.add(f"{folders}/{f.name}", outcome.error)
+            continue
+        produced, written, failures = outcome.result
+        for name, msg in failures:
+            print(f"[FAIL] {f.name}:{name}: {msg}")
+            errors.add(f"{folders}/{f.name}:{name}", msg)
+        translated_any += produced
+        total_translated += produced
+        wrote_any += written
+        total_written += written
+    if current is not None:
+        print(f"Fichiers traduits: {translated_any} (ecrits: {wrote_any})")
+
+    if args.metrics:
+        metrics.current().write_json(Path(args.metrics), {
+            "tool": "local",
+            "http": http_client.client().stats(),
+            "tm": tm.stats() if tm is not None else None,
+            "files": {"written": writes.written, "unchanged": writes.skipped},
+            "errors": len(errors.errors),
+        })
+    if tm is not None:
+        print(tm.summary())
+        if args.fuzzy_report:
+            tm.write_fuzzy_report(Path(args.fuzzy_report))
+        tm.close()
+    print(http_client.client().summary())
+    http_client.client().close()
+    print(writes.summary())
+
+    errors.print()
+    if args.report:
+        errors.write_json(Path(args.report))
+    print(f"\nTermine. Total fichiers traduits: {total_translated}, ecrits: {total_written}")
     print("Conseil: Android Studio > Build > Clean puis Rebuild.")
 
 if __name__ == "__main__":
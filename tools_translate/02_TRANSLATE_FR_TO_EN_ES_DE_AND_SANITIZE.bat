@@ -19,7 +19,7 @@ py tools_translate\translate_android_strings_libretranslate_v2.py ^
   --targets "en,es,de" ^
   --source-lang "fr" ^
   --endpoint "http://127.0.0.1:5000" ^
-  --clean-target-dirs
+  --incremental
 
 if errorlevel 1 (
   echo.
@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+"""
+Compact model of Android localizable resources (string, string-array, plurals).
+
+A Resource keeps only what the translators need: tag, name, attributes and one
+Item per text (the <string> itself, or each <item>). Inline tags such as
+<xliff:g> or <b> are kept as raw XML fragments and appear in Item.text as
+__TAG0__, __TAG1__... tokens, so the text can be masked/translated as-is and
+written back without any ElementTree.
+
+serialize_resources() follows the layout of the historical ElementTree +
+indent() writer of the v2 translator (2-space indent, single quoted XML
+declaration), except that </string-array>, </plurals> and </resources> are
+closed at their own level (indent() left them one level too deep). The first
+run after that change rewrites every values-xx file once; files last written
+by other tools (double quoted declaration, &quot;, comments) are normalized
+the same way. Later runs are byte-stable.
+
+Reading is streamed: iter_resources() yields one Resource at a time and drops
+each element once converted, so memory does not grow with the file.
+iter_resource_names() only reports (tag, name) and builds no element at all
+(plain expat callbacks), for scans that need nothing else.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+from xml.parsers import expat
+
+from file_writer import WriteStats, write_if_changed
+
+XLIFF_NS = "urn:oasis:names:tc:xliff:document:1.2"
+TOOLS_NS = "http://schemas.android.com/tools"
+ANDROID_NS = "http://schemas.android.com/apk/res/android"
+ET.register_namespace("xliff", XLIFF_NS)
+
+LOCALIZABLE_TAGS = ("string", "string-array", "plurals")
+
+# Prefixes used when writing namespaced tags/attributes back
+_KNOWN_PREFIXES = {XLIFF_NS: "xliff", TOOLS_NS: "tools", ANDROID_NS: "android", "http://www.w3.org/XML/1998/namespace": "xml"}
+
+_RE_TAG_TOKEN = re.compile(r"__TAG(\d+)__")
+
+
+def tag_token(i: int) -> str:
+    return f"__TAG{i}__"
+
+
+class Item:
+    """Text content of a <string> or of one <item>."""
+
+    __slots__ = ("attrib", "text", "tags")
+
+    def __init__(self, attrib: Dict[str, str], text: str, tags: Tuple[str, ...] = ()) -> None:
+        self.attrib = attrib      # e.g. {"quantity": "one"}; {} for <string>
+        self.text = text          # unescaped text, inline tags replaced by __TAGn__
+        self.tags = tags          # raw XML of each inline tag (with its inner content)
+
+    def with_text(self, text: str) -> "Item":
+        return Item(self.attrib, text, self.tags)
+
+    def tags_in_order(self, text: str) -> bool:
+        """True if every inline tag token appears exactly once, in order, in text."""
+        if not self.tags:
+            return True
+        found = [int(m.group(1)) for m in _RE_TAG_TOKEN.finditer(text)]
+        return found == list(range(len(self.tags)))
+
+
+class Resource:
+    __slots__ = ("tag", "name", "attrib", "items", "ns")
+
+    def __init__(self, tag: str, name: str, attrib: Dict[str, str], items: List[Item],
+                 ns: Tuple[str, ...] = ()) -> None:
+        self.tag = tag            # "string" | "string-array" | "plurals"
+        self.name = name
+        self.attrib = attrib      # all attributes, name included, in document order
+        self.items = items        # one Item for <string>, one per <item> otherwise
+        self.ns = ns              # namespace URIs used by inline tags
+
+    @property
+    def key(self) -> str:
+        return f"{self.tag}:{self.name}"
+
+    @property
+    def translatable(self) -> bool:
+        return self.attrib.get("translatable", "true").lower() != "false"
+
+    def with_texts(self, texts: Sequence[str]) -> "Resource":
+        """Copy with new item texts (same attributes and inline tags)."""
+        return Resource(self.tag, self.name, self.attrib,
+                        [it.with_text(t) for it, t in zip(self.items, texts)], self.ns)
+
+    def to_xml(self, level: int = 1) -> str:
+        pad = "  " * level
+        head = f"<{self.tag}{_attrs(self.attrib)}"
+        if self.tag == "string":
+            body = _item_body(self.items[0])
+            return f"{pad}{head}>{body}</{self.tag}>" if body else f"{pad}{head} />"
+        if not self.items:
+            return f"{pad}{head} />"
+        inner = "\n".join(
+            (f"{pad}  <item{_attrs(it.attrib)}>{_item_body(it)}</item>" if (it.text or it.tags)
+             else f"{pad}  <item{_attrs(it.attrib)} />")
+            for it in self.items
+        )
+        return f"{pad}{head}>\n{inner}\n{pad}</{self.tag}>"
+
+    def content_hash(self) -> str:
+        return hashlib.sha1(self.to_xml(0).encode("utf-8")).hexdigest()
+
+
+class ResourceFile:
+    __slots__ = ("path", "root_attrib", "resources")
+
+    def __init__(self, path: Path, root_attrib: Dict[str, str], resources: List[Resource]) -> None:
+        self.path = path
+        self.root_attrib = root_attrib
+        self.resources = resources
+
+
+# -- reading -----------------------------------------------------------------
+
+def _local(tag: str) -> str:
+    return tag.split("}")[-1]
+
+
+def _flatten(elem: ET.Element, ns: Set[str]) -> Tuple[str, Tuple[str, ...]]:
+    """Text of elem with each child element replaced by a __TAGn__ token."""
+    parts = [elem.text or ""]
+    tags: List[str] = []
+    for child in elem:
+        parts.append(tag_token(len(tags)))
+        tags.append(_fragment(child, ns))
+        parts.append(child.tail or "")
+    return "".join(parts), tuple(tags)
+
+
+def resource_from_element(elem: ET.Element) -> Optional[Resource]:
+    tag = _local(elem.tag)
+    if tag not in LOCALIZABLE_TAGS:
+        return None
+    ns: Set[str] = set()
+    attrib = dict(elem.attrib)
+    if tag == "string":
+        text, tags = _flatten(elem, ns)
+        items = [Item({}, text, tags)]
+    else:
+        items = []
+        for it in elem.findall("item"):
+            text, tags = _flatten(it, ns)
+            items.append(Item(dict(it.attrib), text, tags))
+    return Resource(tag, attrib.get("name", ""), attrib, items, tuple(sorted(ns)))
+
+
+class ResourceStream:
+    """Localizable resources of a values XML, read one top-level element at a time.
+
+    root_tag / root_attrib are known as soon as the stream is opened; iterating
+    yields the Resources and clears every finished element, so only the element
+    being read is ever in memory. Raises ET.ParseError on invalid XML (possibly
+    while iterating).
+    """
+
+    __slots__ = ("path", "root_tag", "root_attrib", "_events", "_root")
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._events = ET.iterparse(str(path), events=("start", "end"))
+        _, self._root = next(self._events)
+        self.root_tag = _local(self._root.tag)
+        self.root_attrib = dict(self._root.attrib)
+
+    @property
+    def is_resources(self) -> bool:
+        return self.root_tag == "resources"
+
+    def __iter__(self) -> Iterator[Resource]:
+        if not self.is_resources:
+            return
+        root = self._root
+        depth = 1
+        for event, elem in self._events:
+            if event == "start":
+                depth += 1
+                continue
+            depth -= 1
+            if depth == 1:
+                r = resource_from_element(elem)
+                if r is not None:
+                    yield r
+                # Children of root are finished: drop them (root attributes were copied)
+                root.clear()
+
+
+def iter_resources(path: Path) -> Iterator[Resource]:
+    """Yield the localizable resources of a values XML (nothing if the root is not <resources>)."""
+    return iter(ResourceStream(path))
+
+
+def parse_resources(path: Path) -> Optional[ResourceFile]:
+    """Read the localizable resources of a values XML. None if the root is not <resources>.
+
+    Raises ET.ParseError on invalid XML.
+    """
+    stream = ResourceStream(path)
+    if not stream.is_resources:
+        return None
+    return ResourceFile(path, stream.root_attrib, list(stream))
+
+
+_CHUNK = 64 * 1024
+
+
+def iter_resource_names(path: Path, tags: Sequence[str] = LOCALIZABLE_TAGS) -> Iterator[Tuple[str, str]]:
+    """Yield (tag, name) of the top-level resources of a values XML, without building elements.
+
+    Only <resources> roots are read. Raises expat.ExpatError on invalid XML.
+    """
+    found: List[Tuple[str, str]] = []
+    depth = 0
+    is_resources = True
+
+    def start(tag: str, attrs: Dict[str, str]) -> None:
+        nonlocal depth, is_resources
+        depth += 1
+        if depth == 1:
+            is_resources = tag == "resources"
+        elif depth == 2 and is_resources and tag in tags:
+            found.append((tag, attrs.get("name", "")))
+
+    def end(tag: str) -> None:
+        nonlocal depth
+        depth -= 1
+
+    parser = expat.ParserCreate()
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(_CHUNK)
+            parser.Parse(chunk, not chunk)
+            yield from found
+            found.clear()
+            if not chunk or not is_resources:
+                return
+
+
+def has_localizable_resources(path: Path) -> bool:
+    """True if the file has at least one string / string-array / plurals (stops at the first one)."""
+    for _ in iter_resource_names(path):
+        return True
+    return False
+
+
+# -- writing -----------------------------------------------------------------
+
+def _escape_text(s: str) -> str:
+    if "&" in s:
+        s = s.replace("&", "&amp;")
+    if "<" in s:
+        s = s.replace("<", "&lt;")
+    if ">" in s:
+        s = s.replace(">", "&gt;")
+    return s
+
+
+def _escape_attr(s: str) -> str:
+    s = _escape_text(s)
+    if '"' in s:
+        s = s.replace('"', "&quot;")
+    if "\r" in s:
+        s = s.replace("\r", "&#13;")
+    if "\n" in s:
+        s = s.replace("\n", "&#10;")
+    if "\t" in s:
+        s = s.replace("\t", "&#09;")
+    return s
+
+
+def _qname(name: str, ns: Optional[Set[str]] = None) -> str:
+    if name[:1] != "{":
+        return name
+    uri, local = name[1:].split("}", 1)
+    if ns is not None:
+        ns.add(uri)
+    return f"{_prefix(uri)}:{local}"
+
+
+def _prefix(uri: str) -> str:
+    return _KNOWN_PREFIXES.get(uri) or "ns" + hashlib.sha1(uri.encode("utf-8")).hexdigest()[:6]
+
+
+def _attrs(attrib: Dict[str, str], ns: Optional[Set[str]] = None) -> str:
+    return "".join(f' {_qname(k, ns)}="{_escape_attr(v)}"' for k, v in attrib.items())
+
+
+def _fragment(elem: ET.Element, ns: Set[str]) -> str:
+    """Serialize an inline element (without its tail), recording the namespaces it uses."""
+    tag = _qname(elem.tag, ns)
+    attrs = _attrs(elem.attrib, ns)
+    if not elem.text and not len(elem):
+        return f"<{tag}{attrs} />"
+    inner = [_escape_text(elem.text or "")]
+    for child in elem:
+        inner.append(_fragment(child, ns))
+        inner.append(_escape_text(child.tail or ""))
+    return f"<{tag}{attrs}>{''.join(inner)}</{tag}>"
+
+
+def _item_body(item: Item) -> str:
+    if not item.tags:
+        return _escape_text(item.text)
+    return _RE_TAG_TOKEN.sub(
+        lambda m: item.tags[int(m.group(1))] if int(m.group(1)) < len(item.tags) else m.group(0),
+        _escape_text(item.text),
+    )
+
+
+def serialize_resources(resources: Iterable[Resource], root_attrib: Optional[Dict[str, str]] = None) -> bytes:
+    resources = list(resources)
+    root_attrib = root_attrib or {}
+    ns: Set[str] = set()
+    for r in resources:
+        ns.update(r.ns)
+        for k in list(r.attrib) + [k for it in r.items for k in it.attrib]:
+            _qname(k, ns)
+    root_attrs = _attrs(root_attrib, ns)
+    decls = "".join(f' xmlns:{p}="{_escape_attr(u)}"' for p, u in sorted((_prefix(u), u) for u in ns))
+    out = ["<?xml version='1.0' encoding='utf-8'?>\n"]
+    if not resources:
+        out.append(f"<resources{decls}{root_attrs} />\n")
+    else:
+        out.append(f"<resources{decls}{root_attrs}>\n")
+        out.append("\n".join(r.to_xml(1) for r in resources))
+        out.append("\n</resources>\n")
+    return "".join(out).encode("utf-8")
+
+
+def write_resources(path: Path, resources: Iterable[Resource], root_attrib: Optional[Dict[str, str]] = None,
+                    stats: Optional[WriteStats] = None) -> bool:
+    """Write the file atomically, only if its bytes change (see file_writer). True if written."""
+    return write_if_changed(path, serialize_resources(resources, root_attrib), stats)
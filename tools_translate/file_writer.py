@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Output files of the i18n tools: written atomically, and only when they change.
+
+- write_atomic(): temp file in the same folder, fsync, then os.replace(). An
+  interrupted run leaves either the old file or the new one, never a
+  half-written XML that breaks the build.
+- write_if_changed(): compares the new bytes with the file on disk first and
+  leaves it alone (mtime included) when they are equal, so Gradle does not
+  recompile the resources of every locale after a run that changed nothing.
+
+Callers serialize canonically (same input -> same bytes) before calling.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+
+class WriteStats:
+    """Written / skipped counters, shared by the worker threads of a run."""
+
+    __slots__ = ("written", "skipped", "_lock")
+
+    def __init__(self) -> None:
+        self.written = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def record(self, written: bool) -> None:
+        with self._lock:
+            if written:
+                self.written += 1
+            else:
+                self.skipped += 1
+
+    def summary(self) -> str:
+        return f"Fichiers: {self.written} ecrit(s), {self.skipped} inchange(s) non reecrit(s)"
+
+
+def write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+        raise
+
+
+def same_content(path: Path, data: bytes) -> bool:
+    try:
+        if path.stat().st_size != len(data):
+            return False
+        return path.read_bytes() == data
+    except OSError:
+        return False
+
+
+def write_if_changed(path: Path, data: bytes, stats: Optional[WriteStats] = None) -> bool:
+    """Write data to path unless it already holds exactly these bytes. True if written."""
+    changed = not same_content(path, data)
+    if changed:
+        write_atomic(path, data)
+    if stats is not None:
+        stats.record(changed)
+    return changed
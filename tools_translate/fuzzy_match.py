@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Near-duplicate lookup for the translation memory.
+
+Two tiers, tried after an exact TM miss (see TranslationMemory.enable_fuzzy):
+- normalized match: same text once whitespace, case, apostrophes and the final
+  punctuation are ignored ("Supprimer le waypoint" / "supprimer le waypoint !").
+  Masked placeholders are already canonical (__PH0__...), they must be the same.
+- fuzzy match: Dice similarity of the character trigrams of the normalized
+  texts, through an inverted trigram index (only entries sharing a trigram,
+  and of a compatible length, are scored). The candidate must carry the same
+  tokens, so its translation unmasks correctly.
+
+The reused translation gets the first-letter case, final punctuation and outer
+whitespace of the new text (adapt()).
+
+Scoring is plain Python, one candidate at a time, not vectorized: the tools
+are stdlib only, and the trigram prefilter already keeps the candidates to a
+few dozen. On the values-fr corpus (~700 distinct texts per pair) a lookup
+costs ~0.16 ms, ~2 ms with ten times more entries, and only exact TM misses are
+looked up: far below one request to the backend.
+"""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+_TOKEN_RE = re.compile(r"__[A-Z]{2,4}\d+__")
+_TRAILING_RE = re.compile(r"[\s.:;!?…]*$")
+# Stands for one masked token in normalized texts (one character, so one token weighs like one letter)
+_TOKEN_MARK = "\x00"
+
+
+def tokens(text: str) -> Tuple[str, ...]:
+    return tuple(_TOKEN_RE.findall(text))
+
+
+def normalize(text: str) -> str:
+    t = unicodedata.normalize("NFKC", text).replace("’", "'")
+    t = _TOKEN_RE.sub(_TOKEN_MARK, t)
+    t = _TRAILING_RE.sub("", t.strip())
+    return " ".join(t.split()).casefold()
+
+
+def trigrams(norm: str) -> frozenset:
+    padded = f" {norm} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _first_alpha(s: str) -> int:
+    for i, c in enumerate(s):
+        if c.isalpha():
+            return i
+    return -1
+
+
+def adapt(text: str, matched: str, translation: str) -> str:
+    """translation of `matched`, with the case / final punctuation / outer whitespace of `text`."""
+    out = translation.strip()
+    old_end = "".join(_TRAILING_RE.search(matched).group().split())
+    new_end = "".join(_TRAILING_RE.search(text).group().split())
+    tr_end = _TRAILING_RE.search(out).group()
+    # Swap the final punctuation only when the translation ends like its source did
+    if old_end != new_end and "".join(tr_end.split()) == old_end:
+        out = out[:len(out) - len(tr_end)] + new_end
+
+    i, j, k = _first_alpha(text), _first_alpha(matched), _first_alpha(out)
+    if i >= 0 and j >= 0 and k >= 0 and text[i].isupper() != matched[j].isupper():
+        c = out[k].upper() if text[i].isupper() else out[k].lower()
+        out = out[:k] + c + out[k + 1:]
+
+    lead = text[:len(text) - len(text.lstrip())]
+    trail = text[len(text.rstrip()):]
+    return lead + out + trail
+
+
+class Match(NamedTuple):
+    text: str               # masked text looked up
+    matched: str            # masked source text of the TM entry
+    translation: str        # adapted translation (see adapt())
+    score: float            # 1.0 = normalized match
+
+
+class _Entry:
+    __slots__ = ("masked", "norm", "grams", "tokens", "translation")
+
+    def __init__(self, masked: str, translation: str) -> None:
+        self.masked = masked
+        self.norm = normalize(masked)
+        self.grams = trigrams(self.norm)
+        self.tokens = tokens(masked)
+        self.translation = translation
+
+
+class FuzzyIndex:
+    """TM entries of one (source, target, backend), indexed by normalized text and trigrams."""
+
+    def __init__(self) -> None:
+        self._entries: List[_Entry] = []
+        self._by_masked: Dict[str, int] = {}
+        self._by_norm: Dict[str, int] = {}
+        self._postings: Dict[str, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, masked: str, translation: str) -> None:
+        i = self._by_masked.get(masked)
+        if i is not None:
+            self._entries[i].translation = translation
+            return
+        e = _Entry(masked, translation)
+        i = len(self._entries)
+        self._entries.append(e)
+        self._by_masked[masked] = i
+        self._by_norm.setdefault(e.norm, i)
+        for g in e.grams:
+            self._postings.setdefault(g, []).append(i)
+
+    def search(self, masked: str, min_score: float) -> Optional[Match]:
+        """Best entry scoring at least min_score (0 < min_score <= 1), or None."""
+        norm = normalize(masked)
+        toks = tokens(masked)
+        i = self._by_norm.get(norm)
+        if i is not None and self._entries[i].tokens == toks:
+            e = self._entries[i]
+            return Match(masked, e.masked, adapt(masked, e.masked, e.translation), 1.0)
+        if min_score >= 1.0:
+            return None
+
+        grams = trigrams(norm)
+        shared: Dict[int, int] = {}
+        for g in grams:
+            for i in self._postings.get(g, ()):
+                shared[i] = shared.get(i, 0) + 1
+        # Dice >= t needs t / (2 - t) <= |B| / |A| <= (2 - t) / t
+        n = len(grams)
+        lo, hi = n * min_score / (2 - min_score), n * (2 - min_score) / min_score
+        want = sorted(toks)
+        best: Optional[Tuple[float, _Entry]] = None
+        for i, common in shared.items():
+            e = self._entries[i]
+            m = len(e.grams)
+            if m < lo or m > hi:
+                continue
+            # Different texts can share every trigram: only a normalized match scores 1
+            score = min(2.0 * common / (n + m), 0.99)
+            if score >= min_score and (best is None or score > best[0]) and sorted(e.tokens) == want:
+                best = (score, e)
+        if best is None:
+            return None
+        score, e = best
+        return Match(masked, e.masked, adapt(masked, e.masked, e.translation), round(score, 3))
@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+"""
+Keep-alive HTTP client shared by the i18n tools (standard library only).
+
+urllib.request opens a new TCP connection per call; against a local
+LibreTranslate that setup is a noticeable part of every string. This client
+keeps idle connections per host in a small pool (sized to --jobs) and reuses
+them, with:
+- separate connect / read timeouts, the read timeout growing with the body size
+- optional gzip/deflate response decompression
+- one transparent retry when a pooled connection was closed by the server
+- adaptive regulation (see rate_control.py): retries with backoff and jitter on
+  transient errors, AIMD on the number of requests in flight, circuit breaker
+
+Scripts call configure_from_args(...) once from their argparse options, then use
+client().post_json / post_form / get_json.
+"""
+
+from __future__ import annotations
+
+import http.client
+import json
+import socket
+import threading
+import time
+import urllib.parse
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import metrics
+from rate_control import AimdLimiter, BackendUnavailable, CircuitBreaker, RetryPolicy
+
+USER_AGENT = "HikeTrack-i18n-tool"
+
+# Errors meaning "the idle keep-alive connection was closed on the other side"
+_STALE_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine, ConnectionResetError, BrokenPipeError)
+
+# Statuses worth retrying: rate limited, server error, overloaded or restarting
+_RETRY_STATUSES = (429, 500, 502, 503, 504)
+_BUSY_STATUSES = (429, 503)
+
+
+class HttpError(RuntimeError):
+    def __init__(self, status: int, reason: str, body: bytes, retry_after: Optional[float] = None) -> None:
+        super().__init__(f"HTTP {status} {reason}: {body[:200].decode('utf-8', errors='replace')}")
+        self.status = status
+        self.body = body
+        self.retry_after = retry_after
+
+
+def is_transient(e: BaseException) -> bool:
+    """True for errors that say nothing about the request itself (server down, busy, network)."""
+    if isinstance(e, HttpError):
+        return e.status in _RETRY_STATUSES
+    return isinstance(e, (BackendUnavailable, OSError, http.client.HTTPException))
+
+
+def _is_busy(e: BaseException) -> bool:
+    return isinstance(e, HttpError) and e.status in _BUSY_STATUSES
+
+
+def _is_timeout(e: BaseException) -> bool:
+    return isinstance(e, (socket.timeout, TimeoutError))
+
+
+class HttpClient:
+    def __init__(
+        self,
+        pool_size: int = 4,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        read_timeout_per_kb: float = 1.0,
+        compress: bool = True,
+        retry: Optional[RetryPolicy] = None,
+        breaker: Optional[CircuitBreaker] = None,
+    ) -> None:
+        self.pool_size = max(1, pool_size)
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.read_timeout_per_kb = read_timeout_per_kb
+        self.compress = compress
+        self._idle: Dict[Tuple[str, str, int], List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+        self.retry = retry or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.limiter = AimdLimiter(self.pool_size)
+        self.connections_opened = 0
+        self.requests_sent = 0
+        self.retries = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    # -- connection pool -----------------------------------------------------
+
+    def _acquire(self, key: Tuple[str, str, int], fresh: bool = False) -> Tuple[http.client.HTTPConnection, bool]:
+        if not fresh:
+            with self._lock:
+                idle = self._idle.get(key)
+                if idle:
+                    return idle.pop(), True
+        scheme, host, port = key
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        conn = cls(host, port, timeout=self.connect_timeout)
+        conn.connect()
+        conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self._lock:
+            self.connections_opened += 1
+        return conn, False
+
+    def _release(self, key: Tuple[str, str, int], conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.pool_size:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            conns = [c for idle in self._idle.values() for c in idle]
+            self._idle.clear()
+        for c in conns:
+            c.close()
+
+    # -- requests ------------------------------------------------------------
+
+    def request(self, method: str, url: str, body: Optional[bytes] = None,
+                headers: Optional[Dict[str, str]] = None) -> bytes:
+        """Send a request and return the (decompressed) response body. Raises HttpError on status >= 400.
+
+        Transient errors are retried with backoff; BackendUnavailable is raised at once
+        while the circuit breaker is open.
+        """
+        size = len(body or b"")
+        attempt = 0
+        while True:
+            self.breaker.before_request()
+            started = self.limiter.acquire()
+            try:
+                data = self._send(method, url, body, headers)
+            except Exception as e:
+                transient = is_transient(e)
+                busy = transient and _is_busy(e)
+                self.limiter.release(started, size, overloaded=busy or _is_timeout(e))
+                if not transient:
+                    # The server answered (e.g. 400): it is up
+                    self.breaker.record_success()
+                    raise
+                if busy:
+                    # Busy answers (429/503) mean "slow down", handled by the limiter;
+                    # only errors saying the server is down count for the breaker.
+                    self.breaker.release_probe()
+                else:
+                    self.breaker.record_failure()
+                if attempt >= self.retry.retries or self.breaker.is_open:
+                    raise
+                delay = self.retry.delay(attempt)
+                if isinstance(e, HttpError) and e.retry_after is not None:
+                    delay = max(delay, min(e.retry_after, self.retry.max_delay))
+                attempt += 1
+                with self._lock:
+                    self.retries += 1
+                time.sleep(delay)
+                continue
+            self.limiter.release(started, size)
+            self.breaker.record_success()
+            return data
+
+    def _send(self, method: str, url: str, body: Optional[bytes],
+              headers: Optional[Dict[str, str]]) -> bytes:
+        u = urllib.parse.urlsplit(url)
+        scheme = u.scheme or "http"
+        port = u.port or (443 if scheme == "https" else 80)
+        key = (scheme, u.hostname or "localhost", port)
+        path = (u.path or "/") + (f"?{u.query}" if u.query else "")
+
+        hdrs = {"User-Agent": USER_AGENT, "Connection": "keep-alive"}
+        if self.compress:
+            hdrs["Accept-Encoding"] = "gzip, deflate"
+        if headers:
+            hdrs.update(headers)
+
+        # Longer texts take longer to translate: scale the read timeout with the payload.
+        read_timeout = self.read_timeout + self.read_timeout_per_kb * (len(body or b"") / 1024.0)
+
+        for attempt in (0, 1):
+            conn, reused = self._acquire(key, fresh=attempt > 0)
+            t0 = time.perf_counter()
+            try:
+                conn.sock.settimeout(read_timeout)
+                conn.request(method, path, body=body, headers=hdrs)
+                resp = conn.getresponse()
+                data = resp.read()
+            except _STALE_ERRORS:
+                conn.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            except BaseException:
+                conn.close()
+                raise
+
+            with self._lock:
+                self.requests_sent += 1
+                self.bytes_sent += len(body or b"")
+                self.bytes_received += len(data)
+            # Time of this exchange only (no queueing, no backoff), per endpoint path
+            metrics.current().observe("http", u.path or "/", time.perf_counter() - t0)
+            if resp.will_close:
+                conn.close()
+            else:
+                self._release(key, conn)
+
+            data = _decode_body(data, resp.getheader("Content-Encoding", ""))
+            if resp.status >= 400:
+                raise HttpError(resp.status, resp.reason, data, _retry_after(resp.getheader("Retry-After")))
+            return data
+        raise AssertionError("unreachable")
+
+    def get_json(self, url: str):
+        raw = self.request("GET", url, headers={"Accept": "application/json"})
+        return json.loads(raw.decode("utf-8", errors="replace"))
+
+    def post_json(self, url: str, payload: Dict):
+        body = json.dumps(payload).encode("utf-8")
+        raw = self.request("POST", url, body=body,
+                           headers={"Content-Type": "application/json", "Accept": "application/json"})
+        return json.loads(raw.decode("utf-8", errors="replace"))
+
+    def post_form(self, url: str, data: Dict[str, str]):
+        body = urllib.parse.urlencode(data).encode("utf-8")
+        raw = self.request("POST", url, body=body,
+                           headers={"Content-Type": "application/x-www-form-urlencoded", "Accept": "application/json"})
+        return json.loads(raw.decode("utf-8", errors="replace"))
+
+    def stats(self) -> Dict[str, float]:
+        """Counters for the --metrics file."""
+        return {"requests": self.requests_sent, "retries": self.retries,
+                "connections": self.connections_opened, "bytes_sent": self.bytes_sent,
+                "bytes_received": self.bytes_received, "parallelism_final": round(self.limiter.limit, 2),
+                "parallelism_min": round(self.limiter.lowest, 2), "breaker_trips": self.breaker.trips}
+
+    def summary(self) -> str:
+        lim = self.limiter
+        return (f"HTTP: {self.requests_sent} requetes, {self.retries} reprise(s), "
+                f"{self.connections_opened} connexion(s), parallelisme {lim.limit:.1f}/{lim.max_limit:.0f} "
+                f"(min {lim.lowest:.1f}), disjoncteur declenche {self.breaker.trips} fois")
+
+
+def _retry_after(value: Optional[str]) -> Optional[float]:
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None  # HTTP-date form: ignored, the backoff applies
+
+
+def _decode_body(data: bytes, encoding: str) -> bytes:
+    encoding = (encoding or "").strip().lower()
+    if encoding == "gzip":
+        return zlib.decompress(data, 16 + zlib.MAX_WBITS)
+    if encoding == "deflate":
+        try:
+            return zlib.decompress(data)
+        except zlib.error:
+            # Some servers send raw deflate without the zlib header
+            return zlib.decompress(data, -zlib.MAX_WBITS)
+    return data
+
+
+_client = HttpClient()
+
+
+def configure(**kwargs) -> HttpClient:
+    """Replace the shared client (e.g. pool_size=args.jobs, connect_timeout=..., read_timeout=...)."""
+    global _client
+    _client.close()
+    _client = HttpClient(**kwargs)
+    return _client
+
+
+def client() -> HttpClient:
+    return _client
+
+
+def add_arguments(ap) -> None:
+    """Common HTTP options for the translator command lines."""
+    ap.add_argument("--connect-timeout", type=float, default=5.0, help="TCP connect timeout (seconds)")
+    ap.add_argument("--read-timeout", type=float, default=30.0,
+                    help="Read timeout (seconds), +1 s per KB of request body")
+    ap.add_argument("--no-compress", action="store_true", help="Do not ask the server for gzip responses")
+    ap.add_argument("--retries", type=int, default=4, help="Retries of a request on transient errors (backoff + jitter)")
+    ap.add_argument("--breaker-threshold", type=int, default=5,
+                    help="Consecutive failures before the server is considered down")
+    ap.add_argument("--breaker-cooldown", type=float, default=15.0,
+                    help="Seconds before probing a server considered down")
+
+
+def configure_from_args(args, pool_size: int) -> HttpClient:
+    return configure(
+        pool_size=pool_size,
+        connect_timeout=args.connect_timeout,
+        read_timeout=args.read_timeout,
+        compress=not args.no_compress,
+        retry=RetryPolicy(retries=max(0, args.retries)),
+        breaker=CircuitBreaker(args.breaker_threshold, args.breaker_cooldown),
+    )
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Offline lint of the values* folders: what makes AAPT2 fail the build (or the app
+crash at runtime), found in a fraction of a second instead of a Gradle cycle.
+
+Per file (worker processes):
+- xml-error            the XML does not parse (AAPT2 stops there)
+- invalid-utf8         bytes that are not UTF-8
+- html-entity          &nbsp; / &eacute; ...: not XML entities (use the character or \\u00A0)
+- invalid-surrogate    lone UTF-16 surrogate (\\uD83D without its pair, &#xD800;)
+- invalid-escape       backslash + a char Android does not know (\\q, final backslash)
+- bad-unicode-escape   \\u not followed by 4 hex digits
+- unescaped-apostrophe ' outside "..." and not written \\'
+
+Across files:
+- duplicate            same (type, name) twice in one folder (same rule as AAPT2, see resource_index)
+- placeholder-count    a translation has more/fewer %s %1$d ... than the source string (warning)
+- placeholder-type     same placeholders, other types or order: %d where the source has %s (warning)
+- lost-tag             inline tags <b> <i> <xliff:g> ... of the source missing or added (warning)
+
+Translations are compared with the source folder (--source, "values" by default),
+key by key. Output: one line per problem, "file:line: severity [code] type/name: message",
+like a compiler (clickable in IDEs); --json also writes them as a JSON list.
+Exit code 1 when there is at least one error.
+
+  py tools_translate/lint_resources.py
+  py tools_translate/lint_resources.py --res app/src/main/res --json lint.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Tuple
+from xml.parsers import expat
+
+from resource_index import LOCALIZABLE_TYPES, SOURCE_FOLDER, Entry, is_locale_folder, scan_file, values_files
+
+DEFAULT_RES = Path(__file__).resolve().parent.parent / "app" / "src" / "main" / "res"
+
+# Same escapes as the sanitizer: \n \t \r \b \' \" \\ \@ \? (and \uXXXX)
+_ALLOWED_ESCAPES = set("ntrb'\"\\@?")
+_HEX = set("0123456789abcdefABCDEF")
+_XML_ENTITIES = {"amp", "lt", "gt", "quot", "apos"}
+_ENTITY_RE = re.compile(r"&([A-Za-z][\w.-]*);|&#(x[0-9a-fA-F]+|[0-9]+);")
+_COMMENT_RE = re.compile(r"<!--.*?-->", re.DOTALL)
+# printf placeholders, without the space flag ("50 % de" is not a placeholder)
+_PLACEHOLDER_RE = re.compile(r"%(?:(\d+)\$)?[-#+0,(]*\d*(?:\.\d+)?([a-zA-Z%])")
+# Inline tags: nested elements (kept as <tag> by resource_index) and escaped HTML (&lt;b&gt;)
+_TAG_RE = re.compile(r"<(/?)([A-Za-z][\w:.-]*)[^<>]*?(/?)>")
+_ITEM_SEP = "\x1f"
+
+ERROR = "error"
+WARNING = "warning"
+
+
+class Problem(NamedTuple):
+    file: str
+    line: int
+    severity: str
+    code: str
+    folder: str
+    type: str
+    name: str
+    message: str
+
+    def format(self) -> str:
+        what = f" {self.type}/{self.name}:" if self.name else ""
+        return f"{_display(self.file)}:{self.line}: {self.severity} [{self.code}]{what} {self.message}"
+
+
+def _display(path: str) -> str:
+    try:
+        return os.path.relpath(path)
+    except ValueError:      # other drive (Windows)
+        return path
+
+
+def _line_at(text: str, pos: int) -> int:
+    return text.count("\n", 0, pos) + 1
+
+
+# -- per text ------------------------------------------------------------------
+
+def check_text(text: str) -> List[Tuple[str, str]]:
+    """(code, message) of the escape / apostrophe / surrogate problems of one string value."""
+    out: List[Tuple[str, str]] = []
+    in_quotes = False
+    pending_high = False     # previous \uXXXX was a high surrogate
+    i, n = 0, len(text)
+    while i < n:
+        c = text[i]
+        if c == "\\":
+            nxt = text[i + 1:i + 2]
+            if nxt == "u":
+                digits = text[i + 2:i + 6]
+                if len(digits) < 4 or not set(digits) <= _HEX:
+                    out.append(("bad-unicode-escape", f"\\u{digits[:4]} n'est pas suivi de 4 chiffres hexadecimaux"))
+                    pending_high = False
+                    i += 2
+                    continue
+                cp = int(digits, 16)
+                if pending_high and not 0xDC00 <= cp <= 0xDFFF:
+                    out.append(("invalid-surrogate", "\\uD800-\\uDBFF sans \\uDC00-\\uDFFF juste apres"))
+                elif not pending_high and 0xDC00 <= cp <= 0xDFFF:
+                    out.append(("invalid-surrogate", f"\\u{digits} (seconde moitie d'une paire) isole"))
+                pending_high = 0xD800 <= cp <= 0xDBFF
+                i += 6
+                continue
+            if pending_high:
+                out.append(("invalid-surrogate", "\\uD800-\\uDBFF sans \\uDC00-\\uDFFF juste apres"))
+                pending_high = False
+            if not nxt:
+                out.append(("invalid-escape", "backslash final"))
+            elif nxt not in _ALLOWED_ESCAPES:
+                out.append(("invalid-escape", f"sequence \\{nxt} inconnue (ecrire \\\\{nxt} pour un backslash)"))
+            i += 2
+            continue
+        if pending_high:
+            out.append(("invalid-surrogate", "\\uD800-\\uDBFF sans \\uDC00-\\uDFFF juste apres"))
+            pending_high = False
+        if c == '"':
+            in_quotes = not in_quotes
+        elif c == "'" and not in_quotes:
+            out.append(("unescaped-apostrophe", "apostrophe non echappee (ecrire \\' ou ’)"))
+        elif c == _ITEM_SEP:
+            in_quotes = False
+        i += 1
+    if pending_high:
+        out.append(("invalid-surrogate", "\\uD800-\\uDBFF sans \\uDC00-\\uDFFF juste apres"))
+    return out
+
+
+def placeholders(text: str) -> Dict[int, str]:
+    """Argument position -> conversion of the printf placeholders (%% and %n ignored)."""
+    out: Dict[int, str] = {}
+    pos = 0
+    for m in _PLACEHOLDER_RE.finditer(text):
+        conv = m.group(2)
+        if conv in "%n":
+            continue
+        if m.group(1):
+            index = int(m.group(1))
+        else:
+            pos += 1
+            index = pos
+        out[index] = conv.lower()
+    return out
+
+
+def inline_tags(text: str) -> Counter:
+    """Inline tags of a value, attributes left out: <b>, </b>, <br/>, <xliff:g>..."""
+    return Counter(f"<{m.group(1)}{m.group(2).lower()}{m.group(3)}>" for m in _TAG_RE.finditer(text))
+
+
+def _format_tags(tags: Counter) -> str:
+    return " ".join(tag if n == 1 else f"{tag} x{n}" for tag, n in sorted(tags.items()))
+
+
+def _format_placeholders(ph: Dict[int, str]) -> str:
+    return " ".join(f"%{i}${c}" for i, c in sorted(ph.items())) or "aucun"
+
+
+# -- per file ------------------------------------------------------------------
+
+def lint_file(path: Path) -> Tuple[List[Entry], List[Problem]]:
+    """Entries of one values XML, and the problems visible in that file alone."""
+    file, folder = str(path), path.parent.name
+    problems: List[Problem] = []
+
+    def add(line: int, code: str, message: str, rtype: str = "", name: str = "") -> None:
+        problems.append(Problem(file, line, ERROR, code, folder, rtype, name, message))
+
+    raw = path.read_bytes()
+    try:
+        text = raw.decode("utf-8")
+    except UnicodeDecodeError as e:
+        add(raw.count(b"\n", 0, e.start) + 1, "invalid-utf8", f"octet(s) invalide(s) en UTF-8: {raw[e.start:e.end]!r}")
+        return [], problems
+
+    # Entities outside comments (they are not expanded there)
+    if "&" in text:
+        bare = _COMMENT_RE.sub(lambda m: re.sub(r"[^\n]", " ", m.group()), text)
+        for m in _ENTITY_RE.finditer(bare):
+            if m.group(1) is not None and m.group(1) not in _XML_ENTITIES:
+                hint = " (espace insecable: \\u00A0)" if m.group(1) == "nbsp" else ""
+                add(_line_at(bare, m.start()), "html-entity", f"&{m.group(1)}; n'existe pas en XML{hint}")
+            elif m.group(2) is not None:
+                ref = m.group(2)
+                cp = int(ref[1:], 16) if ref[0] == "x" else int(ref)
+                if 0xD800 <= cp <= 0xDFFF:
+                    add(_line_at(bare, m.start()), "invalid-surrogate", f"&#{ref}; est une moitie de paire UTF-16")
+
+    try:
+        entries = scan_file(path, folder)
+    except expat.ExpatError as e:
+        # Already explained by a more precise problem on that line?
+        if not any(p.line == e.lineno for p in problems):
+            add(e.lineno, "xml-error", expat.ErrorString(e.code))
+        return [], problems
+
+    for en in entries:
+        if en.type not in LOCALIZABLE_TYPES:
+            continue
+        found = check_text(en.value)
+        # One line per kind of problem and resource
+        for code, count in Counter(code for code, _ in found).items():
+            message = next(msg for c, msg in found if c == code)
+            if count > 1:
+                message += f" (x{count})"
+            add(en.line, code, message, en.type, en.name)
+    return entries, problems
+
+
+# -- across files --------------------------------------------------------------
+
+def _compare(src: Entry, tr: Entry) -> List[Tuple[str, str]]:
+    """Placeholder / inline tag differences between a source resource and its translation."""
+    out: List[Tuple[str, str]] = []
+    src_items, tr_items = src.value.split(_ITEM_SEP), tr.value.split(_ITEM_SEP)
+    if tr.type == "string":
+        pairs = [(src.value, tr.value)]
+    elif tr.type == "array" and len(src_items) == len(tr_items):
+        pairs = list(zip(src_items, tr_items))
+    else:
+        # plurals (quantities differ between languages) / arrays of another length: whole resource
+        pairs = [(src.value, tr.value)]
+    lenient = tr.type == "plurals"   # a quantity may leave out the count ("one" -> "un")
+
+    for s, t in pairs:
+        ps, pt = placeholders(s), placeholders(t)
+        if ps != pt:
+            extra = set(pt) - set(ps)
+            missing = set(ps) - set(pt)
+            if extra or (missing and not lenient):
+                out.append(("placeholder-count", f"{_format_placeholders(pt)} au lieu de {_format_placeholders(ps)}"))
+            elif any(pt[i] != ps[i] for i in pt):
+                out.append(("placeholder-type", f"{_format_placeholders(pt)} au lieu de {_format_placeholders(ps)}"))
+        ts, tt = inline_tags(s), inline_tags(t)
+        if ts != tt:
+            lost, added = ts - tt, tt - ts
+            parts = []
+            if lost:
+                parts.append("perdue(s): " + _format_tags(lost))
+            if added:
+                parts.append("en trop: " + _format_tags(added))
+            out.append(("lost-tag", "balise(s) inline " + ", ".join(parts)))
+    return out
+
+
+def lint_entries(entries: List[Entry], source_folder: str = SOURCE_FOLDER) -> List[Problem]:
+    problems: List[Problem] = []
+    first: Dict[Tuple[str, str, str], Entry] = {}
+    for en in entries:
+        key = (en.folder, en.type, en.name)
+        prev = first.setdefault(key, en)
+        if prev is not en:
+            problems.append(Problem(en.file, en.line, ERROR, "duplicate", en.folder, en.type, en.name,
+                                    f"deja declare dans {_display(prev.file)}:{prev.line}"))
+
+    source = {(t, nm): en for (f, t, nm), en in first.items() if f == source_folder}
+    for (folder, rtype, name), en in first.items():
+        if folder == source_folder or not is_locale_folder(folder) or rtype not in LOCALIZABLE_TYPES:
+            continue
+        src = source.get((rtype, name))
+        if src is None or not src.translatable:
+            continue
+        for code, message in _compare(src, en):
+            problems.append(Problem(en.file, en.line, WARNING, code, folder, rtype, name, message))
+    return problems
+
+
+def lint_res(res_dir: Path, jobs: int = 1, source_folder: str = SOURCE_FOLDER) -> Tuple[int, List[Problem]]:
+    """Lint every values* XML of res_dir. Returns (files checked, problems sorted by file and line)."""
+    files = values_files(res_dir)
+    entries: List[Entry] = []
+    problems: List[Problem] = []
+    if jobs > 1 and len(files) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(lint_file, files, chunksize=max(1, len(files) // (jobs * 4))))
+    else:
+        results = [lint_file(p) for p in files]
+    for file_entries, file_problems in results:
+        entries.extend(file_entries)
+        problems.extend(file_problems)
+    problems.extend(lint_entries(entries, source_folder))
+    problems.sort(key=lambda p: (p.file, p.line, p.code))
+    return len(files), problems
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Offline AAPT2-style lint of the values* folders")
+    ap.add_argument("--res", default=str(DEFAULT_RES), help="Path to app/src/main/res")
+    ap.add_argument("--source", default=SOURCE_FOLDER, help="Folder the translations are compared with")
+    ap.add_argument("--jobs", type=int, default=min(4, os.cpu_count() or 1),
+                    help="Worker processes (1 = in-process; process start-up costs more than it saves on small trees)")
+    ap.add_argument("--json", default="", help="Also write the problems to this JSON file")
+    ap.add_argument("--no-warnings", action="store_true", help="Only show the errors")
+    args = ap.parse_args()
+
+    res = Path(args.res)
+    if not res.is_dir():
+        print(f"[ERREUR] Dossier res introuvable: {res}")
+        return 2
+    t0 = time.perf_counter()
+    count, problems = lint_res(res, args.jobs, args.source)
+    elapsed = (time.perf_counter() - t0) * 1000
+    errors = sum(1 for p in problems if p.severity == ERROR)
+    shown = [p for p in problems if p.severity == ERROR] if args.no_warnings else problems
+    for p in shown:
+        print(p.format())
+    if args.json:
+        Path(args.json).write_text(json.dumps([p._asdict() for p in shown], ensure_ascii=False, indent=1),
+                                   encoding="utf-8")
+    tag = "[FAIL]" if errors else "[OK]"
+    print(f"{tag} {count} fichiers, {errors} erreur(s), {len(problems) - errors} avertissement(s) en {elapsed:.0f} ms")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
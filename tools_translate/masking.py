@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+Placeholder / markup masking shared by the translators.
+
+Before a text is sent to the backend, everything that must survive verbatim
+(printf placeholders, {0} placeholders, inline markup, escape sequences) is
+replaced by a __KINDn__ token; after translation the tokens are put back.
+
+- mask(): one scan with a single combined regex. Tokens are numbered kind by
+  kind, then left to right, and only for the matches actually present. For v2
+  (and translate_resources_local) that is exactly the historical numbering, so
+  their translation memory keys do not change. The historical v1 mask_text
+  always reserved __TOK0__..__TOK2__ for \n, \t and \', present or not: v1
+  texts are masked differently and miss their old TM entries once (see
+  tools/bench_masking.py, "masque identique").
+- unmask(): one substitution pass over the translation, whatever the number of
+  tokens. Tokens the translator mangled ("__ PH0 __", "__ph0__", "_ _PH0_ _")
+  are recognised and restored like intact ones.
+
+Each tool builds its Masker from the patterns below, in its historical order.
+Patterns must not contain capturing groups.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# printf placeholders: %s, %1$s, %1$.2f, %d, %,d, %% ...
+PRINTF = r"%(?:\d+\$)?[\-\+\#\ 0\,\(]*\d*(?:\.\d+)?[a-zA-Z%]"
+# {0} style placeholders
+BRACES = r"\{\d+\}"
+# raw inline markup (<b>, </i>, <xliff:g id="x">...) in texts read as plain strings
+MARKUP = r"<[^>]+>"
+
+# Intact or mangled token: underscores and spaces around/inside, any case.
+TOKEN_RE = re.compile(r"_ ?_\s*([A-Za-z]{2,4})\s*(\d+)\s*_ ?_")
+
+
+def token(kind: str, n: int) -> str:
+    return f"__{kind}{n}__"
+
+
+class Masker:
+    """Masks the given (kind, pattern) pairs. Several pairs may share a kind.
+
+    Tokens share one counter (__PH0__, __BR1__...) unless per_kind is set
+    (__PH0__, __TAG0__...).
+    """
+
+    __slots__ = ("kinds", "per_kind", "_re", "_firsts")
+
+    def __init__(self, kinds: Sequence[Tuple[str, str]], per_kind: bool = False) -> None:
+        self.kinds = [k for k, _ in kinds]
+        self.per_kind = per_kind
+        self._re = re.compile("|".join(f"({pattern})" for _, pattern in kinds))
+        # Most texts hold no token at all: when every pattern starts with a fixed
+        # character, a few `in` tests skip the regex entirely.
+        firsts = [_first_char(pattern) for _, pattern in kinds]
+        self._firsts = None if None in firsts else "".join(sorted(set(firsts)))
+
+    def mask(self, text: str, start: int = 0) -> Tuple[str, Dict[str, str]]:
+        """Return (masked text, {token: original}). Numbering starts at `start`."""
+        if self._firsts is not None and not any(c in text for c in self._firsts):
+            return text, {}
+        kinds = self.kinds
+        per_kind = self.per_kind
+        mapping: Dict[str, str] = {}
+        matched: List[re.Match] = []
+        counters: Dict[str, int] = {}
+
+        def repl(m: re.Match) -> str:
+            # lastindex = 1-based index of the alternative that matched
+            kind = kinds[m.lastindex - 1]
+            if per_kind:
+                n = counters.get(kind, start)
+                counters[kind] = n + 1
+            else:
+                n = start + len(matched)
+            matched.append(m)
+            key = f"__{kind}{n}__"
+            mapping[key] = m.group()
+            return key
+
+        masked = self._re.sub(repl, text)
+        if per_kind or all(a.lastindex <= b.lastindex for a, b in zip(matched, matched[1:])):
+            return masked, mapping
+        # A later kind came first in the text (e.g. "{0} %s"): number kind by kind
+        return self._renumber(text, matched, start)
+
+    def _renumber(self, text: str, matches: List[re.Match], start: int) -> Tuple[str, Dict[str, str]]:
+        numbers = [0] * len(matches)
+        for n, j in enumerate(sorted(range(len(matches)), key=lambda j: matches[j].lastindex), start):
+            numbers[j] = n
+        mapping: Dict[str, str] = {}
+        parts: List[str] = []
+        pos = 0
+        for j, m in enumerate(matches):
+            key = token(self.kinds[m.lastindex - 1], numbers[j])
+            mapping[key] = m.group()
+            parts.append(text[pos:m.start()])
+            parts.append(key)
+            pos = m.end()
+        parts.append(text[pos:])
+        return "".join(parts), mapping
+
+
+def _first_char(pattern: str) -> Optional[str]:
+    """The literal character every match of pattern starts with, if obvious."""
+    if pattern[:1] == "\\" and len(pattern) > 1 and not pattern[1].isalnum():
+        first, rest = pattern[1], pattern[2:]
+    elif pattern[:1] and pattern[0] not in "\\.^$*+?{}[]()|":
+        first, rest = pattern[0], pattern[1:]
+    else:
+        return None
+    # "a?b", "a*", "a{0,1}", "a|b": the first character is not mandatory
+    if rest[:1] in ("?", "*", "{") or "|" in rest:
+        return None
+    return first
+
+
+def unmask(text: str, mapping: Dict[str, str], repaired: Optional[List[str]] = None) -> str:
+    """Put the originals back in one pass. Unknown tokens are left as they are.
+
+    Mangled spellings of known tokens are restored too; they are appended to
+    `repaired` when a list is given.
+    """
+    if not mapping or "_" not in text:
+        return text
+
+    def repl(m: re.Match) -> str:
+        found = m.group()
+        original = mapping.get(found)
+        if original is not None:
+            return original
+        # Mangled spelling: normalise it, then look it up again
+        original = mapping.get(token(m.group(1).upper(), int(m.group(2))))
+        if original is None:
+            return found
+        if repaired is not None:
+            repaired.append(found)
+        return original
+
+    return TOKEN_RE.sub(repl, text)
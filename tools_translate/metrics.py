@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Run metrics of the translators: phase timers, counters, latency histograms.
+
+- phase("parse") / phase("http") ...: cumulative time per phase. Phases run by
+  worker threads add up, so a phase can exceed the wall time: compare phases
+  with each other (is it the server, the XML handling or the disk?).
+- add("tm_hits", n): counters.
+- observe("target", "de", seconds): latency samples per key, summarised as
+  count / p50 / p95 / max and power-of-two millisecond buckets.
+
+One shared instance (current()), like http_client.client(). With --metrics the
+tool writes everything as JSON at the end of the run; --profile DIR also runs
+it under cProfile (every thread, see run_profiled) and tracemalloc and saves
+both dumps in DIR.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import json
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+
+def _percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(p / 100.0 * (len(sorted_values) - 1))))]
+
+
+def histogram(values: List[float]) -> Dict:
+    """Summary of latency samples (seconds in, milliseconds out)."""
+    s = sorted(values)
+    buckets: Dict[str, int] = {}
+    for v in s:
+        bound = 1
+        while v * 1000.0 > bound:
+            bound *= 2
+        label = f"<={bound}ms"
+        buckets[label] = buckets.get(label, 0) + 1
+    return {
+        "count": len(s),
+        "total_s": round(sum(s), 4),
+        "p50_ms": round(_percentile(s, 50) * 1000, 2),
+        "p95_ms": round(_percentile(s, 95) * 1000, 2),
+        "max_ms": round((s[-1] if s else 0.0) * 1000, 2),
+        "buckets": buckets,
+    }
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.phase_calls: Dict[str, int] = {}
+        self.counters: Dict[str, float] = {}
+        self.samples: Dict[str, Dict[str, List[float]]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            dt = time.perf_counter() - t0
+            with self._lock:
+                self.phases[name] = self.phases.get(name, 0.0) + dt
+                self.phase_calls[name] = self.phase_calls.get(name, 0) + 1
+
+    def add(self, counter: str, n: float = 1) -> None:
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + n
+
+    def observe(self, name: str, key: str, seconds: float) -> None:
+        with self._lock:
+            self.samples.setdefault(name, {}).setdefault(key, []).append(seconds)
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {
+                "wall_s": round(time.perf_counter() - self.started, 4),
+                "phases": {k: {"total_s": round(v, 4), "calls": self.phase_calls[k]}
+                           for k, v in sorted(self.phases.items(), key=lambda kv: -kv[1])},
+                "counters": dict(sorted(self.counters.items())),
+                "histograms": {name: {key: histogram(vals) for key, vals in sorted(per_key.items())}
+                               for name, per_key in sorted(self.samples.items())},
+            }
+
+    def write_json(self, path: Path, extra: Optional[Dict] = None) -> None:
+        data = self.to_dict()
+        if extra:
+            data.update(extra)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(data, ensure_ascii=False, indent=1), encoding="utf-8")
+
+
+_metrics = Metrics()
+
+
+def current() -> Metrics:
+    return _metrics
+
+
+def add_arguments(ap) -> None:
+    """--metrics / --profile options of the translator command lines."""
+    ap.add_argument("--metrics", default="", help="Write phase timings, counters and latency histograms to this JSON file")
+    ap.add_argument("--profile", default="", help="Run under cProfile + tracemalloc and save the dumps in this folder")
+
+
+class _ThreadProfiles:
+    """One cProfile.Profile per thread started while profiling (cProfile only sees its own thread).
+
+    Installed with threading.setprofile: the first profiling event of a new thread
+    (the ThreadPoolExecutor workers of work_pool.run_ordered) swaps this hook for
+    a Profile of its own. Where the profiler already covers every thread
+    (sys.monitoring, Python 3.12+), enable() refuses and the thread is left alone.
+    """
+
+    def __init__(self) -> None:
+        self.profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def __call__(self, frame, event, arg) -> None:
+        sys.setprofile(None)
+        prof = cProfile.Profile()
+        try:
+            prof.enable()
+        except ValueError:
+            return
+        with self._lock:
+            self.profiles.append(prof)
+
+    def collected(self) -> List[cProfile.Profile]:
+        with self._lock:
+            return list(self.profiles)
+
+
+def run_profiled(profile_dir: str, fn: Callable[[], Optional[int]]) -> Optional[int]:
+    """fn(), under cProfile and tracemalloc when profile_dir is set.
+
+    Saves profile.pstats (py -m pstats, snakeviz...: main thread and worker threads
+    merged) and tracemalloc.txt (top allocations by line, peak memory) in profile_dir.
+    """
+    if not profile_dir:
+        return fn()
+    out = Path(profile_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    prof = cProfile.Profile()
+    workers = _ThreadProfiles()
+    tracemalloc.start(10)
+    threading.setprofile(workers)
+    prof.enable()
+    try:
+        return fn()
+    finally:
+        prof.disable()
+        threading.setprofile(None)
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        thread_profiles = workers.collected()
+        stats = pstats.Stats(prof)
+        for p in thread_profiles:
+            stats.add(p)
+        stats.dump_stats(str(out / "profile.pstats"))
+        lines = [f"current: {current / 1024:.0f} KiB, peak: {peak / 1024:.0f} KiB", ""]
+        lines += [str(stat) for stat in snapshot.statistics("lineno")[:40]]
+        (out / "tracemalloc.txt").write_text("\n".join(lines) + "\n", encoding="utf-8")
+        print(f"[INFO] Profil enregistre dans {out} (profile.pstats, {1 + len(thread_profiles)} thread(s); tracemalloc.txt)")
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Stand-in LibreTranslate server for offline tests and benchmarks (standard library only).
+
+Implements what the i18n tools use:
+- GET  /languages  -> [{"code": "en", "name": "en", "targets": [...]}, ...]
+- POST /translate  JSON or form body, q as a string or a list, like LibreTranslate
+- GET  /stats      counters of this server (add ?reset=1 to zero them)
+
+Behaviour knobs:
+- --latency: time per request, "fixed:0.05", "uniform:0.02,0.2" or
+  "lognormal:0.05,0.5" (median, sigma), plus --per-kb seconds per KB of body
+- --error-rate: share of /translate requests answered 503 (or --error-status)
+- --capacity: requests served at once; extra ones get 503 "busy" right away
+- --model-load: the first request for a target language waits this long, like
+  LibreTranslate loading a model; concurrent requests for it wait too
+
+The translation is a deterministic pseudo-translation: "[de] " + the text
+with its vowels accented, __PH0__-style tokens and markup left intact, so
+outputs can be compared between runs and the round-trip of tokens is checked.
+
+  py tools_translate/mock_libretranslate.py --port 5000 --latency lognormal:0.05,0.5 --error-rate 0.02
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_LANGUAGES = ("ar", "de", "en", "es", "fr", "it", "ja", "nl", "pl", "pt", "ru", "zh")
+
+# Tokens, placeholders and markup are copied as they are
+_KEEP_RE = re.compile(r"(__[A-Za-z]{2,4}\d+__|%\d*\$?[a-zA-Z]|<[^>]+>|\{\d+\})")
+_ACCENTS = str.maketrans("aeiouAEIOU", "àéîõüÀÉÎÕÜ")
+
+
+def pseudo_translate(text: str, target: str) -> str:
+    parts = _KEEP_RE.split(text)
+    # Odd indexes are the kept matches of the capturing group
+    out = "".join(p if i % 2 else p.translate(_ACCENTS) for i, p in enumerate(parts))
+    return f"[{target}] {out}"
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """'fixed:S', 'uniform:A,B' or 'lognormal:MEDIAN,SIGMA' -> sampler (seconds)."""
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v.strip()] if params else []
+    if kind == "fixed" and len(values) == 1:
+        return lambda rnd: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda rnd: rnd.uniform(values[0], values[1])
+    if kind == "lognormal" and len(values) == 2:
+        mu = math.log(values[0]) if values[0] > 0 else 0.0
+        return lambda rnd: rnd.lognormvariate(mu, values[1]) if values[0] > 0 else 0.0
+    raise ValueError(f"latence invalide: {spec!r} (fixed:S, uniform:A,B, lognormal:MEDIAN,SIGMA)")
+
+
+class MockStats:
+    """Counters of the server; latencies are the time spent answering each /translate."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests = 0
+            self.segments = 0
+            self.errors = 0
+            self.busy = 0
+            self.chars = 0
+            self.latencies: List[float] = []
+
+    def snapshot(self, reset: bool = False) -> Dict:
+        with self._lock:
+            data = {"requests": self.requests, "segments": self.segments, "errors": self.errors,
+                    "busy": self.busy, "chars": self.chars, "latencies": list(self.latencies)}
+        if reset:
+            self.reset()
+        return data
+
+
+class MockConfig:
+    def __init__(self, latency: str = "fixed:0", per_kb: float = 0.0, error_rate: float = 0.0,
+                 error_status: int = 503, capacity: int = 0, model_load: float = 0.0,
+                 languages=DEFAULT_LANGUAGES, seed: Optional[int] = None) -> None:
+        self.latency = parse_latency(latency)
+        self.per_kb = per_kb
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.capacity = capacity            # 0 = unlimited
+        self.model_load = model_load
+        self.languages = list(languages)
+        self.rnd = random.Random(seed)
+        self.rnd_lock = threading.Lock()
+        self.inflight = 0
+        self.inflight_lock = threading.Lock()
+        self.models: Dict[str, threading.Event] = {}
+        self.models_lock = threading.Lock()
+
+    def sample(self, fn: Callable[[random.Random], float]) -> float:
+        with self.rnd_lock:
+            return fn(self.rnd)
+
+    def wait_model(self, target: str) -> None:
+        if self.model_load <= 0:
+            return
+        with self.models_lock:
+            ev = self.models.get(target)
+            loader = ev is None
+            if loader:
+                ev = self.models[target] = threading.Event()
+        if loader:
+            time.sleep(self.model_load)
+            ev.set()
+        else:
+            ev.wait()
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "MockServer"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _send(self, obj, status: int = 200) -> None:
+        body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        head = (f"HTTP/1.1 {status} {self.responses.get(status, ('',))[0]}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+                f"Connection: keep-alive\r\n\r\n").encode("ascii")
+        # Headers and body in one write: two small writes hit Nagle + delayed ACK (~40 ms per request)
+        self.wfile.write(head + body)
+        self.wfile.flush()
+
+    def do_GET(self) -> None:
+        url = urllib.parse.urlsplit(self.path)
+        if url.path == "/languages":
+            langs = self.server.config.languages
+            return self._send([{"code": c, "name": c, "targets": langs} for c in langs])
+        if url.path == "/stats":
+            reset = urllib.parse.parse_qs(url.query).get("reset", ["0"])[0] == "1"
+            return self._send(self.server.stats.snapshot(reset))
+        self._send({"error": "Not Found"}, 404)
+
+    def do_POST(self) -> None:
+        raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if urllib.parse.urlsplit(self.path).path != "/translate":
+            return self._send({"error": "Not Found"}, 404)
+        cfg, stats = self.server.config, self.server.stats
+        started = time.perf_counter()
+        with cfg.inflight_lock:
+            busy = cfg.capacity > 0 and cfg.inflight >= cfg.capacity
+            if not busy:
+                cfg.inflight += 1
+        with stats._lock:
+            stats.requests += 1
+            stats.busy += busy
+        if busy:
+            return self._send({"error": "Too many requests in flight"}, 503)
+        try:
+            self._translate(raw, cfg, stats, started)
+        finally:
+            with cfg.inflight_lock:
+                cfg.inflight -= 1
+
+    def _translate(self, raw: bytes, cfg: MockConfig, stats: MockStats, started: float) -> None:
+        try:
+            if "json" in (self.headers.get("Content-Type") or ""):
+                data = json.loads(raw.decode("utf-8"))
+            else:
+                data = {k: v[0] for k, v in urllib.parse.parse_qs(raw.decode("utf-8")).items()}
+            q, target = data["q"], data["target"]
+        except (ValueError, KeyError, TypeError):
+            return self._send({"error": "Invalid request: q and target are required"}, 400)
+        if target not in cfg.languages:
+            return self._send({"error": f"{target} is not supported"}, 400)
+
+        cfg.wait_model(target)
+        time.sleep(max(0.0, cfg.sample(cfg.latency)) + cfg.per_kb * len(raw) / 1024.0)
+        if cfg.error_rate and cfg.sample(lambda rnd: rnd.random()) < cfg.error_rate:
+            with stats._lock:
+                stats.errors += 1
+            return self._send({"error": "Simulated failure"}, cfg.error_status)
+
+        texts = q if isinstance(q, list) else [q]
+        out = [pseudo_translate(str(t), target) for t in texts]
+        self._send({"translatedText": out if isinstance(q, list) else out[0]})
+        with stats._lock:
+            stats.segments += len(texts)
+            stats.chars += sum(len(str(t)) for t in texts)
+            stats.latencies.append(time.perf_counter() - started)
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host: str, port: int, config: MockConfig) -> None:
+        super().__init__((host, port), MockHandler)
+        self.config = config
+        self.stats = MockStats()
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start_background(self) -> threading.Thread:
+        """Serve from a daemon thread (for in-process benchmarks); stop with shutdown()."""
+        t = threading.Thread(target=self.serve_forever, name="mock-libretranslate", daemon=True)
+        t.start()
+        return t
+
+
+def add_arguments(ap: argparse.ArgumentParser) -> None:
+    ap.add_argument("--latency", default="fixed:0", help="fixed:S | uniform:A,B | lognormal:MEDIAN,SIGMA (seconds)")
+    ap.add_argument("--per-kb", type=float, default=0.0, help="Extra seconds per KB of request body")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="Share of /translate requests that fail")
+    ap.add_argument("--error-status", type=int, default=503, help="HTTP status of the simulated failures")
+    ap.add_argument("--capacity", type=int, default=0, help="Requests served at once, 0 = unlimited (extra: 503)")
+    ap.add_argument("--model-load", type=float, default=0.0, help="Delay of the first request per target language")
+    ap.add_argument("--languages", default=",".join(DEFAULT_LANGUAGES), help="Comma separated language codes")
+    ap.add_argument("--seed", type=int, default=None, help="Seed of latency / error draws")
+
+
+def config_from_args(args) -> MockConfig:
+    return MockConfig(args.latency, args.per_kb, args.error_rate, args.error_status, args.capacity,
+                      args.model_load, [c.strip() for c in args.languages.split(",") if c.strip()], args.seed)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Mock LibreTranslate server")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=5000)
+    add_arguments(ap)
+    args = ap.parse_args()
+    try:
+        config = config_from_args(args)
+    except ValueError as e:
+        print(f"[ERREUR] {e}")
+        return 2
+    server = MockServer(args.host, args.port, config)
+    print(f"[INFO] Mock LibreTranslate sur {server.endpoint} (Ctrl+C pour arreter)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+Adaptive request regulation for the translation backend (standard library only).
+
+Used by http_client.HttpClient around every request:
+- RetryPolicy: exponential backoff with full jitter between attempts
+- AimdLimiter: number of requests allowed in flight, grown by +1 per window of
+  fast successes and halved on overload (429/503, timeouts, latency spikes).
+  Below 1 it spaces requests out instead, so the request *rate* keeps shrinking.
+- CircuitBreaker: after N consecutive failures the backend is considered down;
+  requests fail immediately (BackendUnavailable) until a cooldown has passed,
+  then a single probe request decides whether to close it again.
+
+The ceiling of the limiter is --jobs: the tools never go above what they asked for.
+"""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+from dataclasses import dataclass
+
+
+class BackendUnavailable(RuntimeError):
+    """Raised without sending anything while the circuit breaker is open."""
+
+
+@dataclass
+class RetryPolicy:
+    retries: int = 4            # attempts after the first one
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+
+    def delay(self, attempt: int) -> float:
+        """Sleep before retry number `attempt` (0-based): uniform in [0, base * 2^attempt], capped."""
+        return random.uniform(0.0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class AimdLimiter:
+    """Additive-increase / multiplicative-decrease window on concurrent requests.
+
+    acquire() blocks until a slot is free and returns a ticket; release() reports the
+    outcome. Requests are compared on latency per KB of body, against the fastest
+    seen so far (slowly forgotten), so big batches do not count as "slow".
+    """
+
+    def __init__(self, max_limit: int, min_limit: float = 0.1, slow_factor: float = 3.0) -> None:
+        self.max_limit = float(max(1, max_limit))
+        self.min_limit = min_limit
+        self.slow_factor = slow_factor
+        self.limit = self.max_limit
+        self.lowest = self.limit
+        self.decreases = 0
+        self._inflight = 0
+        self._baseline = 0.0        # best seconds per (1 + KB) observed
+        self._avg_latency = 0.0
+        self._last_cut = 0.0
+        self._next_start = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> float:
+        with self._cond:
+            while True:
+                if self._inflight < max(1, int(self.limit)):
+                    now = time.monotonic()
+                    if now >= self._next_start:
+                        break
+                    self._cond.wait(self._next_start - now)
+                else:
+                    self._cond.wait()
+            self._inflight += 1
+            started = time.monotonic()
+            if self.limit < 1.0:
+                # Below one request in flight: wait between requests (rate = limit / latency)
+                self._next_start = started + (1.0 / self.limit - 1.0) * self._avg_latency
+            return started
+
+    def release(self, started: float, size: int = 0, overloaded: bool = False) -> None:
+        """Report the outcome of the request started at `started` (from acquire())."""
+        now = time.monotonic()
+        latency = now - started
+        with self._cond:
+            self._inflight -= 1
+            self._avg_latency = latency if not self._avg_latency else 0.8 * self._avg_latency + 0.2 * latency
+            cost = latency / (1.0 + size / 1024.0)
+            if not overloaded:
+                if not self._baseline or cost < self._baseline:
+                    self._baseline = cost
+                else:
+                    self._baseline *= 1.01      # forget an unusually fast sample over time
+                overloaded = cost > self._baseline * self.slow_factor and latency > 0.5
+            if overloaded:
+                # One cut per window: requests started before the last cut do not count again
+                if started >= self._last_cut:
+                    self.limit = max(self.min_limit, self.limit / 2.0)
+                    self.lowest = min(self.lowest, self.limit)
+                    self.decreases += 1
+                    self._last_cut = now
+            else:
+                step = 1.0 / self.limit if self.limit >= 1.0 else 0.1
+                self.limit = min(self.max_limit, self.limit + step)
+                if self.limit >= 1.0:
+                    self._next_start = 0.0
+            self._cond.notify_all()
+
+
+class CircuitBreaker:
+    def __init__(self, threshold: int = 5, cooldown: float = 15.0, max_cooldown: float = 120.0) -> None:
+        self.threshold = max(1, threshold)
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.trips = 0
+        self._failures = 0
+        self._open_until = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._open_until > 0.0
+
+    def before_request(self) -> None:
+        """Raise BackendUnavailable if no request may be sent right now."""
+        with self._lock:
+            if not self._open_until:
+                return
+            if time.monotonic() < self._open_until or self._probing:
+                raise BackendUnavailable(f"serveur indisponible ({self._failures} echecs consecutifs)")
+            # Cooldown over: let one probe through (half-open)
+            self._probing = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._open_until = 0.0
+            self._probing = False
+            self.cooldown = self.base_cooldown
+
+    def release_probe(self) -> None:
+        """Busy answer (429/503): not a failure, but no proof of recovery either.
+
+        A half-open probe is released and the next one is allowed after the
+        current cooldown; outside a probe nothing changes.
+        """
+        with self._lock:
+            if self._probing:
+                self._probing = False
+                self._open_until = time.monotonic() + self.cooldown
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probing:
+                # Probe failed: stay open, wait longer before the next one
+                self._probing = False
+                self.cooldown = min(self.max_cooldown, self.cooldown * 2.0)
+                self._open_until = time.monotonic() + self.cooldown
+            elif not self._open_until and self._failures >= self.threshold:
+                self.trips += 1
+                self._open_until = time.monotonic() + self.cooldown
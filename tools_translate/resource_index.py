@@ -0,0 +1,419 @@
+# -*- coding: utf-8 -*-
+"""
+Index of every resource declared in the values* folders of a res tree.
+
+build_index() reads each XML once (plain expat, files spread over worker
+processes) and keys every top-level resource by (folder, type, name), with its
+locations (file, line). The type is the AAPT one: <string-array>,
+<integer-array> and <array> are all "array", <item type="id"> is "id"... so two
+declarations clash here exactly when they clash for AAPT.
+
+The questions the i18n scripts ask are then set operations on the index:
+- duplicates():  same key declared more than once in a folder
+- missing():     translatable source keys absent from a locale
+- extra():       locale keys the source folder does not declare (orphans)
+- identical():   localizable keys whose locale text equals the source text
+
+The index is also kept on disk (resource_index.sqlite3, see PersistentIndex):
+load_index() only reparses the files whose size or mtime changed since the
+last call, so tools that need the whole picture start in milliseconds.
+
+CLI:
+  py tools_translate/resource_index.py where app_name
+  py tools_translate/resource_index.py lacking app_name
+  py tools_translate/resource_index.py grep "%1$s" --folder values-de
+  py tools_translate/resource_index.py --res app/src/main/res update
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple, Union
+from xml.parsers import expat
+
+SOURCE_FOLDER = "values"
+DEFAULT_INDEX_PATH = Path(__file__).resolve().parent / "resource_index.sqlite3"
+
+# Language folders (values-fr, values-pt-rBR, values-b+sr+Latn), not qualifiers like values-night
+_LOCALE_RE = re.compile(r"^values-(?:[a-z]{2,3}(?:-r[A-Z]{2})?|b\+[A-Za-z0-9+]+)$")
+
+# Element -> AAPT resource type, when they differ
+_AAPT_TYPES = {
+    "string-array": "array",
+    "integer-array": "array",
+    "declare-styleable": "styleable",
+    "eat-comment": None,
+    "skip": None,
+}
+
+# Types made of child elements: only the text inside the children counts
+_CONTAINER_TYPES = {"array", "plurals", "style", "styleable"}
+
+# Types whose text is translated (compared by missing() / identical())
+LOCALIZABLE_TYPES = ("string", "array", "plurals")
+
+_CHUNK = 64 * 1024
+
+
+class Location(NamedTuple):
+    file: str
+    line: int
+
+
+class Entry(NamedTuple):
+    """One declaration of a resource in one file."""
+    folder: str
+    type: str
+    name: str
+    file: str
+    line: int
+    value: str              # text content, items separated by \x1f, nested tags as <tag>
+    translatable: bool
+
+
+Key = Tuple[str, str, str]  # (folder, type, name)
+
+
+def is_locale_folder(name: str) -> bool:
+    return bool(_LOCALE_RE.match(name))
+
+
+def resource_type(tag: str, attrs: Dict[str, str]) -> Optional[str]:
+    """AAPT type of a top-level element of <resources>; None for non-resources."""
+    if tag == "item":
+        return attrs.get("type")
+    return _AAPT_TYPES.get(tag, tag)
+
+
+def scan_file(path: Path, folder: Optional[str] = None) -> List[Entry]:
+    """Every named top-level resource of a values XML, in document order.
+
+    Files whose root is not <resources> give nothing. Raises expat.ExpatError on invalid XML.
+    """
+    folder = folder or path.parent.name
+    file = str(path)
+    entries: List[Entry] = []
+    depth = 0
+    is_resources = True
+    current: Optional[list] = None     # [type, name, line, parts, translatable]
+
+    parser = expat.ParserCreate()
+
+    def start(tag: str, attrs: Dict[str, str]) -> None:
+        nonlocal depth, is_resources, current
+        depth += 1
+        if depth == 1:
+            is_resources = tag == "resources"
+        elif depth == 2 and is_resources:
+            rtype = resource_type(tag, attrs)
+            name = attrs.get("name")
+            if rtype and name:
+                current = [rtype, name, parser.CurrentLineNumber, [],
+                           attrs.get("translatable", "true").lower() != "false"]
+        elif current is not None:
+            if depth == 3 and tag == "item":
+                current[3].append("\x1f")
+            else:
+                current[3].append(f"<{tag}>")
+
+    def end(tag: str) -> None:
+        nonlocal depth, current
+        if depth == 2 and current is not None:
+            rtype, name, line, parts, translatable = current
+            entries.append(Entry(folder, rtype, name, file, line, "".join(parts).strip(), translatable))
+            current = None
+        depth -= 1
+
+    def data(text: str) -> None:
+        if current is not None and (depth > 2 or current[0] not in _CONTAINER_TYPES):
+            current[3].append(text)
+
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    parser.CharacterDataHandler = data
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(_CHUNK)
+            parser.Parse(chunk, not chunk)
+            if not chunk or not is_resources:
+                break
+    return entries
+
+
+def _scan_or_error(path: Path) -> Tuple[List[Entry], Optional[str]]:
+    try:
+        return scan_file(path), None
+    except (OSError, expat.ExpatError) as e:
+        return [], f"{path}: {e}"
+
+
+def values_files(res_dir: Path) -> List[Path]:
+    """XML files of the values* folders of res_dir, in a stable order."""
+    return sorted(p for d in res_dir.iterdir() if d.is_dir() and d.name.startswith("values")
+                  for p in d.glob("*.xml") if p.is_file())
+
+
+class ResourceIndex:
+    def __init__(self, entries: Iterable[Entry] = (), errors: Iterable[str] = ()) -> None:
+        self.locations: Dict[Key, List[Location]] = {}
+        self.entries: Dict[Key, Entry] = {}      # first declaration of each key
+        self.errors: List[str] = list(errors)    # unreadable / invalid files
+        self._folders: Dict[str, Set[Tuple[str, str]]] = {}
+        for e in entries:
+            self.add(e)
+
+    def add(self, e: Entry) -> None:
+        key = (e.folder, e.type, e.name)
+        locs = self.locations.get(key)
+        if locs is None:
+            self.locations[key] = [Location(e.file, e.line)]
+            self.entries[key] = e
+            self._folders.setdefault(e.folder, set()).add((e.type, e.name))
+        else:
+            locs.append(Location(e.file, e.line))
+
+    @property
+    def folders(self) -> List[str]:
+        return sorted(self._folders)
+
+    @property
+    def locales(self) -> List[str]:
+        return [f for f in self.folders if is_locale_folder(f)]
+
+    def keys(self, folder: str) -> Set[Tuple[str, str]]:
+        """(type, name) declared in folder."""
+        return self._folders.get(folder, set())
+
+    def _translatable(self, folder: str) -> Set[Tuple[str, str]]:
+        return {k for k in self.keys(folder)
+                if k[0] in LOCALIZABLE_TYPES and self.entries[(folder, *k)].translatable}
+
+    def duplicates(self, folder: str) -> Dict[Tuple[str, str], List[Location]]:
+        return {k[1:]: locs for k, locs in self.locations.items() if k[0] == folder and len(locs) > 1}
+
+    def missing(self, locale: str, source: str = SOURCE_FOLDER) -> Set[Tuple[str, str]]:
+        return self._translatable(source) - self.keys(locale)
+
+    def extra(self, locale: str, source: str = SOURCE_FOLDER) -> Set[Tuple[str, str]]:
+        return self.keys(locale) - self.keys(source)
+
+    def identical(self, locale: str, source: str = SOURCE_FOLDER) -> Set[Tuple[str, str]]:
+        """Translatable keys of source whose locale text is the same (and has a letter)."""
+        entries = self.entries
+        return {k for k in self._translatable(source) & self.keys(locale)
+                if entries[(locale, *k)].value == entries[(source, *k)].value
+                and any(c.isalpha() for c in entries[(source, *k)].value)}
+
+
+def scan_files(files: List[Path], jobs: int = 1) -> Iterator[Tuple[List[Entry], Optional[str]]]:
+    """scan_file() over files, in order, as (entries, error); jobs > 1 spreads them over processes."""
+    if jobs <= 1 or len(files) < 2:
+        yield from map(_scan_or_error, files)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as ex:
+        yield from ex.map(_scan_or_error, files, chunksize=max(1, len(files) // (jobs * 4)))
+
+
+def build_index(res_dir: Path, jobs: int = 1) -> ResourceIndex:
+    """Scan every values* XML of res_dir, without the on-disk cache."""
+    index = ResourceIndex()
+    for entries, error in scan_files(values_files(res_dir), jobs):
+        for e in entries:
+            index.add(e)
+        if error:
+            index.errors.append(error)
+    return index
+
+
+# -- persistent index ----------------------------------------------------------
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS files (
+    path     TEXT PRIMARY KEY,      -- relative to res_dir, with /
+    size     INTEGER NOT NULL,
+    mtime_ns INTEGER,               -- NULL: written too recently to trust, rescanned next time
+    error    TEXT
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS resources (
+    path         TEXT NOT NULL,
+    folder       TEXT NOT NULL,
+    type         TEXT NOT NULL,
+    name         TEXT NOT NULL,
+    line         INTEGER NOT NULL,
+    value        TEXT NOT NULL,
+    translatable INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS resources_by_name ON resources (name, type);
+CREATE INDEX IF NOT EXISTS resources_by_path ON resources (path);
+"""
+
+# Bump when scan_file() records something different: the cache is rebuilt.
+_INDEX_VERSION = "1"
+
+# Same rule as the sanitizer state: mtime resolution can be 2 s (FAT, shares)
+_MTIME_SLACK_NS = 2_000_000_000
+
+
+class PersistentIndex:
+    """ResourceIndex kept in a SQLite file, refreshed file by file.
+
+    update() stats every values* XML and reparses only the ones whose size or
+    mtime changed (plus new ones); deleted files are dropped. The cache belongs
+    to one res_dir: pointing it at another one rebuilds it.
+    """
+
+    def __init__(self, res_dir: Path, path: Union[Path, str] = "") -> None:
+        self.res_dir = Path(res_dir).resolve()
+        self.path = Path(path) if path else DEFAULT_INDEX_PATH
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path))
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        meta = dict(self._db.execute("SELECT key, value FROM meta"))
+        if meta.get("version") != _INDEX_VERSION or meta.get("res_dir") != str(self.res_dir):
+            with self._db:
+                self._db.execute("DELETE FROM files")
+                self._db.execute("DELETE FROM resources")
+                self._db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                                     [("version", _INDEX_VERSION), ("res_dir", str(self.res_dir))])
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self) -> "PersistentIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def update(self, jobs: int = 1) -> Tuple[int, int, int]:
+        """Bring the cache in line with the tree. Returns (reparsed, removed, unchanged)."""
+        started_ns = time.time_ns()
+        known = {p: (size, mtime) for p, size, mtime in self._db.execute("SELECT path, size, mtime_ns FROM files")}
+        stale: List[Tuple[Path, str, os.stat_result]] = []
+        seen: Set[str] = set()
+        for f in values_files(self.res_dir):
+            rel = f.relative_to(self.res_dir).as_posix()
+            seen.add(rel)
+            st = f.stat()
+            if known.get(rel) != (st.st_size, st.st_mtime_ns):
+                stale.append((f, rel, st))
+        removed = [rel for rel in known if rel not in seen]
+
+        with self._db:
+            gone = removed + [rel for _, rel, _ in stale if rel in known]
+            self._db.executemany("DELETE FROM resources WHERE path=?", [(rel,) for rel in gone])
+            self._db.executemany("DELETE FROM files WHERE path=?", [(rel,) for rel in gone])
+            results = scan_files([f for f, _, _ in stale], jobs)
+            for (f, rel, st), (entries, error) in zip(stale, results):
+                mtime = st.st_mtime_ns if st.st_mtime_ns < started_ns - _MTIME_SLACK_NS else None
+                self._db.execute("INSERT INTO files VALUES (?, ?, ?, ?)", (rel, st.st_size, mtime, error))
+                self._db.executemany(
+                    "INSERT INTO resources VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(rel, e.folder, e.type, e.name, e.line, e.value, int(e.translatable)) for e in entries],
+                )
+        return len(stale), len(removed), len(seen) - len(stale)
+
+    def load(self) -> ResourceIndex:
+        """The whole cache as an in-memory ResourceIndex (same content as build_index())."""
+        index = ResourceIndex(errors=(err for err, in self._db.execute(
+            "SELECT error FROM files WHERE error IS NOT NULL ORDER BY path")))
+        for e in self._entries("1 ORDER BY path, line"):
+            index.add(e)
+        return index
+
+    # -- queries (straight SQL, no ResourceIndex needed) -------------------------
+
+    def where(self, name: str, rtype: Optional[str] = None) -> List[Entry]:
+        """Every declaration of name (optionally of one type), in every folder."""
+        if rtype:
+            return self._entries("name=? AND type=? ORDER BY folder, path, line", name, rtype)
+        return self._entries("name=? ORDER BY folder, type, path, line", name)
+
+    def lacking(self, name: str, rtype: Optional[str] = None) -> List[str]:
+        """Locale folders that do not declare name."""
+        present = {e.folder for e in self.where(name, rtype)}
+        folders = {f.name for f in self.res_dir.iterdir() if f.is_dir() and is_locale_folder(f.name)}
+        return sorted(folders - present)
+
+    def grep(self, needle: str, folder: Optional[str] = None) -> List[Entry]:
+        """Resources whose text contains needle (plain substring, case sensitive)."""
+        if folder:
+            return self._entries("instr(value, ?) > 0 AND folder=? ORDER BY path, line", needle, folder)
+        return self._entries("instr(value, ?) > 0 ORDER BY folder, path, line", needle)
+
+    def _entries(self, where: str, *params: object) -> List[Entry]:
+        res = str(self.res_dir)
+        rows = self._db.execute(
+            f"SELECT folder, type, name, path, line, value, translatable FROM resources WHERE {where}", params)
+        return [Entry(folder, rtype, name, os.path.join(res, *path.split("/")), line, value, bool(tr))
+                for folder, rtype, name, path, line, value, tr in rows]
+
+
+def load_index(res_dir: Path, jobs: int = 1, path: Union[Path, str] = "") -> ResourceIndex:
+    """ResourceIndex of res_dir through the on-disk cache (only changed files are reparsed)."""
+    with PersistentIndex(res_dir, path) as cache:
+        cache.update(jobs)
+        return cache.load()
+
+
+def _show(e: Entry) -> str:
+    value = e.value.replace("\x1f", " | ").strip(" |")
+    return f"{e.file}:{e.line}  {e.type}/{e.name}  {value[:120]}"
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Query the values* resources of a res tree (cached index)")
+    ap.add_argument("--res", default="app/src/main/res", help="Path to app/src/main/res")
+    ap.add_argument("--index", default=str(DEFAULT_INDEX_PATH), help="Path to the index cache file")
+    ap.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Processes used to reparse changed files")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("update", help="Refresh the cache and show what was reparsed")
+    q = sub.add_parser("where", help="Where is a key defined")
+    q.add_argument("name")
+    q.add_argument("--type", default=None, help="string, array, plurals, color...")
+    q = sub.add_parser("lacking", help="Which locales lack a key")
+    q.add_argument("name")
+    q.add_argument("--type", default=None)
+    q = sub.add_parser("grep", help="Which resources contain a text (e.g. %%1$s)")
+    q.add_argument("text")
+    q.add_argument("--folder", default=None, help="Only this folder, e.g. values-fr")
+    args = ap.parse_args()
+
+    res = Path(args.res)
+    if not res.is_dir():
+        print(f"[ERREUR] Dossier res introuvable: {res}")
+        return 2
+
+    t0 = time.perf_counter()
+    with PersistentIndex(res, args.index) as cache:
+        reparsed, removed, unchanged = cache.update(args.jobs)
+        if args.cmd == "update":
+            print(f"[OK] {reparsed} fichiers relus, {removed} supprimes, {unchanged} inchanges")
+            return 0
+        if args.cmd == "where":
+            found = [_show(e) for e in cache.where(args.name, args.type)]
+        elif args.cmd == "lacking":
+            found = cache.lacking(args.name, args.type)
+        else:
+            found = [_show(e) for e in cache.grep(args.text, args.folder)]
+    for line in found:
+        print(line)
+    print(f"[INFO] {len(found)} resultat(s) en {(time.perf_counter() - t0) * 1000:.0f} ms"
+          f" ({reparsed} fichiers relus)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,12 +1,21 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
+import argparse
+import hashlib
+import json
+import mmap
+import os
 import re
 import shutil
-from dataclasses import dataclass
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, fields
 from datetime import datetime
 from pathlib import Path
 
+from file_writer import write_atomic
+
 # This file is intentionally written WITHOUT docstrings containing "\u" to avoid
 # Python unicodeescape parsing issues on Windows.
 
@@ -16,8 +25,13 @@ class Stats:
     files_fixed: int = 0
     occurrences: int = 0
     files_moved: int = 0
+    files_skipped: int = 0
     io_errors: int = 0
 
+    def merge(self, other: Stats) -> None:
+        for f in fields(self):
+            setattr(self, f.name, getattr(self, f.name) + getattr(other, f.name))
+
 # Match language resource folders like: values-en, values-fr, values-es, values-de, values-en-rUS...
 # Avoid qualifiers like values-night, values-land, values-sw600dp, etc.
 _LANG_RE = re.compile(r"^values-([a-z]{2,3})(?:$|-r[A-Z]{2}$)")
@@ -40,18 +54,25 @@ _NON_LOCALIZABLE_GLOBS = [
 # Keep: \\ \n \t \r \b \' \" and also \@ \? to escape resource refs.
 _ALLOWED_ESCAPES = set(list("ntrb'\"\\@?"))
 
-_HEX4 = re.compile(r"^[0-9a-fA-F]{4}$")
-
 
 def _is_language_values_dir(p: Path) -> bool:
     return p.is_dir() and bool(_LANG_RE.match(p.name))
 
 
 def _make_backup_dir(script_dir: Path) -> Path:
+    # One folder per run, never shared: two runs started in the same second get
+    # <ts>_2, <ts>_3... so their moves cannot overwrite each other.
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup = script_dir / "_i18n_backup" / ts
-    backup.mkdir(parents=True, exist_ok=True)
-    return backup
+    parent = script_dir / "_i18n_backup"
+    parent.mkdir(parents=True, exist_ok=True)
+    n = 1
+    while True:
+        backup = parent / (ts if n == 1 else f"{ts}_{n}")
+        try:
+            backup.mkdir()
+            return backup
+        except FileExistsError:
+            n += 1
 
 
 def _matches_any_glob(path: Path, globs: list[str]) -> bool:
@@ -61,95 +82,173 @@ def _matches_any_glob(path: Path, globs: list[str]) -> bool:
     return False
 
 
+# A backslash that starts an invalid escape: alone (not part of a run of 2+), and
+# not followed by an allowed escape char nor by a valid unicode escape (u + 4 hex).
+_RE_INVALID_BACKSLASH = re.compile(
+    r"(?<!\\)\\(?![" + "".join(re.escape(c) for c in sorted(_ALLOWED_ESCAPES)) + r"]|u[0-9a-fA-F]{4})"
+)
+
+# Files at least this big are checked through mmap (no copy when they are clean)
+_MMAP_MIN_SIZE = 1024 * 1024
+
+
 def _fix_invalid_backslashes(s: str) -> tuple[str, int]:
     # Fix invalid backslash escapes for Android string resources.
-    # Keep allowed escapes and valid unicode \uXXXX, escape everything else.
-
+    # Keep allowed escapes, valid unicode escapes and runs of 2+ backslashes,
+    # double every other backslash. One regex pass; same output as the old
+    # char-by-char loop (see tools/check_sanitizer_fast_path.py).
     if "\\" not in s:
         return s, 0
+    return _RE_INVALID_BACKSLASH.subn(r"\\\\", s)
+
+
+def _read_if_backslash(path: Path) -> bytes | None:
+    # Raw bytes of the file, or None when it holds no backslash at all.
+    # 0x5C never appears inside a multi-byte UTF-8 sequence, so no decode is needed.
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= _MMAP_MIN_SIZE:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if mm.find(b"\\") < 0:
+                    return None
+                return mm[:]
+        raw = f.read()
+    return raw if b"\\" in raw else None
+
+
+def sanitize_xml_bytes(raw: bytes) -> tuple[bytes, int]:
+    # Same fix as the files of a run, on XML bytes about to be written
+    # (used by the watch mode of the v2 translator). Returns (bytes, fixes).
+    if b"\\" not in raw:
+        return raw, 0
+    text = raw.decode("utf-8-sig")  # accept BOM
+    fixed_text, occ = _fix_invalid_backslashes(text)
+    if occ > 0 and fixed_text != text:
+        return fixed_text.encode("utf-8"), occ
+    return raw, 0
 
-    out: list[str] = []
-    i = 0
-    occ = 0
-    n = len(s)
 
-    while i < n:
-        ch = s[i]
-        if ch != "\\":
-            out.append(ch)
-            i += 1
-            continue
+def _sanitize_one_xml_file(path: Path) -> tuple[bool, int]:
+    # Text-level sanitization (no XML parsing), keeps formatting intact.
+    raw = _read_if_backslash(path)
+    if raw is None:
+        return False, 0
+    fixed, occ = sanitize_xml_bytes(raw)
+    if occ > 0:
+        write_atomic(path, fixed)
+        return True, occ
+    return False, 0
 
-        # Count consecutive backslashes
-        j = i
-        while j < n and s[j] == "\\":
-            j += 1
-        run_len = j - i
 
-        # If already escaped (\\ or more), keep as-is
-        if run_len >= 2:
-            out.append("\\" * run_len)
-            i = j
-            continue
+# -- incremental state ---------------------------------------------------------
+# sanitize_state.json remembers, per file, the size / mtime / sha1 it had when it
+# was last verified clean. A file whose size and mtime did not change is skipped
+# without being read; one that was only touched (same sha1) is not fixed again.
+# The state is tied to a signature of the rules below: change them (or bump
+# _RULES_VERSION for a change the signature cannot see) and everything is rescanned.
 
-        # Single backslash
-        if j >= n:
-            out.append("\\\\")
-            occ += 1
-            i = j
-            continue
+_RULES_VERSION = 1
+DEFAULT_STATE_PATH = Path(__file__).resolve().parent / "sanitize_state.json"
 
-        nxt = s[j]
+# mtime resolution is 2 s on FAT and some network shares: a file written that
+# recently could change again without its mtime moving, so it is hashed next time.
+_MTIME_SLACK_NS = 2_000_000_000
 
-        # Valid simple escapes
-        if nxt in _ALLOWED_ESCAPES:
-            out.append("\\")
-            out.append(nxt)
-            i = j + 1
-            continue
 
-        # Unicode escape \uXXXX
-        if nxt == "u":
-            hex_part = s[j + 1 : j + 5] if (j + 5) <= n else ""
-            if len(hex_part) == 4 and _HEX4.match(hex_part):
-                out.append("\\u")
-                out.append(hex_part)
-                i = j + 5
-                continue
-            # Invalid \u -> escape backslash
-            out.append("\\\\u")
-            occ += 1
-            i = j + 1
-            continue
+def _rules_signature() -> str:
+    rules = [str(_RULES_VERSION), _RE_INVALID_BACKSLASH.pattern, *_NON_LOCALIZABLE_GLOBS]
+    return hashlib.sha1("\n".join(rules).encode("utf-8")).hexdigest()
 
-        # Uppercase \U (common in Windows paths like C:\Users)
-        if nxt == "U":
-            out.append("\\\\U")
-            occ += 1
-            i = j + 1
-            continue
 
-        # Unknown escape -> escape backslash
-        out.append("\\\\")
-        out.append(nxt)
-        occ += 1
-        i = j + 1
+def _load_state(path: Path) -> dict | None:
+    # File entries of the last run, or None when missing/unreadable/made with other rules
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if data.get("rules") == _rules_signature():
+            return data["files"]
+    except (OSError, ValueError, KeyError, AttributeError):
+        pass
+    return None
 
-    return "".join(out), occ
 
+def _save_state(path: Path, files: dict) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    data = {"rules": _rules_signature(), "files": files}
+    tmp.write_text(json.dumps(data, indent=1, sort_keys=True), encoding="utf-8")
+    tmp.replace(path)
+
+
+def _sha1_file(path: Path) -> str:
+    return hashlib.sha1(path.read_bytes()).hexdigest()
 
-def _sanitize_one_xml_file(path: Path) -> tuple[bool, int]:
-    # Text-level sanitization (no XML parsing), keeps formatting intact.
-    raw = path.read_bytes()
-    text = raw.decode("utf-8-sig")  # accept BOM
-    fixed_text, occ = _fix_invalid_backslashes(text)
-    if occ > 0 and fixed_text != text:
-        path.write_text(fixed_text, encoding="utf-8", newline="\n")
-        return True, occ
-    return False, 0
+
+def _clean_entry(path: Path, digest: str, started_ns: int) -> dict:
+    st = path.stat()
+    mtime = st.st_mtime_ns if st.st_mtime_ns < started_ns - _MTIME_SLACK_NS else None
+    return {"size": st.st_size, "mtime_ns": mtime, "sha1": digest}
+
+
+def _sanitize_values_dir(vdir: Path, res_dir: Path, backup_root: Path, script_dir: Path,
+                         known: dict, started_ns: int) -> tuple[Stats, list[str], dict]:
+    # One values-xx folder; runs in a worker process when --jobs > 1.
+    # Log lines are returned, not printed, so the output keeps the folder order.
+    # Every move goes to backup_root/values-xx/..., a subtree only this folder's
+    # worker writes to, so concurrent workers never target the same file.
+    # known: state entries of this folder ({} = rescan all); the entries of the
+    # files found clean are returned.
+    stats = Stats()
+    log: list[str] = []
+    clean: dict = {}
+    for xml in sorted(vdir.glob("*.xml")):
+        stats.files_scanned += 1
+        rel = xml.relative_to(res_dir)
+
+        if _matches_any_glob(xml, _NON_LOCALIZABLE_GLOBS):
+            dest = backup_root / rel
+            try:
+                dest.parent.mkdir(parents=True, exist_ok=True)
+                shutil.move(str(xml), str(dest))
+                stats.files_moved += 1
+                log.append(f"[MOVE] {rel} -> {dest.relative_to(script_dir)}")
+            except Exception as e:
+                stats.io_errors += 1
+                log.append(f"[WARN] Impossible de deplacer {rel}: {e}")
+            continue
+
+        key = rel.as_posix()
+        prev = known.get(key)
+        try:
+            if prev is not None:
+                st = xml.stat()
+                if prev["mtime_ns"] == st.st_mtime_ns and prev["size"] == st.st_size:
+                    stats.files_skipped += 1
+                    clean[key] = prev
+                    continue
+                digest = _sha1_file(xml)
+                if digest == prev["sha1"]:
+                    stats.files_skipped += 1
+                    clean[key] = _clean_entry(xml, digest, started_ns)
+                    continue
+            changed, occ = _sanitize_one_xml_file(xml)
+            if changed:
+                stats.files_fixed += 1
+                stats.occurrences += occ
+                log.append(f"[FIX]  {rel}  (+{occ} corrections)")
+            clean[key] = _clean_entry(xml, _sha1_file(xml), started_ns)
+        except Exception as e:
+            stats.io_errors += 1
+            log.append(f"[WARN] Echec lecture/ecriture {rel}: {e}")
+    return stats, log, clean
 
 
 def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                    help="values-xx folders processed in parallel (processes); 1 = serial")
+    ap.add_argument("--state", default=str(DEFAULT_STATE_PATH), help="State file of the incremental mode")
+    ap.add_argument("--full", action="store_true", help="Rescan every file, ignoring the state file")
+    args = ap.parse_args()
+
     script_dir = Path(__file__).resolve().parent
     project_root = script_dir.parent
     res_dir = project_root / "app" / "src" / "main" / "res"
@@ -178,39 +277,48 @@ def main() -> int:
 
     print("[INFO] Dossiers langues detectes:", ", ".join([p.name for p in values_dirs]))
 
-    for vdir in values_dirs:
-        for xml in sorted(vdir.glob("*.xml")):
-            stats.files_scanned += 1
-
-            if _matches_any_glob(xml, _NON_LOCALIZABLE_GLOBS):
-                rel = xml.relative_to(res_dir)
-                dest = backup_root / rel
-                dest.parent.mkdir(parents=True, exist_ok=True)
-                try:
-                    shutil.move(str(xml), str(dest))
-                    stats.files_moved += 1
-                    print(f"[MOVE] {rel} -> {dest.relative_to(script_dir)}")
-                except Exception as e:
-                    stats.io_errors += 1
-                    print(f"[WARN] Impossible de deplacer {rel}: {e}")
-                continue
-
-            try:
-                changed, occ = _sanitize_one_xml_file(xml)
-                if changed:
-                    stats.files_fixed += 1
-                    stats.occurrences += occ
-                    rel = xml.relative_to(res_dir)
-                    print(f"[FIX]  {rel}  (+{occ} corrections)")
-            except Exception as e:
-                stats.io_errors += 1
-                rel = xml.relative_to(res_dir)
-                print(f"[WARN] Echec lecture/ecriture {rel}: {e}")
+    state_path = Path(args.state)
+    known = None if args.full else _load_state(state_path)
+    if args.full:
+        print("[INFO] --full: scan complet")
+    elif known is None:
+        print(f"[INFO] Pas d'etat valide ({state_path.name} absent ou regles modifiees): scan complet")
+    known = known or {}
+    started_ns = time.time_ns()
+    clean: dict = {}
+
+    jobs = max(1, min(args.jobs, len(values_dirs)))
+    t0 = time.perf_counter()
+    tasks = [(vdir, res_dir, backup_root, script_dir,
+              {k: v for k, v in known.items() if k.startswith(vdir.name + "/")}, started_ns)
+             for vdir in values_dirs]
+    if jobs == 1:
+        results = (_sanitize_values_dir(*t) for t in tasks)
+        pool = None
+    else:
+        print(f"[INFO] {jobs} processus")
+        pool = ProcessPoolExecutor(max_workers=jobs)
+        results = pool.map(_sanitize_values_dir, *zip(*tasks))
+    try:
+        # map() yields in folder order: same log as the serial loop
+        for dir_stats, log, dir_clean in results:
+            stats.merge(dir_stats)
+            clean.update(dir_clean)
+            for line in log:
+                print(line)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    try:
+        _save_state(state_path, clean)
+    except OSError as e:
+        print(f"[WARN] Etat non enregistre ({state_path}): {e}")
 
     print("--------------------------------------------------")
-    print(f"[DONE] Fichiers scannes: {stats.files_scanned}")
+    print(f"[DONE] Fichiers scannes: {stats.files_scanned} (inchanges, ignores: {stats.files_skipped})")
     print(f"[DONE] Fichiers corriges: {stats.files_fixed} (occurrences: {stats.occurrences})")
     print(f"[DONE] Fichiers deplaces: {stats.files_moved}")
+    print(f"[DONE] Duree: {time.perf_counter() - t0:.2f} s")
     if stats.io_errors:
         print(f"[WARN] Problemes I/O: {stats.io_errors}")
     print(f"[INFO] Backup non-destructif: {backup_root}")
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Content-addressed snapshots of the res tree (replaces the translations_backup_*.zip).
+
+Layout, under <project>/.res_snapshots/:
+  objects/ab/cdef...   one zlib-compressed blob per distinct file content (sha1 of the raw bytes)
+  snapshots/<id>.json  manifest of one snapshot: {relative path: sha1, size, mtime_ns}
+
+A snapshot only writes the blobs never seen before, so a run where nothing
+changed costs one small JSON file. Files whose size and mtime match the
+previous snapshot are not even read (their hash is reused).
+
+CLI:
+  py tools_translate/snapshot_store.py create --label "before translate"
+  py tools_translate/snapshot_store.py list
+  py tools_translate/snapshot_store.py restore 20251213_181659
+  py tools_translate/snapshot_store.py restore 20251213_181659 --file values-de/strings.xml
+  py tools_translate/snapshot_store.py gc --keep 10 --keep-days 30
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import hashlib
+import json
+import time
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from file_writer import write_atomic
+
+DEFAULT_PROJECT = Path(__file__).resolve().parent.parent
+RES_RELATIVE = Path("app") / "src" / "main" / "res"
+STORE_DIRNAME = ".res_snapshots"
+
+# Same rule as the sanitizer state / resource index: an mtime this recent is not trusted
+_MTIME_SLACK_NS = 2_000_000_000
+
+
+@dataclass
+class SnapshotInfo:
+    id: str
+    created: str
+    label: str
+    files: int
+    new_blobs: int = 0
+    new_bytes: int = 0          # compressed bytes added to objects/
+
+
+def _sha1(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+class SnapshotStore:
+    def __init__(self, root: Path) -> None:
+        self.root = Path(root)
+        self.objects = self.root / "objects"
+        self.snapshots = self.root / "snapshots"
+
+    # -- blobs ---------------------------------------------------------------
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.objects / digest[:2] / digest[2:]
+
+    def _put_blob(self, digest: str, data: bytes) -> int:
+        """Store data under digest if missing. Returns the compressed bytes written (0 if known)."""
+        path = self._blob_path(digest)
+        if path.exists():
+            return 0
+        packed = zlib.compress(data, 6)
+        write_atomic(path, packed)
+        return len(packed)
+
+    def read_blob(self, digest: str) -> bytes:
+        data = zlib.decompress(self._blob_path(digest).read_bytes())
+        if _sha1(data) != digest:
+            raise ValueError(f"blob corrompu: {digest}")
+        return data
+
+    # -- manifests -----------------------------------------------------------
+
+    def list(self) -> List[SnapshotInfo]:
+        """Snapshots, oldest first."""
+        out = []
+        for p in sorted(self.snapshots.glob("*.json")):
+            try:
+                m = json.loads(p.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            out.append(SnapshotInfo(p.stem, m.get("created", ""), m.get("label", ""), len(m.get("files", {}))))
+        return out
+
+    def manifest(self, snap_id: str) -> Dict[str, Dict]:
+        path = self.snapshots / f"{snap_id}.json"
+        if not path.exists():
+            raise FileNotFoundError(f"snapshot inconnu: {snap_id}")
+        return json.loads(path.read_text(encoding="utf-8"))["files"]
+
+    def _new_id(self) -> str:
+        ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        n = 1
+        while (self.snapshots / f"{ts if n == 1 else f'{ts}_{n}'}.json").exists():
+            n += 1
+        return ts if n == 1 else f"{ts}_{n}"
+
+    # -- operations ----------------------------------------------------------
+
+    def snapshot(self, src: Path, label: str = "") -> SnapshotInfo:
+        """Record every file under src. Only unseen contents are stored."""
+        started_ns = time.time_ns()
+        previous: Dict[str, Dict] = {}
+        snaps = self.list()
+        if snaps:
+            try:
+                previous = self.manifest(snaps[-1].id)
+            except (OSError, ValueError, KeyError):
+                previous = {}
+
+        files: Dict[str, Dict] = {}
+        new_blobs = new_bytes = 0
+        for p in sorted(src.rglob("*")):
+            if not p.is_file():
+                continue
+            rel = p.relative_to(src).as_posix()
+            st = p.stat()
+            prev = previous.get(rel)
+            if (prev and prev.get("mtime_ns") == st.st_mtime_ns and prev["size"] == st.st_size
+                    and self._blob_path(prev["sha1"]).exists()):
+                digest = prev["sha1"]
+            else:
+                data = p.read_bytes()
+                digest = _sha1(data)
+                written = self._put_blob(digest, data)
+                if written:
+                    new_blobs += 1
+                    new_bytes += written
+            mtime = st.st_mtime_ns if st.st_mtime_ns < started_ns - _MTIME_SLACK_NS else None
+            files[rel] = {"sha1": digest, "size": st.st_size, "mtime_ns": mtime}
+
+        snap_id = self._new_id()
+        created = datetime.datetime.now().isoformat(timespec="seconds")
+        manifest = {"created": created, "label": label, "source": str(src), "files": files}
+        # Manifest last: a crash before this line leaves orphan blobs (removed by gc), never a broken snapshot
+        write_atomic(self.snapshots / f"{snap_id}.json", json.dumps(manifest, indent=1, sort_keys=True).encode("utf-8"))
+        return SnapshotInfo(snap_id, created, label, len(files), new_blobs, new_bytes)
+
+    def restore(self, snap_id: str, dest: Path, paths: Optional[Iterable[str]] = None,
+                delete_extra: bool = False) -> Tuple[int, int, int]:
+        """Put files of a snapshot back under dest. Returns (restored, unchanged, deleted).
+
+        paths limits the restore to some relative paths (e.g. "values-de/strings.xml").
+        Files whose content already matches are not rewritten. delete_extra (full
+        restore only) removes files that did not exist in the snapshot.
+        """
+        files = self.manifest(snap_id)
+        if paths is not None:
+            wanted = [p.replace("\\", "/") for p in paths]
+            missing = [p for p in wanted if p not in files]
+            if missing:
+                raise FileNotFoundError(f"absent du snapshot {snap_id}: {', '.join(missing)}")
+            files = {p: files[p] for p in wanted}
+        restored = unchanged = deleted = 0
+        for rel, meta in sorted(files.items()):
+            target = dest / rel
+            try:
+                if target.stat().st_size == meta["size"] and _sha1(target.read_bytes()) == meta["sha1"]:
+                    unchanged += 1
+                    continue
+            except OSError:
+                pass
+            write_atomic(target, self.read_blob(meta["sha1"]))
+            restored += 1
+        if delete_extra and paths is None:
+            for p in sorted(dest.rglob("*")):
+                if p.is_file() and p.relative_to(dest).as_posix() not in files:
+                    p.unlink()
+                    deleted += 1
+        return restored, unchanged, deleted
+
+    def gc(self, keep: int = 10, keep_days: Optional[float] = None) -> Tuple[int, int, int]:
+        """Drop old snapshots, then every blob no snapshot uses. Returns (snapshots, blobs, bytes) removed.
+
+        The newest `keep` snapshots are always kept; with keep_days, anything
+        younger than that is kept too.
+        """
+        snaps = self.list()
+        limit = time.time() - keep_days * 86400 if keep_days is not None else None
+        dropped = 0
+        for i, s in enumerate(snaps):
+            if i >= len(snaps) - keep:
+                break
+            path = self.snapshots / f"{s.id}.json"
+            if limit is not None and path.stat().st_mtime >= limit:
+                continue
+            path.unlink()
+            dropped += 1
+
+        used = set()
+        for s in self.list():
+            used.update(meta["sha1"] for meta in self.manifest(s.id).values())
+        blobs = freed = 0
+        for p in self.objects.glob("*/*"):
+            if p.parent.name + p.name not in used:
+                freed += p.stat().st_size
+                p.unlink()
+                blobs += 1
+        return dropped, blobs, freed
+
+
+def snapshot_res(project: Path, label: str = "") -> SnapshotInfo:
+    """Snapshot <project>/app/src/main/res into <project>/.res_snapshots."""
+    return SnapshotStore(project / STORE_DIRNAME).snapshot(project / RES_RELATIVE, label)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Snapshots of app/src/main/res")
+    ap.add_argument("--project", default=str(DEFAULT_PROJECT), help="Project root (where app/ is)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    c = sub.add_parser("create", help="Take a snapshot now")
+    c.add_argument("--label", default="")
+    sub.add_parser("list", help="List the snapshots")
+    r = sub.add_parser("restore", help="Restore a snapshot, or some files of it")
+    r.add_argument("id")
+    r.add_argument("--file", action="append", default=None, help="Relative to res/, e.g. values-de/strings.xml (repeatable)")
+    r.add_argument("--delete-extra", action="store_true", help="Also delete files that were not in the snapshot")
+    g = sub.add_parser("gc", help="Delete old snapshots and unused blobs")
+    g.add_argument("--keep", type=int, default=10, help="Newest snapshots always kept")
+    g.add_argument("--keep-days", type=float, default=None, help="Also keep snapshots younger than this")
+    args = ap.parse_args()
+
+    project = Path(args.project).resolve()
+    store = SnapshotStore(project / STORE_DIRNAME)
+    res = project / RES_RELATIVE
+    t0 = time.perf_counter()
+
+    if args.cmd == "create":
+        if not res.exists():
+            print(f"[ERREUR] Dossier res introuvable: {res}")
+            return 2
+        info = snapshot_res(project, args.label)
+        print(f"[OK] Snapshot {info.id}: {info.files} fichiers, {info.new_blobs} nouveaux contenus "
+              f"({info.new_bytes // 1024} Ko) en {(time.perf_counter() - t0) * 1000:.0f} ms")
+    elif args.cmd == "list":
+        snaps = store.list()
+        if not snaps:
+            print("[INFO] Aucun snapshot.")
+        for s in snaps:
+            print(f"{s.id}  {s.created}  {s.files} fichiers  {s.label}")
+    elif args.cmd == "restore":
+        try:
+            restored, unchanged, deleted = store.restore(args.id, res, args.file, args.delete_extra)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"[ERREUR] {e}")
+            return 2
+        print(f"[OK] {restored} fichiers restaures, {unchanged} deja identiques, {deleted} supprimes")
+    elif args.cmd == "gc":
+        dropped, blobs, freed = store.gc(args.keep, args.keep_days)
+        print(f"[OK] {dropped} snapshots et {blobs} contenus supprimes ({freed // 1024} Ko liberes)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
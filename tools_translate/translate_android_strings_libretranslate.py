@@ -2,35 +2,35 @@
 # -*- coding: utf-8 -*-
 
 import argparse
+import io
 import os
-import re
 import sys
 import json
 import shutil
+import time
 from pathlib import Path
-from typing import Dict, Tuple
+from typing import Dict, Optional
 import xml.etree.ElementTree as ET
-import urllib.request
 
-PLACEHOLDER_RE = re.compile(r"%(?:\d+\$)?[+-]?(?:\d+)?(?:\.\d+)?[a-zA-Z]|%%")
-BRACE_PH_RE = re.compile(r"\{\d+\}")
-TAG_RE = re.compile(r"<[^>]+>")
+import http_client
+import masking
+import metrics
+from file_writer import WriteStats, write_if_changed
+from masking import Masker, unmask
+from translation_memory import DEFAULT_TM_PATH, TranslationMemory, add_fuzzy_arguments, backend_id, configure_fuzzy
+from work_pool import ErrorSummary, run_ordered
+
+# Escapes (\n, \t, \'), then tags, then placeholders: all masked as __TOKn__
+_MASKER = Masker([
+    ("TOK", r"\\n"), ("TOK", r"\\t"), ("TOK", r"\\'"),
+    ("TOK", masking.MARKUP), ("TOK", masking.PRINTF), ("TOK", masking.BRACES),
+])
 
 def http_post_json(url: str, payload: Dict) -> Dict:
-    data = json.dumps(payload).encode("utf-8")
-    req = urllib.request.Request(
-        url,
-        data=data,
-        headers={"Content-Type": "application/json", "Accept": "application/json"},
-        method="POST",
-    )
-    with urllib.request.urlopen(req, timeout=120) as resp:
-        raw = resp.read().decode("utf-8", errors="replace")
-        return json.loads(raw)
+    return http_client.client().post_json(url, payload)
 
 def http_get(url: str) -> str:
-    with urllib.request.urlopen(url, timeout=60) as resp:
-        return resp.read().decode("utf-8", errors="replace")
+    return http_client.client().request("GET", url).decode("utf-8", errors="replace")
 
 def check_endpoint(endpoint: str) -> None:
     url = endpoint.rstrip("/") + "/languages"
@@ -42,30 +42,10 @@ def check_endpoint(endpoint: str) -> None:
     print(f"[OK] LibreTranslate dispo. Langues: {', '.join(codes)}")
 
 def mask_text(s: str):
-    token_map: Dict[str, str] = {}
-    idx = 0
-
-    def tok(val: str) -> str:
-        nonlocal idx
-        key = f"__TOK{idx}__"
-        idx += 1
-        token_map[key] = val
-        return key
-
-    s = s.replace("\\n", tok("\\n"))
-    s = s.replace("\\t", tok("\\t"))
-    s = s.replace("\\'", tok("\\'"))
-
-    s = TAG_RE.sub(lambda m: tok(m.group(0)), s)
-    s = PLACEHOLDER_RE.sub(lambda m: tok(m.group(0)), s)
-    s = BRACE_PH_RE.sub(lambda m: tok(m.group(0)), s)
-
-    return s, token_map
+    return _MASKER.mask(s)
 
 def unmask_text(s: str, token_map: Dict[str, str]) -> str:
-    for k, v in token_map.items():
-        s = s.replace(k, v)
-    return s
+    return unmask(s, token_map)
 
 def should_skip_value(val: str) -> bool:
     if val is None:
@@ -107,34 +87,39 @@ def is_resources_xml(tree: ET.ElementTree) -> bool:
     return tree.getroot().tag == "resources"
 
 def iter_text_nodes(root: ET.Element):
+    """Yield (element, kind, resource name) for each text node."""
     for child in list(root):
+        name = child.get("name", "")
         if child.tag == "string":
-            yield child, "string"
+            yield child, "string", name
         elif child.tag == "plurals":
             for item in child.findall("item"):
-                yield item, "plural_item"
+                yield item, "plural_item", name
         elif child.tag == "string-array":
             for item in child.findall("item"):
-                yield item, "array_item"
+                yield item, "array_item", name
 
 def translate_file(endpoint: str, src_xml: Path, out_xml: Path, source_lang: str, target_lang: str,
-                   cache: Dict[Tuple[str,str,str], str], skip_names: set):
-    tree = load_xml(src_xml)
+                   tm: TranslationMemory, skip_names: set, writes: Optional[WriteStats] = None):
+    m = metrics.current()
+    t0 = time.perf_counter()
+    with m.phase("parse"):
+        tree = load_xml(src_xml)
     if not is_resources_xml(tree):
-        return 0, 0
+        return 0, 0, []
 
     root = tree.getroot()
     translated = 0
     total = 0
+    failures = []   # (resource name, error): left in the source language
 
-    for el, kind in iter_text_nodes(root):
+    for el, kind, name in iter_text_nodes(root):
         total += 1
 
         if el.get("translatable") == "false":
             continue
 
         if kind == "string":
-            name = el.get("name", "")
             if name in skip_names:
                 continue
 
@@ -142,20 +127,40 @@ def translate_file(endpoint: str, src_xml: Path, out_xml: Path, source_lang: str
         if should_skip_value(val):
             continue
 
-        masked, token_map = mask_text(val)
-        key = (masked, source_lang, target_lang)
-
-        if key not in cache:
-            cache[key] = translate_text(endpoint, masked, source_lang, target_lang)
+        with m.phase("mask"):
+            masked, token_map = mask_text(val)
+
+        m.add("segments")
+        with m.phase("tm"):
+            tr = tm.get(masked, source_lang, target_lang)
+        if tr is None:
+            m.add("segments_sent")
+            m.add("chars_sent", len(masked))
+            t1 = time.perf_counter()
+            try:
+                with m.phase("http"):
+                    tr = translate_text(endpoint, masked, source_lang, target_lang)
+            except Exception as e:
+                failures.append((name, str(e)))
+                continue
+            finally:
+                m.observe("target", target_lang, time.perf_counter() - t1)
+            with m.phase("tm"):
+                tm.put(masked, source_lang, target_lang, tr)
 
-        out = unmask_text(cache[key], token_map)
+        with m.phase("unmask"):
+            out = unmask_text(tr, token_map)
         el.text = out
         translated += 1
 
-    out_xml.parent.mkdir(parents=True, exist_ok=True)
-    indent(root)
-    tree.write(out_xml, encoding="utf-8", xml_declaration=True)
-    return translated, total
+    with m.phase("write"):
+        indent(root)
+        buf = io.BytesIO()
+        tree.write(buf, encoding="utf-8", xml_declaration=True)
+        # Atomic, and skipped when the bytes did not change (keeps mtimes for Gradle)
+        write_if_changed(out_xml, buf.getvalue(), writes)
+    m.observe("file", f"{out_xml.parent.name}/{out_xml.name}", time.perf_counter() - t0)
+    return translated, total, failures
 
 def main():
     ap = argparse.ArgumentParser()
@@ -167,7 +172,17 @@ def main():
     ap.add_argument("--clean-target-dirs", action="store_true")
     ap.add_argument("--write-base", default=None, choices=[None, "en", "fr", "de", "es"])
     ap.add_argument("--skip-names", default="app_name", help="Noms à ne pas traduire, comma")
+    ap.add_argument("--jobs", type=int, default=4, help="Fichiers traduits en parallèle (= requêtes simultanées max)")
+    http_client.add_arguments(ap)
+    ap.add_argument("--tm", default=str(DEFAULT_TM_PATH), help="Mémoire de traduction (SQLite)")
+    ap.add_argument("--no-tm", action="store_true", help="Mémoire en RAM seulement (rien n'est relu ni gardé)")
+    add_fuzzy_arguments(ap)
+    ap.add_argument("--report", default="", help="Fichier JSON listant les ressources non traduites")
+    metrics.add_arguments(ap)
     args = ap.parse_args()
+    metrics.run_profiled(args.profile, lambda: run(args))
+
+def run(args):
 
     res_dir = Path(args.res).resolve()
     src_dir = Path(args.source_dir).resolve()
@@ -179,6 +194,7 @@ def main():
         print(f"[ERREUR] source-dir introuvable: {src_dir}")
         sys.exit(2)
 
+    http_client.configure_from_args(args, pool_size=args.jobs)
     check_endpoint(args.endpoint)
 
     targets = [t.strip() for t in args.targets.split(",") if t.strip()]
@@ -201,18 +217,29 @@ def main():
                 print(f"[CLEAN] Suppression {tdir}")
                 shutil.rmtree(tdir)
 
-    cache: Dict[Tuple[str,str,str], str] = {}
+    tm = TranslationMemory(":memory:" if args.no_tm else Path(args.tm), backend=backend_id(args.endpoint))
+    configure_fuzzy(tm, args)
     totals = {t: {"translated": 0, "total": 0} for t in targets}
 
-    for t in targets:
-        if t == args.source_lang:
+    jobs = [(t, src_xml) for t in targets if t != args.source_lang for src_xml in src_xmls]
+    writes = WriteStats()
+
+    def run_job(job):
+        t, src_xml = job
+        out_xml = res_dir / f"values-{t}" / src_xml.name
+        return translate_file(args.endpoint, src_xml, out_xml, args.source_lang, t, tm, skip_names, writes)
+
+    errors = ErrorSummary()
+    for outcome in run_ordered(jobs, run_job, jobs=args.jobs):
+        t, src_xml = outcome.item
+        if outcome.error is not None:
+            errors.add(f"values-{t}/{src_xml.name}", outcome.error)
             continue
-        out_dir = res_dir / f"values-{t}"
-        for src_xml in src_xmls:
-            out_xml = out_dir / src_xml.name
-            tr, tot = translate_file(args.endpoint, src_xml, out_xml, args.source_lang, t, cache, skip_names)
-            totals[t]["translated"] += tr
-            totals[t]["total"] += tot
+        tr, tot, failures = outcome.result
+        for name, msg in failures:
+            errors.add(f"values-{t}/{src_xml.name}:{name}", msg)
+        totals[t]["translated"] += tr
+        totals[t]["total"] += tot
 
     if args.write_base:
         base_dir = res_dir / "values"
@@ -229,6 +256,25 @@ def main():
                 for p in from_dir.glob("*.xml"):
                     shutil.copy2(p, base_dir / p.name)
 
+    print(f"\n[INFO] {tm.summary()}")
+    if args.fuzzy_report:
+        tm.write_fuzzy_report(Path(args.fuzzy_report))
+    if args.metrics:
+        metrics.current().write_json(Path(args.metrics), {
+            "tool": "v1",
+            "http": http_client.client().stats(),
+            "tm": tm.stats(),
+            "files": {"written": writes.written, "unchanged": writes.skipped},
+            "errors": len(errors.errors),
+        })
+    tm.close()
+    print(f"[INFO] {http_client.client().summary()}")
+    http_client.client().close()
+    print(f"[INFO] {writes.summary()}")
+
+    errors.print()
+    if args.report:
+        errors.write_json(Path(args.report))
     print("\n=== RÉSUMÉ ===")
     for t in targets:
         if t == args.source_lang:
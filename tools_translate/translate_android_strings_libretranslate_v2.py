@@ -6,7 +6,7 @@ Translate Android string resources using a LibreTranslate endpoint.
 Goals:
 - Only generate localizable resources (string, string-array, plurals) in values-xx
 - Preserve placeholders (%1$s, %d, ...), escaped sequences (\n, \t, ...), and inline tags (<xliff:g>, <b>, ...)
-- Avoid AAPT2 errors by sanitizing backslashes and suspicious \u / \U sequences
+- Avoid AAPT2 errors by sanitizing backslashes and suspicious unicode escape sequences
 
 Typical use:
   py tools_translate/translate_android_strings_libretranslate_v2.py \
@@ -14,9 +14,71 @@ Typical use:
     --source-dir ./app/src/main/res/values-fr \
     --targets en,es,de \
     --endpoint http://127.0.0.1:5000 \
-    --clean-target-dirs \
+    --incremental \
     --write-base fr
 
+Batching:
+- All files are planned first. Each distinct masked segment is translated once
+  per target language, however many files, array items or plurals repeat it;
+  segments with nothing to translate (only placeholders, URLs, numbers) are
+  copied as-is without any request.
+- The distinct segments are packed into /translate calls (q as a list),
+  bounded by --batch-chars and --batch-size. --batch-size 1 restores the old
+  one-request-per-segment behaviour.
+- If a batch fails or returns a malformed answer, its segments are retried one
+  by one, so a single bad segment never loses the whole batch.
+
+Translation memory:
+- Translations are kept in tools_translate/translation_memory.sqlite3 (see
+  translation_memory.py) and reused on the next run; --no-tm disables it.
+- Texts differing from a known one only by case, spaces or final punctuation
+  reuse its translation; --fuzzy-reuse 0.9 also reuses close ones, and
+  --fuzzy-report lists the close matches to review (see fuzzy_match.py).
+
+Incremental mode (--incremental, replaces --clean-target-dirs):
+- Every run records a hash per source resource in tools_translate/translation_manifest.json.
+- With --incremental only added/changed resources are retranslated, deleted ones
+  are dropped, and files whose resources did not change are not rewritten at all.
+- Resources whose translation failed are not recorded, so the next run retries them.
+
+Interrupted runs (--resume):
+- Every translated segment and every finished file is appended to a journal
+  (tools_translate/translation_journal.jsonl, fsync'ed every second, see work_journal.py).
+- Files are written to a staging folder next to the journal; a values-xx folder
+  is only updated (and, with --clean-target-dirs, emptied of old files) once
+  all its files are done. An interrupted run leaves the previous outputs intact.
+- --resume skips what the journal already holds: finished targets, staged files,
+  segments received. The journal is deleted once a run ends without failures;
+  if segments failed (server down), --resume retries only those.
+
+Watch mode (--watch):
+- After the run, the tool keeps watching the source folder (polling every
+  --watch-interval seconds; a file is taken once two polls see the same size
+  and mtime, so half-saved files are left alone).
+- A saved file is parsed again and diffed with the previous version resource by
+  resource; only added/changed resources are translated, for all targets at
+  once, and the values-xx copies are patched (sanitized, written only if changed).
+  The source model, translation memory and HTTP connections stay warm.
+- Ctrl+C stops watching.
+
+Errors:
+- Transient errors (server busy, restarting, network) are retried with backoff;
+  the number of requests in flight adapts to the server (see rate_control.py),
+  and when the server is down the run stops sending requests (circuit breaker).
+- Every resource left in the source language is listed at the end (--report
+  also writes that list as JSON).
+
+Concurrency:
+- Batches are sent by --jobs worker threads, so at most --jobs requests are in
+  flight; match it to the LibreTranslate worker count.
+  Output files and logs stay in the same order as a serial run.
+
+Measuring (see metrics.py):
+- --metrics run.json: time per phase (parse, mask, tm, http, unmask,
+  fix_android_text, write), latency per target language and per file, segment,
+  request, byte and TM counters.
+- --profile DIR: also runs under cProfile + tracemalloc (profile.pstats, tracemalloc.txt).
+
 Notes:
 - This tool is designed for beginners: it tries to be safe rather than "perfect".
 - If LibreTranslate is slow on first run (downloads models), wait until /languages responds.
@@ -25,22 +87,30 @@ Notes:
 from __future__ import annotations
 
 import argparse
+import hashlib
 import json
 import re
 import shutil
 import sys
 import time
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, Tuple
-import urllib.parse
-import urllib.request
-import xml.etree.ElementTree as ET
-
-XLIFF_NS = "urn:oasis:names:tc:xliff:document:1.2"
-ET.register_namespace("xliff", XLIFF_NS)
-
-LOCALIZABLE_TAGS = {"string", "string-array", "plurals"}
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+import http_client
+import masking
+import metrics
+from android_resources import Resource, parse_resources, serialize_resources, tag_token, write_resources
+from file_writer import WriteStats, same_content, write_if_changed
+from masking import Masker, unmask
+from sanitize_android_resources import sanitize_xml_bytes
+from translation_memory import DEFAULT_TM_PATH, TranslationMemory, add_fuzzy_arguments, backend_id, configure_fuzzy
+from work_journal import Journal
+from work_pool import ErrorSummary, run_ordered
+
+MANIFEST_VERSION = 2
+DEFAULT_MANIFEST_PATH = Path(__file__).resolve().parent / "translation_manifest.json"
+DEFAULT_JOURNAL_PATH = Path(__file__).resolve().parent / "translation_journal.jsonl"
+JOURNAL_VERSION = 1
 
 # Android backslash escapes that are generally safe in string resources.
 _ALLOWED_ESCAPES = set(["n", "t", "'", '"', "\\"])
@@ -48,21 +118,9 @@ _RE_BAD_U4 = re.compile(r"\\u(?![0-9a-fA-F]{4})")
 _RE_BAD_U8 = re.compile(r"\\U(?![0-9a-fA-F]{8})")
 _RE_ANY_BACKSLASH = re.compile(r"\\(.)", re.DOTALL)
 
-# Placeholders to protect from translation.
-# Covers: %s, %1$s, %1$.2f, %d, %% ... and also {0} style placeholders.
-_RE_PRINTF = re.compile(r"%(?:\d+\$)?[\-\+\#\ 0\,\(]*\d*(?:\.\d+)?[a-zA-Z%]")
-_RE_BRACES = re.compile(r"\{\d+\}")
-
-@dataclass
-class Tokenizer:
-    mapping: Dict[str, str]
-    counter: int = 0
-
-    def token(self, original: str, kind: str) -> str:
-        key = f"__{kind}{self.counter}__"
-        self.counter += 1
-        self.mapping[key] = original
-        return key
+# Placeholders to protect from translation: %s, %1$s, %1$.2f, %d, %% ... then {0}.
+# Inline tags already are __TAGn__ tokens (see android_resources).
+_MASKER = Masker([("PH", masking.PRINTF), ("BR", masking.BRACES)])
 
 
 def fix_android_text(s: str) -> str:
@@ -89,17 +147,12 @@ def fix_android_text(s: str) -> str:
     return s
 
 
-def http_post_form(url: str, data: Dict[str, str], timeout: int = 120) -> Dict:
-    body = urllib.parse.urlencode(data).encode("utf-8")
-    req = urllib.request.Request(
-        url,
-        data=body,
-        headers={"Content-Type": "application/x-www-form-urlencoded", "User-Agent": "HikeTrack-i18n-tool"},
-        method="POST",
-    )
-    with urllib.request.urlopen(req, timeout=timeout) as resp:
-        raw = resp.read().decode("utf-8", errors="replace")
-        return json.loads(raw)
+def http_post_form(url: str, data: Dict[str, str]) -> Dict:
+    return http_client.client().post_form(url, data)
+
+
+def http_post_json(url: str, payload: Dict) -> Dict:
+    return http_client.client().post_json(url, payload)
 
 
 def lt_translate(endpoint: str, text: str, source: str, target: str) -> str:
@@ -114,125 +167,558 @@ def lt_translate(endpoint: str, text: str, source: str, target: str) -> str:
     return out.get("translatedText", "")
 
 
-def flat_string_from_string_elem(elem: ET.Element, tok: Tokenizer) -> Tuple[str, List[str]]:
-    """Flatten a <string> that may contain child tags into a text with __TAGx__ tokens.
+def lt_translate_batch(endpoint: str, texts: List[str], source: str, target: str) -> List[str]:
+    """Translate several segments in one request (LibreTranslate accepts a list for q).
 
-    Returns (flat_text, tag_tokens_in_order)
+    Raises ValueError if the answer does not contain exactly one translation per segment.
     """
-    tag_tokens: List[str] = []
-    parts: List[str] = []
-
-    if elem.text:
-        parts.append(elem.text)
-
-    for child in list(elem):
-        # Serialize the whole child tag as atomic placeholder.
-        serialized = ET.tostring(child, encoding="unicode")
-        t = tok.token(serialized, "TAG")
-        tag_tokens.append(t)
-        parts.append(t)
-        if child.tail:
-            parts.append(child.tail)
-
-    return "".join(parts), tag_tokens
+    url = endpoint.rstrip("/") + "/translate"
+    payload = {
+        "q": texts,
+        "source": source,
+        "target": target,
+        "format": "text",
+    }
+    out = http_post_json(url, payload)
+    tr = out.get("translatedText")
+    if not isinstance(tr, list) or len(tr) != len(texts):
+        raise ValueError(f"reponse batch inattendue ({len(texts)} segments): {str(out)[:200]}")
+    return [x if isinstance(x, str) else "" for x in tr]
 
 
-def restore_flat_into_string_elem(elem: ET.Element, flat: str, tag_tokens: List[str], tok_map: Dict[str, str]) -> bool:
-    """Rebuild elem.text and child.tails using the translated flat string.
+def pack_batches(texts: List[str], max_chars: int, max_segments: int) -> Iterator[List[int]]:
+    """Group segment indices into batches bounded by total characters and segment count.
 
-    Keeps existing children (original ones) but updates surrounding texts.
-    Returns True if rebuild succeeded.
+    A segment longer than max_chars gets a batch of its own.
     """
-    if not tag_tokens:
-        elem.text = flat
-        return True
+    batch: List[int] = []
+    size = 0
+    for i, t in enumerate(texts):
+        n = len(t)
+        if batch and (size + n > max_chars or len(batch) >= max_segments):
+            yield batch
+            batch = []
+            size = 0
+        batch.append(i)
+        size += n
+    if batch:
+        yield batch
+
+
+def translate_batch(
+    endpoint: str,
+    texts: List[str],
+    source: str,
+    target: str,
+    on_error: Optional[Callable[[int, Exception], None]] = None,
+) -> List[Optional[str]]:
+    """Translate one packed batch. Failed segments are returned as None."""
+    if len(texts) > 1:
+        try:
+            return list(lt_translate_batch(endpoint, texts, source, target))
+        except Exception as e:
+            if http_client.is_transient(e):
+                # Server down or overloaded even after the retries: splitting the
+                # batch would only send it more requests.
+                if on_error is not None:
+                    for i in range(len(texts)):
+                        on_error(i, e)
+                return [None] * len(texts)
+            # Malformed answer or one bad segment: fall back to one request per
+            # segment so it does not lose the whole batch.
+    results: List[Optional[str]] = [None] * len(texts)
+    for i, t in enumerate(texts):
+        try:
+            results[i] = lt_translate(endpoint, t, source, target)
+        except Exception as e:
+            if on_error is not None:
+                on_error(i, e)
+    return results
+
+
+_RE_URL = re.compile(r"(?:https?://|www\.)\S+", re.IGNORECASE)
+
+
+def needs_translation(masked: str) -> bool:
+    """False when no letter is left once tokens and URLs are removed (e.g. "__PH0__ / __PH1__", "42 km")."""
+    rest = _RE_URL.sub(" ", masking.TOKEN_RE.sub(" ", masked))
+    return any(c.isalpha() for c in rest)
+
+
+def load_manifest(path: Path) -> Dict:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if data.get("version") == MANIFEST_VERSION:
+            return data
+    except (OSError, ValueError):
+        pass
+    return {"version": MANIFEST_VERSION, "targets": {}}
+
+
+def save_manifest(path: Path, manifest: Dict) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=1, sort_keys=True), encoding="utf-8")
+    tmp.replace(path)
 
-    # Split translated string by tag tokens, preserving order.
-    # We expect tokens to appear in the same order.
-    remaining = flat
-    segments: List[str] = []
-    for t in tag_tokens:
-        idx = remaining.find(t)
-        if idx < 0:
-            return False
-        segments.append(remaining[:idx])
-        remaining = remaining[idx + len(t):]
-    segments.append(remaining)
 
-    # Apply to elem and child tails
-    children = list(elem)
-    if len(children) != len(tag_tokens):
-        return False
+@dataclass
+class Segment:
+    """One translatable text of a resource, already masked."""
+    text: str                 # masked text sent to the backend
+    tok_map: Dict[str, str]   # token -> original placeholder (inline tags stay __TAGn__, see android_resources)
+    item: int                 # index in Resource.items (0 for <string>)
 
-    elem.text = segments[0]
-    for i, ch in enumerate(children):
-        ch.tail = segments[i + 1]
 
-    return True
+@dataclass
+class SourceResource:
+    res: Resource
+    hash: str
+    segments: List[Segment]
 
+    @property
+    def key(self) -> str:
+        return self.res.key
 
-def protect_placeholders(text: str, tok: Tokenizer) -> str:
-    # Protect printf-style placeholders
-    def repl_printf(m: re.Match) -> str:
-        return tok.token(m.group(0), "PH")
 
-    text = _RE_PRINTF.sub(repl_printf, text)
+@dataclass
+class SourceFile:
+    path: Path
+    root_attrib: Dict[str, str] = field(default_factory=dict)
+    resources: List[SourceResource] = field(default_factory=list)
+    error: Optional[str] = None   # set when the XML could not be parsed
+
+
+def mask_resource(res: Resource) -> List[Segment]:
+    """Split a resource into masked segments (done once per run, shared by all targets)."""
+    segments: List[Segment] = []
+    # Skip resources explicitly marked as non-translatable (string-array too: language codes...)
+    if not res.translatable:
+        return segments
+    for i, item in enumerate(res.items):
+        # If empty or whitespace, keep
+        if not item.text.strip():
+            continue
+        # Inline tags already are __TAG0__.. tokens: number placeholders after them
+        text, tok_map = _MASKER.mask(item.text, start=len(item.tags))
+        segments.append(Segment(text, tok_map, i))
+    return segments
+
+
+def load_source_file(path: Path) -> Optional[SourceFile]:
+    """Parse and mask one source XML. Returns None when it holds no localizable resource."""
+    m = metrics.current()
+    try:
+        with m.phase("parse"):
+            rf = parse_resources(path)
+    except Exception as e:
+        return SourceFile(path, error=str(e))
+    if rf is None or not rf.resources:
+        return None
+    with m.phase("mask"):
+        resources = [SourceResource(r, r.content_hash(), mask_resource(r)) for r in rf.resources]
+    return SourceFile(path, rf.root_attrib, resources)
+
+
+def translate_resource(src: SourceResource, translations: List[Optional[str]]) -> Tuple[Resource, bool]:
+    """Build the translated copy of a resource from its segment translations.
+
+    Returns (resource, complete). A segment that failed, or whose inline tags did not
+    survive, keeps the source text (better than breaking).
+    """
+    texts = [it.text for it in src.res.items]
+    complete = True
+    m = metrics.current()
+    for seg, tr in zip(src.segments, translations):
+        if tr is None:
+            complete = False
+            continue
+        item = src.res.items[seg.item]
+        # Inline tag tokens map to themselves: unmask() only repairs their spelling
+        tok_map = seg.tok_map
+        if item.tags:
+            tok_map = {**tok_map, **{tag_token(n): tag_token(n) for n in range(len(item.tags))}}
+        with m.phase("unmask"):
+            tr = unmask(tr, tok_map)
+        with m.phase("fix_android_text"):
+            tr = fix_android_text(tr)
+        if not item.tags_in_order(tr):
+            complete = False
+            continue
+        texts[seg.item] = tr
+    return src.res.with_texts(texts), complete
 
-    # Protect {0} style placeholders
-    def repl_br(m: re.Match) -> str:
-        return tok.token(m.group(0), "BR")
 
-    text = _RE_BRACES.sub(repl_br, text)
+@dataclass
+class FileJob:
+    target: str
+    src: SourceFile
+    out_path: Path
+    prev_hashes: Optional[Dict[str, str]]
+    stage_path: Path          # written here first, copied to out_path when the target is done
 
-    return text
 
+@dataclass
+class FileResult:
+    # Resource hashes to record in the manifest (None: nothing produced for this file)
+    hashes: Optional[Dict[str, str]]
+    logs: List[str]
+    failures: List[Tuple[str, str]]
+    staged: Optional[str] = None    # sha1 of the staged file
 
-def unprotect_tokens(text: str, tok_map: Dict[str, str]) -> str:
-    # Replace longer tokens first to avoid partial matches (safe anyway)
-    for k in sorted(tok_map.keys(), key=len, reverse=True):
-        text = text.replace(k, tok_map[k])
-    return text
 
+@dataclass
+class ResumeState:
+    """What the journal of an interrupted run already holds."""
+    records: List[Dict] = field(default_factory=list)            # kept in the new journal
+    segments: Dict[str, Dict[str, str]] = field(default_factory=dict)   # target -> masked -> translation
+    files: Dict[Tuple[str, str], Dict] = field(default_factory=dict)    # (target, file name) -> record
+    done: Set[str] = field(default_factory=set)                  # finalized targets
 
-def is_translatable(elem: ET.Element) -> bool:
-    # Skip strings explicitly marked as non-translatable
-    if elem.attrib.get("translatable", "true").lower() == "false":
-        return False
-    return True
 
+@dataclass
+class FilePlan:
+    job: FileJob
+    existing: Dict[str, Resource] = field(default_factory=dict)
+    reuse: Set[str] = field(default_factory=set)
+    work: List[Tuple[SourceResource, Segment]] = field(default_factory=list)
+    skipped: bool = False   # incremental: nothing changed, the file is left as is
+    resumed: Optional[Dict] = None  # journal record: already staged by the interrupted run
+
+
+def plan_file_job(job: FileJob, args: argparse.Namespace, resumed: Optional[Dict] = None) -> FilePlan:
+    """List the segments one (target, file) pair needs. Nothing is sent to the backend here."""
+    src = job.src
+    plan = FilePlan(job, resumed=resumed)
+    if resumed is not None:
+        return plan
+    src_hashes = {r.key: r.hash for r in src.resources}
+
+    # Incremental: reuse the existing translation of unchanged resources
+    old_hashes = job.prev_hashes if args.incremental else None
+    if old_hashes and job.out_path.exists():
+        try:
+            with metrics.current().phase("parse"):
+                plan.existing = {r.key: r for r in parse_resources(job.out_path).resources}
+        except Exception:
+            plan.existing = {}
+    plan.reuse = {key for key, h in src_hashes.items() if key in plan.existing and old_hashes.get(key) == h}
+
+    if plan.existing and len(plan.reuse) == len(src_hashes) and set(old_hashes) == set(src_hashes):
+        plan.skipped = True
+        return plan
+
+    plan.work = [(r, seg) for r in src.resources if r.key not in plan.reuse for seg in r.segments]
+    return plan
 
-def collect_localizable_children(src_root: ET.Element) -> List[ET.Element]:
-    out = []
-    for child in list(src_root):
-        tag = child.tag.split("}")[-1]
-        if tag in LOCALIZABLE_TAGS:
-            out.append(child)
-    return out
 
+@dataclass
+class TargetUnits:
+    """Run-wide work of one target language: every distinct masked text, once."""
+    done: Dict[str, str] = field(default_factory=dict)      # masked -> translation
+    failed: Dict[str, str] = field(default_factory=dict)    # masked -> error message
 
-def clone_element(elem: ET.Element) -> ET.Element:
-    # Deep clone using serialization (simplest, preserves namespaces)
-    return ET.fromstring(ET.tostring(elem, encoding="utf-8"))
 
+def translate_run(plans: List[FilePlan], args: argparse.Namespace, tm: Optional[TranslationMemory],
+                  journal: Optional[Journal] = None,
+                  resumed: Optional[Dict[str, Dict[str, str]]] = None) -> Dict[str, TargetUnits]:
+    """Translate the segments of all plans, each distinct masked text once per target.
 
-def indent(elem: ET.Element, level: int = 0) -> None:
-    i = "\n" + level * "  "
-    if len(elem):
-        if not elem.text or not elem.text.strip():
-            elem.text = i + "  "
-        for e in elem:
-            indent(e, level + 1)
-        if not elem.tail or not elem.tail.strip():
-            elem.tail = i
+    The same text often appears in several files, items or plurals: it is looked up
+    and sent once, then every occurrence gets the same translation. Segments with
+    nothing to translate (only placeholders, URLs, numbers) never reach the backend.
+    Translations received are appended to the journal; resumed ones are not resent.
+    """
+    m = metrics.current()
+    units: Dict[str, TargetUnits] = {}
+    batches: List[Tuple[str, List[str]]] = []
+    by_target: Dict[str, List[FilePlan]] = {}
+    for plan in plans:
+        by_target.setdefault(plan.job.target, []).append(plan)
+
+    for tgt, tplans in by_target.items():
+        tu = units[tgt] = TargetUnits()
+        wanted: Dict[str, None] = {}
+        total = 0
+        for plan in tplans:
+            for _, seg in plan.work:
+                total += 1
+                if not needs_translation(seg.text):
+                    tu.done[seg.text] = seg.text
+                else:
+                    wanted.setdefault(seg.text)
+        passthrough = len(tu.done)
+        known = (resumed or {}).get(tgt, {})
+        from_journal = {t: known[t] for t in wanted if t in known}
+        tu.done.update(from_journal)
+        if tm is not None:
+            with m.phase("tm"):
+                tu.done.update(tm.get_many([t for t in wanted if t not in from_journal], args.source_lang, tgt))
+        pending = [t for t in wanted if t not in tu.done]
+        m.add("segments", total)
+        m.add("segments_distinct", len(wanted))
+        m.add("segments_passthrough", passthrough)
+        m.add("segments_sent", len(pending))
+        m.add("chars_sent", sum(len(t) for t in pending))
+        for batch in pack_batches(pending, args.batch_chars, args.batch_size):
+            batches.append((tgt, [pending[i] for i in batch]))
+        if total:
+            resumed_info = f", {len(from_journal)} repris du journal" if from_journal else ""
+            print(f"[INFO] {tgt}: {total} segment(s), {len(wanted)} distinct(s), "
+                  f"{passthrough} sans texte{resumed_info}, {len(pending)} a envoyer")
+
+    def run_batch(batch: Tuple[str, List[str]]) -> Tuple[List[Optional[str]], Dict[int, str]]:
+        tgt, texts = batch
+        errs: Dict[int, str] = {}
+
+        def report(i: int, e: Exception) -> None:
+            errs[i] = str(e)
+
+        # Per target: time of the whole batch, retries and one-by-one fallback included
+        t0 = time.perf_counter()
+        with m.phase("http"):
+            out = translate_batch(args.endpoint, texts, args.source_lang, tgt, on_error=report)
+        m.observe("target", tgt, time.perf_counter() - t0)
+        return out, errs
+
+    for outcome in run_ordered(batches, run_batch, jobs=args.jobs):
+        tgt, texts = outcome.item
+        tu = units[tgt]
+        if outcome.error is not None:
+            for t in texts:
+                tu.failed[t] = str(outcome.error)
+            continue
+        translated, errs = outcome.result
+        ok: List[Tuple[str, str]] = []
+        for i, (t, tr) in enumerate(zip(texts, translated)):
+            if tr is None:
+                tu.failed[t] = errs.get(i, "pas de traduction")
+            else:
+                tu.done[t] = tr
+                ok.append((t, tr))
+        if journal is not None:
+            for t, tr in ok:
+                journal.append({"k": "seg", "t": tgt, "q": t, "tr": tr})
+        if tm is not None:
+            with m.phase("tm"):
+                tm.put_many(ok, args.source_lang, tgt)
+    return units
+
+
+def apply_file_plan(plan: FilePlan, units: Optional[TargetUnits], args: argparse.Namespace) -> FileResult:
+    """Rebuild one target file from the run-wide translations and write it to the staging folder."""
+    job = plan.job
+    src = job.src
+    name = src.path.name
+    t0 = time.perf_counter()
+    m = metrics.current()
+    logs: List[str] = []
+    failures: List[Tuple[str, str]] = []
+    src_hashes = {r.key: r.hash for r in src.resources}
+
+    if plan.skipped:
+        logs.append(f"[SKIP] {name} (inchange)")
+        return FileResult(job.prev_hashes, logs, failures)
+    if plan.resumed is not None:
+        logs.append(f"[RESUME] {name} (deja traduit)")
+        return FileResult(plan.resumed["res"], logs, failures, plan.resumed["h"])
+
+    # Put the translations back in place, keeping the source order
+    units = units or TargetUnits()
+    per_res: Dict[str, List[Optional[str]]] = {}
+    failed = set()
+    for r, seg in plan.work:
+        tr = units.done.get(seg.text)
+        if tr is None and r.key not in failed:
+            err = units.failed.get(seg.text, "pas de traduction")
+            logs.append(f"[FAIL] {name}:{r.res.name} -> {err}")
+            failures.append((r.res.name, err))
+            failed.add(r.key)
+        per_res.setdefault(r.key, []).append(tr)
+    out: List[Resource] = []
+    for r in src.resources:
+        if r.key in plan.reuse:
+            out.append(plan.existing[r.key])
+            continue
+        res, complete = translate_resource(r, per_res.get(r.key, []))
+        if not complete and r.key not in failed:
+            # Translated, but the inline tags did not survive: source text kept
+            logs.append(f"[FAIL] {name}:{r.res.name} -> balises inline perdues, texte source conserve")
+            failures.append((r.res.name, "balises inline perdues"))
+            failed.add(r.key)
+        out.append(res)
+
+    # Staged only: out_path is replaced (if the bytes differ) once the whole target is done
+    with m.phase("write"):
+        data = serialize_resources(out, src.root_attrib)
+        job.stage_path.parent.mkdir(parents=True, exist_ok=True)
+        job.stage_path.write_bytes(data)
+        written = not same_content(job.out_path, data)
+    m.observe("file", f"{job.out_path.parent.name}/{name}", time.perf_counter() - t0)
+    unchanged = "" if written else ", fichier inchange"
+    if args.incremental and job.prev_hashes:
+        logs.append(f"[OK] {name} ({len(src_hashes) - len(plan.reuse)} ressource(s) retraduite(s){unchanged})")
     else:
-        if level and (not elem.tail or not elem.tail.strip()):
-            elem.tail = i
-
-
-def write_resources_xml(path: Path, root: ET.Element) -> None:
-    indent(root)
-    xml = ET.tostring(root, encoding="utf-8", xml_declaration=True).decode("utf-8") + "\n"
-    path.write_text(xml, encoding="utf-8")
+        logs.append(f"[OK] {name}" + (" (fichier inchange)" if not written else ""))
+    # Failed resources are left out of the manifest so the next run retries them
+    return FileResult({key: h for key, h in src_hashes.items() if key not in failed}, logs, failures,
+                      hashlib.sha1(data).hexdigest())
+
+
+def run_signature(args: argparse.Namespace, res: Path, src_dir: Path, targets: List[str],
+                  model: List[SourceFile]) -> str:
+    """Identity of a run: the journal of an interrupted run is only resumed by the same one."""
+    sources = {sf.path.name: sf.error or [r.hash for r in sf.resources] for sf in model}
+    options = [str(res), str(src_dir), targets, args.source_lang, args.incremental, args.clean_target_dirs,
+               args.no_fuzzy, args.fuzzy_reuse, sources]
+    return hashlib.sha1(json.dumps(options, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def load_resume_state(path: Path, header: Dict) -> ResumeState:
+    """Read the journal of an interrupted run. Segments are reused as long as the backend is the
+    same; staged files and finished targets only if sources and options did not change."""
+    state = ResumeState()
+    records = Journal.read(path)
+    if not records or records[0].get("k") != "run":
+        print(f"[INFO] Aucun journal a reprendre ({path})")
+        return state
+    head = records[0]
+    if any(head.get(k) != header[k] for k in ("version", "backend", "source_lang")):
+        print("[WARN] Journal d'un autre serveur / d'une autre langue source: ignore.")
+        return state
+    same_run = head.get("sig") == header["sig"]
+    if not same_run:
+        print("[WARN] Sources ou options changees depuis l'interruption: seules les traductions recues sont reprises.")
+    for rec in records[1:]:
+        kind = rec.get("k")
+        if kind == "seg":
+            state.segments.setdefault(rec["t"], {})[rec["q"]] = rec["tr"]
+        elif same_run and kind == "file":
+            state.files[(rec["t"], rec["f"])] = rec
+        elif same_run and kind == "target":
+            state.done.add(rec["t"])
+        else:
+            continue
+        state.records.append(rec)
+    print(f"[INFO] Reprise: {sum(len(s) for s in state.segments.values())} segment(s), "
+          f"{len(state.files)} fichier(s), {len(state.done)} cible(s) deja faits")
+    return state
+
+
+def _stat_key(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def watch(args: argparse.Namespace, res: Path, src_dir: Path, targets: List[str], skip: Set[str],
+          model: List[SourceFile], known: Dict[str, Tuple[int, int]], tm: Optional[TranslationMemory],
+          manifest: Dict, manifest_path: Path, writes: WriteStats) -> None:
+    """--watch: retranslate the resources of the source files as they are saved, until Ctrl+C.
+
+    known: size / mtime of the source files when the model was parsed.
+    """
+    # Always incremental: unchanged resources keep their current translation
+    pass_args = argparse.Namespace(**{**vars(args), "incremental": True})
+    stage_root = Path(args.journal).with_name(Path(args.journal).name + ".watch")
+    sources = {sf.path.name: sf for sf in model}
+
+    def scan() -> Dict[str, Tuple[int, int]]:
+        out = {}
+        for p in src_dir.glob("*.xml"):
+            key = _stat_key(p)
+            if p.name not in skip and key is not None:
+                out[p.name] = key
+        return out
+
+    def target_files(tgt: str) -> Dict[str, Dict[str, str]]:
+        entry = manifest["targets"].setdefault(tgt, {"source_lang": args.source_lang, "files": {}})
+        return entry["files"]
+
+    def process(name: str) -> None:
+        t0 = time.perf_counter()
+        path = src_dir / name
+        old = sources.get(name)
+        sf = load_source_file(path) if path.exists() else None
+        if sf is not None and sf.error is not None:
+            print(f"[WARN] {name}: XML invalide, ignore jusqu'a la prochaine sauvegarde -> {sf.error}")
+            return
+        old_hashes = {r.key: r.hash for r in old.resources} if old is not None and old.error is None else {}
+        new_hashes = {r.key: r.hash for r in sf.resources} if sf is not None else {}
+        added = sum(1 for k in new_hashes if k not in old_hashes)
+        changed = sum(1 for k, h in new_hashes.items() if k in old_hashes and old_hashes[k] != h)
+        removed = sum(1 for k in old_hashes if k not in new_hashes)
+        if sf is not None and old is not None and old.error is None and not (added or changed or removed):
+            sources[name] = sf
+            return   # saved without a resource change (formatting, comments)
+        print(f"\n[WATCH] {name}: +{added} ~{changed} -{removed} ressource(s)")
+
+        if sf is None:
+            # Deleted, or no localizable resource left: drop the translated copies
+            sources.pop(name, None)
+            for tgt in targets:
+                target_files(tgt).pop(name, None)
+                stale = res / f"values-{tgt}" / name
+                if stale.exists():
+                    stale.unlink()
+                    print(f"[DEL] values-{tgt}/{name}")
+            save_manifest(manifest_path, manifest)
+            return
+
+        sources[name] = sf
+        base_dir = res / f"values-{args.write_base}"
+        # Never rewrite the file being edited (--write-base fr with values-fr as source)
+        if args.write_base and base_dir.resolve() != src_dir:
+            write_resources(base_dir / name, [r.res for r in sf.resources], sf.root_attrib, writes)
+        jobs = [FileJob(tgt, sf, res / f"values-{tgt}" / name, target_files(tgt).get(name),
+                        stage_root / f"values-{tgt}" / name) for tgt in targets]
+        plans = [plan_file_job(job, pass_args) for job in jobs]
+        units = translate_run(plans, pass_args, tm)
+        written = 0
+        for outcome in run_ordered(plans, lambda p: apply_file_plan(p, units.get(p.job.target), pass_args),
+                                   jobs=args.jobs):
+            job = outcome.item.job
+            if outcome.error is not None:
+                print(f"[FAIL] values-{job.target}/{name} -> {outcome.error}")
+                continue
+            result = outcome.result
+            for line in result.logs:
+                print(f"values-{job.target}: {line}")
+            if result.staged is not None:
+                data, fixes = sanitize_xml_bytes(job.stage_path.read_bytes())
+                if fixes:
+                    print(f"[FIX] values-{job.target}/{name}: {fixes} backslash(s) corrige(s)")
+                job.out_path.parent.mkdir(parents=True, exist_ok=True)
+                written += write_if_changed(job.out_path, data, writes)
+            if result.hashes is not None:
+                target_files(job.target)[name] = result.hashes
+        save_manifest(manifest_path, manifest)
+        print(f"[WATCH] {name}: {written} fichier(s) mis a jour en {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+    print(f"\n[WATCH] Surveillance de {src_dir} (Ctrl+C pour arreter)")
+    known = dict(known)
+    last = scan()
+    try:
+        while True:
+            time.sleep(args.watch_interval)
+            now = scan()
+            # Changed since the last pass, and the same on two polls in a row (saving is over)
+            settled = sorted(n for n in set(now) | set(known) if now.get(n) != known.get(n) and now.get(n) == last.get(n))
+            last = now
+            for name in settled:
+                try:
+                    process(name)
+                except Exception as e:
+                    print(f"[FAIL] {name} -> {e}")
+                if name in now:
+                    known[name] = now[name]
+                else:
+                    known.pop(name, None)
+    except KeyboardInterrupt:
+        print("\n[WATCH] Arret.")
+    finally:
+        shutil.rmtree(stage_root, ignore_errors=True)
 
 
 def main() -> int:
@@ -243,10 +729,32 @@ def main() -> int:
     ap.add_argument("--endpoint", default="http://127.0.0.1:5000", help="LibreTranslate endpoint")
     ap.add_argument("--source-lang", default="fr", help="Source language code")
     ap.add_argument("--clean-target-dirs", action="store_true", help="Delete values-xx folders before writing")
+    ap.add_argument("--incremental", action="store_true", help="Only retranslate resources changed since the last run")
+    ap.add_argument("--manifest", default=str(DEFAULT_MANIFEST_PATH), help="Source hash manifest used by --incremental")
+    ap.add_argument("--journal", default=str(DEFAULT_JOURNAL_PATH), help="Work journal of the run (see --resume)")
+    ap.add_argument("--resume", action="store_true", help="Continue an interrupted run from its journal")
+    ap.add_argument("--watch", action="store_true", help="After the run, keep retranslating source files as they are saved")
+    ap.add_argument("--watch-interval", type=float, default=0.3, help="Seconds between two polls of the source folder")
     ap.add_argument("--write-base", default="", help="If set (e.g. fr): write a values-fr copy of source localizable files")
     ap.add_argument("--skip-names", default="", help="Comma-separated file basenames to skip, e.g. secrets.xml")
+    ap.add_argument("--batch-chars", type=int, default=4000, help="Max characters per /translate request")
+    ap.add_argument("--batch-size", type=int, default=50, help="Max segments per /translate request (1 = no batching)")
+    ap.add_argument("--jobs", type=int, default=4, help="Files translated in parallel (= max requests in flight)")
+    http_client.add_arguments(ap)
+    ap.add_argument("--tm", default=str(DEFAULT_TM_PATH), help="Translation memory file (SQLite)")
+    ap.add_argument("--no-tm", action="store_true", help="Do not read or write the translation memory")
+    add_fuzzy_arguments(ap)
+    ap.add_argument("--report", default="", help="Write the untranslated resources / errors to this JSON file")
+    metrics.add_arguments(ap)
     args = ap.parse_args()
+    try:
+        return metrics.run_profiled(args.profile, lambda: run(args))
+    except KeyboardInterrupt:
+        print("\n[INFO] Interrompu: relance avec --resume pour reprendre ou le run s'est arrete.")
+        return 130
+
 
+def run(args: argparse.Namespace) -> int:
     res = Path(args.res).resolve()
     src_dir = Path(args.source_dir).resolve()
     if not res.exists():
@@ -256,6 +764,10 @@ def main() -> int:
         print(f"[ERREUR] source-dir introuvable: {src_dir}")
         return 2
 
+    if args.incremental and args.clean_target_dirs:
+        print("[ERREUR] --incremental et --clean-target-dirs sont incompatibles.")
+        return 2
+
     targets = [x.strip() for x in args.targets.split(",") if x.strip()]
     skip = {x.strip() for x in args.skip_names.split(",") if x.strip()}
 
@@ -269,131 +781,189 @@ def main() -> int:
     print(f"[INFO] source: {src_dir}")
     print(f"[INFO] targets: {', '.join(targets)}")
 
-    # Optionally clean target dirs
-    if args.clean_target_dirs:
-        for t in targets:
-            td = res / f"values-{t}"
-            if td.exists():
-                print(f"[INFO] Nettoyage: {td}")
-                shutil.rmtree(td, ignore_errors=True)
+    # Parse and mask every source file once; all targets share this model
+    src_stats = {f.name: _stat_key(f) for f in src_files}
+    model: List[SourceFile] = []
+    for f in src_files:
+        sf = load_source_file(f)
+        if sf is None:
+            continue
+        if sf.error is not None:
+            print(f"[WARN] XML invalide, skip: {f.name} -> {sf.error}")
+        model.append(sf)
+
+    writes = WriteStats()
 
     # Write base copy values-fr if requested
     if args.write_base:
         base_dir = res / f"values-{args.write_base}"
         base_dir.mkdir(parents=True, exist_ok=True)
-        for f in src_files:
-            # Keep only localizable resources
-            try:
-                tree = ET.parse(str(f))
-            except Exception as e:
-                print(f"[WARN] XML invalide, skip: {f.name} -> {e}")
+        for sf in model:
+            if sf.error is not None:
                 continue
-            src_root = tree.getroot()
-            if src_root.tag.split('}')[-1] != "resources":
-                continue
-            kids = collect_localizable_children(src_root)
-            if not kids:
-                continue
-            out_root = ET.Element(src_root.tag, src_root.attrib)
-            for k in kids:
-                out_root.append(clone_element(k))
-            write_resources_xml(base_dir / f.name, out_root)
-
-    # Translate per target
+            # Keep only localizable resources
+            write_resources(base_dir / sf.path.name, [r.res for r in sf.resources], sf.root_attrib, writes)
+
+    tm = None if args.no_tm else TranslationMemory(Path(args.tm), backend=backend_id(args.endpoint))
+    configure_fuzzy(tm, args)
+    http_client.configure_from_args(args, pool_size=args.jobs)
+
+    manifest_path = Path(args.manifest)
+    manifest = load_manifest(manifest_path)
+
+    # Journal of the run; outputs are staged next to it until their target is done
+    journal_path = Path(args.journal)
+    stage_root = journal_path.with_name(journal_path.name + ".staging")
+    header = {"k": "run", "version": JOURNAL_VERSION, "backend": backend_id(args.endpoint),
+              "source_lang": args.source_lang, "sig": run_signature(args, res, src_dir, targets, model)}
+    if args.resume:
+        resume = load_resume_state(journal_path, header)
+    else:
+        resume = ResumeState()
+        if journal_path.exists():
+            print("[INFO] Journal d'un run interrompu remplace (--resume pour le reprendre)")
+    if not resume.files:
+        shutil.rmtree(stage_root, ignore_errors=True)
+    journal = Journal(journal_path)
+    journal.start(header, resume.records)
+
+    # Translate per target: every (target, file) pair is an independent job
+    jobs: List[FileJob] = []
+    prev_by_target: Dict[str, Dict[str, Dict[str, str]]] = {}
+    new_by_target: Dict[str, Dict[str, Dict[str, str]]] = {}
     for tgt in targets:
+        if tgt in resume.done:
+            print(f"[RESUME] {tgt}: deja termine")
+            continue
         out_dir = res / f"values-{tgt}"
         out_dir.mkdir(parents=True, exist_ok=True)
 
-        print(f"\n=== {tgt} ===")
-        for f in src_files:
-            try:
-                tree = ET.parse(str(f))
-            except Exception as e:
-                print(f"[WARN] XML invalide, skip: {f.name} -> {e}")
-                continue
-
-            src_root = tree.getroot()
-            if src_root.tag.split('}')[-1] != "resources":
+        prev = manifest["targets"].get(tgt)
+        if not prev or prev.get("source_lang") != args.source_lang:
+            prev = {"source_lang": args.source_lang, "files": {}}
+        prev_by_target[tgt] = prev["files"]
+        new_by_target[tgt] = {}
+        for sf in model:
+            if sf.error is not None:
+                # Unreadable source: keep what the manifest knew about the file
+                if sf.path.name in prev["files"]:
+                    new_by_target[tgt][sf.path.name] = prev["files"][sf.path.name]
                 continue
-
-            kids = collect_localizable_children(src_root)
-            if not kids:
-                continue
-
-            out_root = ET.Element(src_root.tag, src_root.attrib)
-
-            # For each resource element, translate its textual parts
-            for k in kids:
-                tag = k.tag.split('}')[-1]
-                k2 = clone_element(k)
-
-                if tag == "string":
-                    if not is_translatable(k2):
-                        out_root.append(k2)
-                        continue
-
-                    tok = Tokenizer(mapping={})
-                    flat, tag_tokens = flat_string_from_string_elem(k2, tok)
-                    flat = protect_placeholders(flat, tok)
-
-                    # If empty or whitespace, keep
-                    if not flat.strip():
-                        out_root.append(k2)
-                        continue
-
-                    # Translate
-                    try:
-                        tr = lt_translate(args.endpoint, flat, args.source_lang, tgt)
-                    except Exception as e:
-                        print(f"[FAIL] {f.name}:{k2.attrib.get('name','?')} -> {e}")
-                        out_root.append(k2)
-                        continue
-
-                    tr = unprotect_tokens(tr, tok.mapping)
-                    tr = fix_android_text(tr)
-
-                    ok = restore_flat_into_string_elem(k2, tr, tag_tokens, tok.mapping)
-                    if not ok:
-                        # Fallback: keep source (better than breaking)
-                        out_root.append(clone_element(k))
-                    else:
-                        out_root.append(k2)
-
-                elif tag == "string-array":
-                    # Translate each <item> text
-                    for item in k2.findall("item"):
-                        if item.text and item.text.strip():
-                            tok = Tokenizer(mapping={})
-                            txt = protect_placeholders(item.text, tok)
-                            try:
-                                tr = lt_translate(args.endpoint, txt, args.source_lang, tgt)
-                                tr = unprotect_tokens(tr, tok.mapping)
-                                item.text = fix_android_text(tr)
-                            except Exception:
-                                # keep original
-                                pass
-                    out_root.append(k2)
-
-                elif tag == "plurals":
-                    for item in k2.findall("item"):
-                        if item.text and item.text.strip():
-                            tok = Tokenizer(mapping={})
-                            txt = protect_placeholders(item.text, tok)
-                            try:
-                                tr = lt_translate(args.endpoint, txt, args.source_lang, tgt)
-                                tr = unprotect_tokens(tr, tok.mapping)
-                                item.text = fix_android_text(tr)
-                            except Exception:
-                                pass
-                    out_root.append(k2)
-
-                else:
-                    out_root.append(k2)
-
-            # Write file
-            write_resources_xml(out_dir / f.name, out_root)
-            print(f"[OK] {f.name}")
-
+            jobs.append(FileJob(tgt, sf, out_dir / sf.path.name, prev["files"].get(sf.path.name),
+                                stage_root / f"values-{tgt}" / sf.path.name))
+
+    errors = ErrorSummary()
+    current = None
+    staged: Dict[str, Set[str]] = {tgt: set() for tgt in targets}
+    target_failed: Set[str] = set()
+
+    def resumed_file(job: FileJob) -> Optional[Dict]:
+        # A staged file is only trusted if its bytes are still the ones journaled
+        rec = resume.files.get((job.target, job.src.path.name))
+        try:
+            if rec is not None and hashlib.sha1(job.stage_path.read_bytes()).hexdigest() == rec["h"]:
+                return rec
+        except OSError:
+            pass
+        return None
+
+    def finish_target(tgt: str) -> None:
+        out_dir = res / f"values-{tgt}"
+        # The whole target is staged: put it in place (unchanged files are not rewritten)
+        for name in sorted(staged[tgt]):
+            write_if_changed(out_dir / name, (stage_root / f"values-{tgt}" / name).read_bytes(), writes)
+        if args.clean_target_dirs:
+            for p in sorted(out_dir.iterdir()):
+                if p.is_file() and p.name not in staged[tgt]:
+                    p.unlink()
+                    print(f"[DEL] {p.name}")
+        # Source files that disappeared: drop their translated copy
+        prev_files = prev_by_target[tgt]
+        new_files = new_by_target[tgt]
+        if args.incremental:
+            for name in sorted(set(prev_files) - set(new_files)):
+                stale = out_dir / name
+                if stale.exists():
+                    stale.unlink()
+                    print(f"[DEL] {name}")
+        manifest["targets"][tgt] = {"source_lang": args.source_lang, "files": new_files}
+        save_manifest(manifest_path, manifest)
+        # A target with failures is redone by --resume (its good files come back from staging)
+        if tgt not in target_failed:
+            journal.append({"k": "target", "t": tgt})
+        journal.sync()
+
+    # 1) Plan every (target, file) pair, 2) translate the distinct segments of the
+    # whole run, 3) write the files
+    plans = [plan_file_job(job, args, resumed_file(job)) for job in jobs]
+    units = translate_run(plans, args, tm, journal, resume.segments)
+
+    for outcome in run_ordered(plans, lambda p: apply_file_plan(p, units.get(p.job.target), args),
+                               jobs=args.jobs):
+        job = outcome.item.job
+        if job.target != current:
+            if current is not None:
+                finish_target(current)
+            current = job.target
+            print(f"\n=== {job.target} ===")
+
+        if outcome.error is not None:
+            # Unexpected crash of this job: keep what the manifest knew about the file
+            print(f"[FAIL] {job.src.path.name} -> {outcome.error}")
+            errors.add(f"{job.target}/{job.src.path.name}", outcome.error)
+            target_failed.add(job.target)
+            if job.prev_hashes is not None:
+                new_by_target[job.target][job.src.path.name] = job.prev_hashes
+            continue
+
+        result = outcome.result
+        for line in result.logs:
+            print(line)
+        for label, msg in result.failures:
+            errors.add(f"{job.target}/{job.src.path.name}:{label}", msg)
+        if result.hashes is not None:
+            new_by_target[job.target][job.src.path.name] = result.hashes
+        if result.staged is not None:
+            staged[job.target].add(job.src.path.name)
+            if result.failures:
+                target_failed.add(job.target)
+            elif outcome.item.resumed is None:
+                journal.append({"k": "file", "t": job.target, "f": job.src.path.name,
+                                "h": result.staged, "res": result.hashes})
+
+    if current is not None:
+        finish_target(current)
+
+    if target_failed:
+        journal.close()
+        print(f"\n[INFO] Echecs: journal conserve, relance avec --resume pour ne refaire que ceux-ci ({journal_path})")
+    else:
+        journal.discard()
+        shutil.rmtree(stage_root, ignore_errors=True)
+
+    if args.watch:
+        watch(args, res, src_dir, targets, skip, model, src_stats, tm, manifest, manifest_path, writes)
+
+    if tm is not None:
+        print(f"\n[INFO] {tm.summary()}")
+        if args.fuzzy_report:
+            tm.write_fuzzy_report(Path(args.fuzzy_report))
+        tm.close()
+    print(f"[INFO] {http_client.client().summary()}")
+    http_client.client().close()
+    print(f"[INFO] {writes.summary()}")
+
+    errors.print()
+    if args.report:
+        errors.write_json(Path(args.report))
+    if args.metrics:
+        metrics.current().write_json(Path(args.metrics), {
+            "tool": "v2",
+            "http": http_client.client().stats(),
+            "tm": tm.stats() if tm is not None else None,
+            "files": {"written": writes.written, "unchanged": writes.skipped},
+            "errors": len(errors.errors),
+        })
     print("\n[OK] Traduction terminée.")
     print("Si Android Studio se plaint encore, lance 03_sanitize_translations.bat.")
     return 0
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Persistent translation memory (single SQLite file) shared by the i18n tools.
+
+Entries are keyed by (masked source text, source lang, target lang, backend),
+so a rerun after editing a few strings only sends the edited ones to LibreTranslate.
+
+Near duplicates (see fuzzy_match.py, options from add_fuzzy_arguments()):
+- a text equal to a known one up to whitespace / case / final punctuation
+  reuses its translation (--fuzzy-reuse 1, the default);
+- with --fuzzy-reuse 0.9, texts at least 90% similar do too;
+- texts between --fuzzy-review and --fuzzy-reuse are still sent to the backend,
+  and listed with their closest TM entry (--fuzzy-report FILE) for review.
+Reused fuzzy translations are not stored: they stay derived from the real entry.
+
+Used by:
+- tools_translate/translate_android_strings_libretranslate.py
+- tools_translate/translate_android_strings_libretranslate_v2.py
+- tools/translate_resources_local.py
+
+CLI:
+  py tools_translate/translation_memory.py stats
+  py tools_translate/translation_memory.py prune --older-than-days 90
+  py tools_translate/translation_memory.py prune --backend libretranslate:http://127.0.0.1:5000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from fuzzy_match import FuzzyIndex
+
+DEFAULT_TM_PATH = Path(__file__).resolve().parent / "translation_memory.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tm (
+    masked      TEXT NOT NULL,
+    source      TEXT NOT NULL,
+    target      TEXT NOT NULL,
+    backend     TEXT NOT NULL,
+    translation TEXT NOT NULL,
+    created     REAL NOT NULL,
+    last_used   REAL NOT NULL,
+    hits        INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (masked, source, target, backend)
+) WITHOUT ROWID;
+"""
+
+# SQLite default limit on bound parameters is 999 on old builds.
+_CHUNK = 400
+
+
+def backend_id(endpoint: str, kind: str = "libretranslate") -> str:
+    """Identity of the translation backend, part of every TM key."""
+    return f"{kind}:{endpoint.strip().rstrip('/').lower()}"
+
+
+class TranslationMemory:
+    """Small SQLite-backed store. Safe to share between worker threads (one lock around the connection)."""
+
+    def __init__(self, path: Union[Path, str] = DEFAULT_TM_PATH, backend: str = "") -> None:
+        # ":memory:" gives a throw-away store (same behaviour as the old in-process dict)
+        self.path = path if path == ":memory:" else Path(path)
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self._touched: Dict[Tuple[str, str, str], int] = {}
+        # Near-duplicate tiers, off until enable_fuzzy()
+        self.fuzzy_reuse: Optional[float] = None
+        self.fuzzy_review = 1.0
+        self.normalized_hits = 0
+        self.fuzzy_hits = 0
+        self.fuzzy_log: List[Dict] = []
+        self._fuzzy: Dict[Tuple[str, str], FuzzyIndex] = {}
+        if isinstance(self.path, Path):
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def enable_fuzzy(self, reuse: float = 1.0, review: float = 0.75) -> None:
+        """Reuse near duplicates scoring >= reuse; list the ones >= review (see fuzzy_match.py)."""
+        self.fuzzy_reuse = min(max(reuse, 0.01), 1.0)
+        self.fuzzy_review = min(max(review, 0.01), self.fuzzy_reuse)
+
+    # -- lookups -------------------------------------------------------------
+
+    def get(self, masked: str, source: str, target: str) -> Optional[str]:
+        return self.get_many([masked], source, target).get(masked)
+
+    def get_many(self, texts: Iterable[str], source: str, target: str) -> Dict[str, str]:
+        """Return {masked: translation} for the texts found in memory."""
+        wanted = list(dict.fromkeys(texts))
+        found: Dict[str, str] = {}
+        with self._lock:
+            for i in range(0, len(wanted), _CHUNK):
+                chunk = wanted[i:i + _CHUNK]
+                marks = ",".join("?" * len(chunk))
+                rows = self._db.execute(
+                    f"SELECT masked, translation FROM tm WHERE source=? AND target=? AND backend=? AND masked IN ({marks})",
+                    [source, target, self.backend, *chunk],
+                )
+                found.update(rows)
+            for m in found:
+                key = (m, source, target)
+                self._touched[key] = self._touched.get(key, 0) + 1
+            if self.fuzzy_reuse is not None and len(found) < len(wanted):
+                found.update(self._fuzzy_lookup([t for t in wanted if t not in found], source, target))
+            self.hits += len(found)
+            self.misses += len(wanted) - len(found)
+        return found
+
+    def _fuzzy_index(self, source: str, target: str) -> FuzzyIndex:
+        index = self._fuzzy.get((source, target))
+        if index is None:
+            index = self._fuzzy[(source, target)] = FuzzyIndex()
+            rows = self._db.execute(
+                "SELECT masked, translation FROM tm WHERE source=? AND target=? AND backend=?",
+                [source, target, self.backend],
+            )
+            for masked, translation in rows:
+                index.add(masked, translation)
+        return index
+
+    def _fuzzy_lookup(self, texts: List[str], source: str, target: str) -> Dict[str, str]:
+        """Called with the lock held."""
+        index = self._fuzzy_index(source, target)
+        reused: Dict[str, str] = {}
+        for text in texts:
+            match = index.search(text, self.fuzzy_review)
+            if match is None:
+                continue
+            reuse = match.score >= self.fuzzy_reuse
+            if reuse:
+                reused[text] = match.translation
+                if match.score >= 1.0:
+                    self.normalized_hits += 1
+                else:
+                    self.fuzzy_hits += 1
+            if match.score < 1.0:
+                self.fuzzy_log.append({
+                    "source": source, "target": target, "text": text, "matched": match.matched,
+                    "translation": match.translation, "score": match.score,
+                    "status": "reused" if reuse else "review",
+                })
+        return reused
+
+    # -- updates -------------------------------------------------------------
+
+    def put(self, masked: str, source: str, target: str, translation: str) -> None:
+        self.put_many([(masked, translation)], source, target)
+
+    def put_many(self, pairs: Iterable[Tuple[str, str]], source: str, target: str) -> None:
+        now = time.time()
+        rows = [(m, source, target, self.backend, t, now, now) for m, t in pairs]
+        if not rows:
+            return
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO tm (masked, source, target, backend, translation, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (masked, source, target, backend) DO UPDATE SET "
+                "translation=excluded.translation, last_used=excluded.last_used",
+                rows,
+            )
+            self._db.commit()
+            self.stored += len(rows)
+            index = self._fuzzy.get((source, target))
+            if index is not None:
+                for m, _, _, _, t, _, _ in rows:
+                    index.add(m, t)
+
+    def flush(self) -> None:
+        """Persist last_used/hits of the entries read since the last flush."""
+        with self._lock:
+            if not self._touched:
+                return
+            now = time.time()
+            self._db.executemany(
+                "UPDATE tm SET last_used=?, hits=hits+? WHERE masked=? AND source=? AND target=? AND backend=?",
+                [(now, n, m, s, t, self.backend) for (m, s, t), n in self._touched.items()],
+            )
+            self._db.commit()
+            self._touched.clear()
+
+    def close(self) -> None:
+        self.flush()
+        self._db.close()
+
+    def __enter__(self) -> "TranslationMemory":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # -- maintenance ---------------------------------------------------------
+
+    def prune(self, older_than_days: Optional[float] = None, backend: Optional[str] = None) -> int:
+        """Delete entries not used for N days and/or belonging to a backend. Returns the count."""
+        where: List[str] = []
+        params: List[object] = []
+        if older_than_days is not None:
+            where.append("last_used < ?")
+            params.append(time.time() - older_than_days * 86400)
+        if backend:
+            where.append("backend = ?")
+            params.append(backend)
+        sql = "DELETE FROM tm" + (" WHERE " + " AND ".join(where) if where else "")
+        n = self._db.execute(sql, params).rowcount
+        self._db.commit()
+        self._db.execute("VACUUM")
+        return n
+
+    def summary(self) -> str:
+        total = self.hits + self.misses
+        rate = (100.0 * self.hits / total) if total else 0.0
+        text = f"TM: {self.hits} hits / {self.misses} misses ({rate:.0f}%), {self.stored} nouvelles entrees"
+        if self.fuzzy_reuse is not None:
+            review = sum(1 for e in self.fuzzy_log if e["status"] == "review")
+            text += (f" - dont {self.normalized_hits} quasi identiques, {self.fuzzy_hits} approchants;"
+                     f" {review} a relire")
+        return text
+
+    def stats(self) -> Dict:
+        return {
+            "hits": self.hits, "misses": self.misses, "stored": self.stored,
+            "normalized_hits": self.normalized_hits, "fuzzy_hits": self.fuzzy_hits,
+            "fuzzy_review": sum(1 for e in self.fuzzy_log if e["status"] == "review"),
+        }
+
+    def write_fuzzy_report(self, path: Path) -> None:
+        """Fuzzy matches of the run (reused, and below the threshold: to review), best score first."""
+        data = sorted(self.fuzzy_log, key=lambda e: (-e["score"], e["target"], e["text"]))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(data, ensure_ascii=False, indent=1), encoding="utf-8")
+
+
+def add_fuzzy_arguments(ap: argparse.ArgumentParser) -> None:
+    """Near-duplicate options of the translator command lines (see configure_fuzzy())."""
+    ap.add_argument("--fuzzy-reuse", type=float, default=1.0,
+                    help="Reuse the TM translation of texts this similar (1 = same text up to case/spaces/final punctuation)")
+    ap.add_argument("--fuzzy-review", type=float, default=0.75,
+                    help="Similarity from which close TM entries are listed for review (still translated)")
+    ap.add_argument("--no-fuzzy", action="store_true", help="Exact TM matches only")
+    ap.add_argument("--fuzzy-report", default="", help="Write the fuzzy matches of the run to this JSON file")
+
+
+def configure_fuzzy(tm: Optional[TranslationMemory], args: argparse.Namespace) -> None:
+    if tm is not None and not args.no_fuzzy:
+        tm.enable_fuzzy(args.fuzzy_reuse, args.fuzzy_review)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Translation memory maintenance")
+    ap.add_argument("--tm", default=str(DEFAULT_TM_PATH), help="Path to the translation memory file")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("stats", help="Show entry counts per backend and language pair")
+    pr = sub.add_parser("prune", help="Delete old or backend-specific entries")
+    pr.add_argument("--older-than-days", type=float, default=None)
+    pr.add_argument("--backend", default=None, help="e.g. libretranslate:http://127.0.0.1:5000")
+    pr.add_argument("--all", action="store_true", help="Delete everything")
+    args = ap.parse_args()
+
+    path = Path(args.tm)
+    if not path.exists():
+        print(f"[INFO] Pas de memoire de traduction: {path}")
+        return 0
+
+    with TranslationMemory(path) as tm:
+        if args.cmd == "stats":
+            rows = tm._db.execute(
+                "SELECT backend, source, target, COUNT(*), SUM(hits) FROM tm GROUP BY backend, source, target ORDER BY 1, 2, 3"
+            ).fetchall()
+            if not rows:
+                print("[INFO] Memoire vide.")
+            for b, s, t, n, h in rows:
+                print(f"{b}  {s}->{t}: {n} entrees, {h or 0} reutilisations")
+        elif args.cmd == "prune":
+            if args.older_than_days is None and not args.backend and not args.all:
+                print("[ERREUR] Precise --older-than-days, --backend ou --all.")
+                return 2
+            n = tm.prune(args.older_than_days, args.backend)
+            print(f"[OK] {n} entrees supprimees.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Append-only journal of a translation run, so an interrupted run can be resumed.
+
+One JSON object per line. The first line describes the run (options, sources);
+every completed unit of work is appended after it. Records are flushed to the
+OS right away (a crash of the process loses nothing) and fsync'ed at most every
+sync_interval seconds, and at the milestones the caller asks for with sync()
+(a power loss or sleep loses at most that much work).
+
+Reading stops at the first line that is not valid JSON: the tail of a record
+cut by a crash is ignored, and that unit is simply done again.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+class Journal:
+    def __init__(self, path: Path, sync_interval: float = 1.0) -> None:
+        self.path = Path(path)
+        self.sync_interval = sync_interval
+        self.records = 0
+        self._f = None
+        self._last_sync = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def read(path: Path) -> List[Dict]:
+        """Records of an existing journal, header first ([] if missing or unreadable)."""
+        out: List[Dict] = []
+        try:
+            with open(path, "rb") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line.decode("utf-8"))
+                    except ValueError:
+                        break
+                    if not isinstance(rec, dict):
+                        break
+                    out.append(rec)
+        except OSError:
+            return []
+        return out
+
+    def start(self, header: Dict, keep: Optional[List[Dict]] = None) -> None:
+        """(Re)write the journal as header + kept records, then open it for appending."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            for rec in [header, *(keep or [])]:
+                f.write(_line(rec))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self._f = open(self.path, "ab")
+        self._last_sync = time.monotonic()
+        self.records = len(keep or [])
+
+    def append(self, record: Dict) -> None:
+        with self._lock:
+            self._f.write(_line(record))
+            self._f.flush()
+            self.records += 1
+            if time.monotonic() - self._last_sync >= self.sync_interval:
+                self._sync()
+
+    def sync(self) -> None:
+        with self._lock:
+            self._sync()
+
+    def _sync(self) -> None:
+        os.fsync(self._f.fileno())
+        self._last_sync = time.monotonic()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._f is not None:
+                self._f.flush()
+                self._sync()
+                self._f.close()
+                self._f = None
+
+    def discard(self) -> None:
+        """Run completed: the journal is no longer needed."""
+        self.close()
+        try:
+            self.path.unlink()
+        except OSError:
+            pass
+
+
+def _line(record: Dict) -> bytes:
+    return (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
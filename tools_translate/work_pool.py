@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Bounded thread pool used by the translators to keep LibreTranslate busy.
+
+Work items run concurrently (at most `jobs` at a time, so at most `jobs`
+HTTP requests are in flight), but results are handed back in submission
+order: logs and written files stay deterministic whatever the timing.
+"""
+
+from __future__ import annotations
+
+import json
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Deque, Generic, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_END = object()
+
+
+@dataclass
+class JobOutcome(Generic[T, R]):
+    item: T
+    result: Optional[R] = None
+    error: Optional[BaseException] = None
+
+
+@dataclass
+class ErrorSummary:
+    errors: List[Tuple[str, str]] = field(default_factory=list)
+
+    def add(self, label: str, error: object) -> None:
+        self.errors.append((label, str(error)))
+
+    def print(self) -> None:
+        if not self.errors:
+            return
+        print(f"\n=== ERREURS ({len(self.errors)}) ===")
+        for label, msg in self.errors:
+            print(f"- {label}: {msg}")
+
+    def write_json(self, path: Path) -> None:
+        """Same list as print(), as JSON (written even when empty, so a clean run is visible)."""
+        data = [{"label": label, "error": msg} for label, msg in self.errors]
+        path.write_text(json.dumps(data, ensure_ascii=False, indent=1), encoding="utf-8")
+
+
+def run_ordered(items: Iterable[T], fn: Callable[[T], R], jobs: int = 1) -> Iterator[JobOutcome[T, R]]:
+    """Run fn over items with up to `jobs` threads, yielding outcomes in input order.
+
+    Exceptions are captured in the outcome instead of stopping the run.
+    jobs <= 1 runs everything inline (no threads), like the historical serial loop.
+    """
+    if jobs <= 1:
+        for item in items:
+            try:
+                yield JobOutcome(item, result=fn(item))
+            except Exception as e:
+                yield JobOutcome(item, error=e)
+        return
+
+    # Keep a bounded window of submitted work so huge inputs do not queue everything at once.
+    window = jobs * 4
+    pending: Deque[Tuple[T, Future]] = deque()
+    with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="i18n") as ex:
+        it = iter(items)
+        for item in it:
+            pending.append((item, ex.submit(fn, item)))
+            if len(pending) >= window:
+                break
+        while pending:
+            item, fut = pending.popleft()
+            try:
+                yield JobOutcome(item, result=fut.result())
+            except Exception as e:
+                yield JobOutcome(item, error=e)
+            nxt = next(it, _END)
+            if nxt is not _END:
+                pending.append((nxt, ex.submit(fn, nxt)))